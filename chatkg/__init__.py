@@ -0,0 +1,17 @@
+"""
+ChatKG：顶层包只做延迟导出，import chatkg 不会加载任何大模型、图数据库依赖
+"""
+from chatkg.adapter.registry import lazy_getattr, register, get, create, available
+
+_exports = {
+    "GraphBuilder": "chatkg.core.GraphBuilder:GraphBuilder",
+    "TraditionEngine": "chatkg.adapter.engine.tradition:TraditionEngine",
+    "MarkdownReader": "chatkg.utils.text_reader.MarkdownReader:MarkdownReader",
+}
+
+
+def __getattr__(name):
+    return lazy_getattr(__name__, _exports, name)
+
+
+__all__ = ["GraphBuilder", "TraditionEngine", "MarkdownReader", "register", "get", "create", "available"]
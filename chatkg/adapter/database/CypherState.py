@@ -0,0 +1,82 @@
+"""
+图数据库写入状态：节点与关系，与具体的图数据库客户端无关
+"""
+import json
+import uuid
+import warnings
+
+
+class CypherNodeState:
+    node_type: str
+    node_attr: dict
+
+    def __init__(self, node_type: str, node_attr: dict, uid: uuid.UUID = None):
+        if uid is None:
+            uid = uuid.uuid4()
+        if type(node_type) is not str:
+            node_type = str(node_type)
+            warnings.warn(f"node_type should be str, but got {type(node_type)}")
+        if type(node_attr) is not dict:
+            node_attr = json.loads(node_attr)
+            warnings.warn(f"node_attr should be dict, but got {type(node_attr)}")
+        self.node_type = node_type
+        self.node_attr = node_attr
+        self.node_attr["uid"] = str(uid)
+
+    def get_type(self):
+        return self.node_type
+
+    def get_attr(self):
+        attr_str = ', '.join([f"'{key}': '{value}'" for key, value in self.node_attr.items()])
+        return attr_str
+
+    def __str__(self):
+        """
+        生成类cypher语句的字符串，只是用于方便阅读调试而存在
+        :return: 类cypher语句的字符串
+        """
+        attr_str = ', '.join([f"'{key}': '{value}'" for key, value in self.node_attr.items()])
+        return f"'{self.node_type}' {{{attr_str}}}"
+
+    def __repr__(self):
+        """
+        生成类cypher语句的字符串，只是用于方便阅读调试而存在
+        :return:  类cypher语句的字符串
+        """
+        return self.__str__()
+
+
+class CypherRelationState:
+    relation_name: str
+    node1_name: str
+    node1_type: str
+    node2_name: str
+    node2_type: str
+
+    def __init__(self, node1_name: str, relation_name: str, node2_name: str,
+                 node1_type: str, node2_type: str):
+        self.node1_name = node1_name
+        self.node2_name = node2_name
+        self.relation_name = relation_name
+        self.node1_type = node1_type
+        self.node2_type = node2_type
+
+    def __str__(self):
+        """
+        生成类cypher语句的字符串，只是用于方便阅读调试而存在
+        :return:  类cypher语句的字符串
+        """
+        return f"{self.node1_name} -[:{self.relation_name}]-> {self.node2_name}"
+
+    def __repr__(self):
+        """
+        生成类cypher语句的字符串，只是用于方便阅读调试而存在
+        :return:  类cypher语句的字符串
+        """
+        return self.__str__()
+
+    def __hash__(self):
+        return hash((self.node1_name, self.relation_name, self.node2_name))
+
+    def __eq__(self, other):
+        return self.node1_name == other.node1_name and self.relation_name == other.relation_name and self.node2_name == other.node2_name
@@ -1,4 +1,16 @@
-from .base import BaseDatabase
-from .GraphNeo4j import CypherNodeState, CypherRelationState, GraphNeo4j
+from chatkg.adapter.registry import lazy_getattr
 
-__all__ = ["BaseDatabase", "CypherNodeState", "CypherRelationState", "GraphNeo4j"]
\ No newline at end of file
+# 第一次访问时才导入，GraphNeo4j 依赖 neo4j 与 langchain_community
+_exports = {
+    "BaseDatabase": "chatkg.adapter.database.base:BaseDatabase",
+    "CypherNodeState": "chatkg.adapter.database.CypherState:CypherNodeState",
+    "CypherRelationState": "chatkg.adapter.database.CypherState:CypherRelationState",
+    "GraphNeo4j": "chatkg.adapter.database.GraphNeo4j:GraphNeo4j",
+}
+
+
+def __getattr__(name):
+    return lazy_getattr(__name__, _exports, name)
+
+
+__all__ = ["BaseDatabase", "CypherNodeState", "CypherRelationState", "GraphNeo4j"]
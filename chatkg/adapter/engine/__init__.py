@@ -1 +1,12 @@
-from chatkg.adapter.engine.tradition import TraditionEngine
\ No newline at end of file
+from chatkg.adapter.registry import lazy_getattr
+
+_exports = {
+    "TraditionEngine": "chatkg.adapter.engine.tradition:TraditionEngine",
+}
+
+
+def __getattr__(name):
+    return lazy_getattr(__name__, _exports, name)
+
+
+__all__ = ["TraditionEngine"]
@@ -1,21 +1,37 @@
-from typing import Dict, Union
+from typing import ClassVar, Dict, Tuple, Union
 from abc import ABC, abstractmethod
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 import os
 import time
 
+from chatkg.adapter import registry
 from chatkg.adapter.task_model.base import BaseTaskModel
 from chatkg.utils.text_reader.base import BaseReader
 
 
 class BaseEngine(BaseModel, ABC):
+    # 推迟到第一次实例化时才生成校验器，import 时不构建 schema
+    model_config = ConfigDict(defer_build=True)
     work_dir: str = Field(default=f"{os.getcwd()}/work_dir/{time.strftime('%Y%m%d%H%M%S')}")
     struct_type: str = Field(default="default")
     llm: Union[BaseTaskModel, dict, None]
     reader: Union[BaseReader, dict, None]
     embeddings: Union[BaseTaskModel, dict, None] = None
+    # 可以用配置给出的组件：(字段名, 注册表中的种类)，子类增加字段时一并扩展
+    components: ClassVar[Tuple[Tuple[str, str], ...]] = (("llm", "task_model"), ("reader", "reader"),
+                                                         ("embeddings", "task_model"))
+
+    @model_validator(mode="before")
+    def validate_components(cls, values: Dict):
+        # 各组件可以是 {"type": 注册名, ...参数} 形式的配置，按注册表延迟导入对应的类并实例化
+        for field, kind in cls.components:
+            config = values.get(field)
+            if isinstance(config, dict) and "type" in config:
+                config = dict(config)
+                values[field] = registry.create(kind, config.pop("type"), **config)
+        return values
 
     @abstractmethod
     def execute(self):
@@ -0,0 +1,162 @@
+"""
+按 token 预算规划抽取请求：同一父标题下相邻的小节打包进同一个请求，超出预算的大节带重叠地切分为多个请求
+"""
+import hashlib
+import warnings
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from chatkg.adapter.engine.manifest import section_hash
+from chatkg.utils.tokens import estimate_tokens
+
+
+def get_token_counter(encoding: str | None = "cl100k_base") -> Callable[[str], int]:
+    # 优先使用 tiktoken 分词计数；未安装或无法加载词表（如离线环境）时退回估算
+    if encoding:
+        try:
+            import tiktoken
+            tokenizer = tiktoken.get_encoding(encoding)
+            return lambda text: len(tokenizer.encode(text, disallowed_special=()))
+        except Exception as e:
+            warnings.warn(f"Tokenizer {encoding} is unavailable ({e}), token counts are estimated instead")
+    return estimate_tokens
+
+
+def locate_entity(sections: List[Tuple[List[str], str]], name: str) -> List[str] | None:
+    # 打包的请求中实体所在的节：标题或正文中提到实体名的第一节，都未提到时为 None
+    if name:
+        for title_path, content in sections:
+            if name in title_path[-1] or name in content:
+                return list(title_path)
+    return None
+
+
+class ChunkUnit:
+    """
+    一个抽取请求的内容：一个或多个节 (title_path, content)，或一个大节切分后的第 part 段（共 parts 段）
+    """
+    sections: List[Tuple[List[str], str]]
+    part: int
+    parts: int
+
+    def __init__(self, sections: List[Tuple[List[str], str]], part: int = 0, parts: int = 1):
+        self.sections = sections
+        self.part = part
+        self.parts = parts
+
+    @property
+    def parent_path(self) -> List[str]:
+        return self.sections[0][0][:-1]
+
+    @property
+    def source(self) -> List[str]:
+        # 始终是一个标题路径：单独一节（或切分出的一段）为该节的标题路径，打包时为各节共同的上级标题路径
+        if len(self.sections) == 1:
+            return list(self.sections[0][0])
+        return list(self.parent_path)
+
+    @property
+    def sources(self) -> List[List[str]] | None:
+        # 打包时各节的标题路径
+        if len(self.sections) == 1:
+            return None
+        return [list(title_path) for title_path, _ in self.sections]
+
+    @property
+    def key(self) -> str:
+        # 单独一节、未切分时与 section_hash 一致，与未启用规划时的结果可以互相复用
+        if len(self.sections) == 1 and self.parts == 1:
+            return section_hash(*self.sections[0])
+        digest = hashlib.sha1()
+        for title_path, content in self.sections:
+            digest.update(section_hash(title_path, content).encode("ascii"))
+        digest.update(f"{self.part}/{self.parts}".encode("ascii"))
+        return digest.hexdigest()
+
+
+class ChunkPlanner(BaseModel):
+    # 推迟到第一次实例化时才生成校验器，import 时不构建 schema
+    model_config = ConfigDict(defer_build=True)
+    # 每个请求中标题与正文部分的 token 上限（不含系统提示词与输出格式等固定部分）
+    max_tokens: int = Field(default=2048, gt=0)
+    # 切分大节时，相邻两段之间重叠的 token 数
+    overlap_tokens: int = Field(default=128, ge=0)
+    # 是否打包同一父标题下相邻的小节
+    pack: bool = Field(default=True)
+    # tiktoken 的词表名，None 时直接估算
+    encoding: str | None = Field(default="cl100k_base")
+
+    _token_counter: Callable[[str], int] | None = None
+
+    def count_tokens(self, text: str) -> int:
+        if self._token_counter is None:
+            self._token_counter = get_token_counter(self.encoding)
+        return self._token_counter(text)
+
+    def plan(self, sections: Iterable[Tuple[List[str], str]]) -> Iterator[ChunkUnit]:
+        """
+        :param sections: 一棵树中按顺序排列的 (title_path, content)
+        """
+        packed, packed_tokens = [], 0
+        for title_path, content in sections:
+            tokens = self.count_tokens(content) + sum(self.count_tokens(title) for title in title_path)
+            if tokens > self.max_tokens:
+                if packed:
+                    yield ChunkUnit(packed)
+                    packed, packed_tokens = [], 0
+                budget = self._content_budget(title_path, tokens - self.count_tokens(content))
+                yield from self._split(title_path, content, budget)
+                continue
+            # 只有父标题路径相同、预算未满时才并入当前包
+            if packed and (not self.pack
+                           or packed[0][0][:-1] != title_path[:-1]
+                           or packed_tokens + tokens > self.max_tokens):
+                yield ChunkUnit(packed)
+                packed, packed_tokens = [], 0
+            packed.append((title_path, content))
+            packed_tokens += tokens
+        if packed:
+            yield ChunkUnit(packed)
+
+    def _content_budget(self, title_path: List[str], title_tokens: int) -> int:
+        # 每段正文的 token 预算；标题路径过长、留给正文的不足 max_tokens 的四分之一时，按四分之一切分（请求超出 max_tokens）
+        budget = self.max_tokens - title_tokens
+        min_budget = max(self.max_tokens // 4, 1)
+        if budget < min_budget:
+            warnings.warn(f"Title path {title_path} takes {title_tokens} of {self.max_tokens} tokens, "
+                          f"splitting its content into {min_budget}-token pieces")
+            budget = min_budget
+        return budget
+
+    def _split(self, title_path: List[str], content: str, budget: int) -> List[ChunkUnit]:
+        # 按行切分，保留 overlap_tokens 的尾部行作为下一段的开头；单行超出预算时按字符切分
+        overlap = min(self.overlap_tokens, budget // 2)
+        lines = []
+        for line in content.splitlines(keepends=True):
+            tokens = self.count_tokens(line)
+            if tokens <= budget:
+                lines.append((line, tokens))
+                continue
+            step = max(len(line) * budget // tokens, 1)
+            lines.extend((line[i:i + step], self.count_tokens(line[i:i + step])) for i in range(0, len(line), step))
+
+        pieces, current, current_tokens = [], [], 0
+        for line, tokens in lines:
+            if current and current_tokens + tokens > budget:
+                pieces.append("".join(text for text, _ in current))
+                # 带上尾部若干行作为重叠
+                tail, tail_tokens = [], 0
+                for text, text_tokens in reversed(current):
+                    if tail_tokens + text_tokens > overlap:
+                        break
+                    tail.insert(0, (text, text_tokens))
+                    tail_tokens += text_tokens
+                if tail_tokens + tokens > budget:
+                    tail, tail_tokens = [], 0
+                current, current_tokens = tail, tail_tokens
+            current.append((line, tokens))
+            current_tokens += tokens
+        if current:
+            pieces.append("".join(text for text, _ in current))
+        return [ChunkUnit([(title_path, piece)], part=i, parts=len(pieces)) for i, piece in enumerate(pieces)]
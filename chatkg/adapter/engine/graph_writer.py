@@ -0,0 +1,129 @@
+"""
+增量写入图数据库：每个 task 的结果解析完成后就转为 cypher 状态写入，无需等整个语料抽取完再统一 persist
+流式返回的输出在生成过程中解析出闭合的实体与关系（见 stream_json.StreamExtractor），task 校验通过后由 write_streamed 写入
+"""
+import threading
+import warnings
+from typing import Dict, List, Set, Tuple
+
+from chatkg.adapter.database.CypherState import CypherNodeState, CypherRelationState
+
+entity_type = "知识实体"
+
+
+class GraphWriter:
+    """
+    节点：同名实体只在第一次出现时写入，属性取第一次抽取的结果（与 GraphBuilder.persist 的合并不同，流式写入时无法回头修改已写入的节点）
+    关系：两端实体都已写入后才写入关系，否则暂存，等缺少的实体出现后再写
+    相同的关系（实体1、关系名、实体2）只写入一次，生成过程中写入过的条目在结果完成后再次出现时跳过
+    每累计 batch_size 个结果、或 stream_batch_size 个生成过程中的条目写一次，close 时写入剩余部分；两端实体始终未出现的关系不会写入
+    线程安全，流式返回的回调在 llm 的线程中调用
+    """
+    batch_size: int
+    written_cnt: int
+
+    def __init__(self, graph, batch_size: int = 8, stream_batch_size: int = 32):
+        self.graph = graph
+        self.batch_size = batch_size
+        self.stream_batch_size = stream_batch_size
+        self.written_cnt = 0
+        self._entities: Set[str] = set()
+        self._relation_keys: Set[Tuple[str, str, str]] = set()
+        # 缺少的实体名 -> 等待它的关系
+        self._pending: Dict[str, List[Tuple[str, str, str]]] = {}
+        self._nodes: List[CypherNodeState] = []
+        self._relations: List[CypherRelationState] = []
+        self._buffered = 0
+        self._streamed = 0
+        self._lock = threading.RLock()
+
+    def write(self, task_result):
+        with self._lock:
+            self._write(task_result)
+
+    def _write(self, task_result):
+        entity, relation = task_result.entity, task_result.relation
+        if isinstance(entity, dict):
+            for name, attr in entity.items():
+                self._add_entity(name, attr, task_result.source_of(name))
+        if isinstance(relation, dict):
+            for node1, relations in relation.items():
+                if not isinstance(relations, dict):
+                    continue
+                for relation_name, node2_list in relations.items():
+                    if isinstance(node2_list, str):
+                        node2_list = [node2_list]
+                    elif not isinstance(node2_list, list):
+                        warnings.warn(f"relation should be str, but got {type(node2_list)}")
+                        continue
+                    for node2 in node2_list:
+                        self._add_relation(node1, relation_name, str(node2))
+        self._buffered += 1
+        if self._buffered >= self.batch_size:
+            self.flush()
+
+    def write_streamed(self, event: tuple, source):
+        """
+        写入生成过程中闭合的条目，只应写入校验通过的 task 的条目
+        :param event: StreamExtractor 交出的 ("entity", 实体名, 属性) 或 ("relation", 实体1, 关系名, 实体2)
+        :param source: 所属 task 的来源
+        """
+        with self._lock:
+            if event[0] == "entity":
+                self._add_entity(event[1], event[2], source)
+            else:
+                self._add_relation(*event[1:])
+            self._streamed += 1
+            if self._streamed >= self.stream_batch_size:
+                self.flush()
+
+    def _add_entity(self, name: str, attr, source):
+        if name in self._entities:
+            return
+        self._entities.add(name)
+        node_attr = dict(attr) if isinstance(attr, dict) else {"属性": attr}
+        node_attr["name"] = name
+        node_attr["来源"] = source
+        self._nodes.append(CypherNodeState(node_type=entity_type, node_attr=node_attr))
+        for node1, relation_name, node2 in self._pending.pop(name, []):
+            self._add_relation(node1, relation_name, node2)
+
+    def _add_relation(self, node1: str, relation_name: str, node2: str):
+        key = (node1, relation_name, node2)
+        if key in self._relation_keys:
+            return
+        for name in (node1, node2):
+            if name not in self._entities:
+                self._pending.setdefault(name, []).append(key)
+                return
+        self._relation_keys.add(key)
+        self._relations.append(CypherRelationState(
+            node1_name=node1,
+            node1_type=entity_type,
+            relation_name=relation_name,
+            node2_name=node2,
+            node2_type=entity_type,
+        ))
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        # 节点先于关系写入，关系的 MATCH 才能找到两端
+        if self._nodes:
+            self.graph.execute_build(self._nodes)
+            self.written_cnt += len(self._nodes)
+            self._nodes = []
+        if self._relations:
+            self.graph.execute_build(self._relations)
+            self.written_cnt += len(self._relations)
+            self._relations = []
+        self._buffered = 0
+        self._streamed = 0
+
+    def close(self):
+        self.flush()
+        pending_cnt = len({key for relations in self._pending.values() for key in relations})
+        if pending_cnt:
+            warnings.warn(f"{pending_cnt} relations are not written because their entities were never extracted")
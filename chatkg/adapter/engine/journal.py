@@ -0,0 +1,82 @@
+"""
+task 日志：构建过程中每个 task 的状态转换逐行追加到 journal.jsonl，分批 fsync
+构建中断后 TraditionEngine.resume 按日志恢复：已有结果的 task 直接复用，已有输出的只重新整理，
+已提交的异步任务按任务 id 重新取结果而不再重新提交，只有从未提交的 task 才会重新请求
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict
+
+journal_file_name = "journal.jsonl"
+
+# task 状态：已提交（异步任务 id）、llm 已输出、已整理为结果
+SUBMITTED = "submitted"
+OUTPUT = "output"
+RESULT = "result"
+
+
+class TaskJournal:
+    """
+    每行一条：{"key": task_key, "state": 状态, "value": 任务 id / task_output / task.dump_dict()}
+    每追加 fsync_every 条或距上次 fsync 超过 fsync_interval 秒时 fsync 一次，close 时写入剩余部分
+    """
+    path: str
+
+    def __init__(self, path: str, resume: bool = False, fsync_every: int = 32, fsync_interval: float = 1.):
+        """
+        :param resume: 为 True 时在已有日志后追加（先截掉中断时写了一半的最后一行），否则清空重写
+        """
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        if resume and os.path.exists(path):
+            with open(path, "r+b") as f:
+                f.truncate(_complete_length(f.read()))
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def record(self, key: str, state: str, value=None):
+        line = json.dumps({"key": key, "state": state, "value": value}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._synced_at >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    @staticmethod
+    def replay(path: str) -> Dict[str, dict]:
+        """
+        :return: task_key -> {状态: 值}，同一状态以最后一条为准；日志不存在时返回空字典
+        """
+        if not os.path.exists(path):
+            return {}
+        with open(path, "rb") as f:
+            data = f.read()
+        states = {}
+        for line in data[:_complete_length(data)].decode("utf-8").splitlines():
+            if not line:
+                continue
+            record = json.loads(line)
+            states.setdefault(record["key"], {})[record["state"]] = record["value"]
+        return states
+
+
+def _complete_length(data: bytes) -> int:
+    # 到最后一个换行为止，中断时写了一半的行不算
+    return data.rfind(b"\n") + 1
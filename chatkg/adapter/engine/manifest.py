@@ -0,0 +1,137 @@
+"""
+增量构建清单：记录上一次构建时每个源文件的 mtime/size 与每一节的内容哈希，以及各节成功的抽取结果，
+下一次构建时未变化的文件不再读取，未变化的节直接复用上次的 InfoTreeTaskResult
+"""
+import hashlib
+import json
+import os
+from logging import getLogger
+from typing import Dict, List
+
+logger = getLogger(__name__)
+
+manifest_file_name = "manifest.json"
+manifest_version = 1
+
+
+def section_hash(title_path: List[str], content: str) -> str:
+    # 标题路径与正文都会进入 prompt，二者之一变化即视为新的一节
+    digest = hashlib.sha1()
+    for title in title_path:
+        digest.update(title.encode("utf-8"))
+        digest.update(b"\x1f")
+    digest.update(b"\x1e")
+    digest.update(content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def fingerprint(*parts: str) -> str:
+    # prompt 模板、模型等影响抽取结果的配置，变化后清单整体失效
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def _title_key(title_path: List[str]) -> str:
+    return "/".join(title_path)
+
+
+class BuildManifest:
+    """
+    files:   源文件路径 -> {"mtime": ..., "size": ..., "sections": {标题路径: 节哈希}, "units": [task_key, ...]}
+    results: task_key -> 成功 task 的 dump_dict()
+    一个 task 通常对应一节，此时 task_key 即节哈希；启用 ChunkPlanner 时一个 task 可能包含多节或一节的一部分
+    每次构建从上一次的清单（previous）出发，只把本次仍然存在的文件与节写入新清单
+    """
+    path: str
+    fingerprint: str
+    files: Dict[str, dict]
+    results: Dict[str, dict]
+
+    def __init__(self, path: str, fingerprint: str, previous: dict | None = None):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.files = {}
+        self.results = {}
+        self._previous_files = {}
+        self._previous_results = {}
+        if previous:
+            if previous.get("version") != manifest_version or previous.get("fingerprint") != fingerprint:
+                logger.info("Build manifest is outdated, all sections will be extracted again")
+            else:
+                self._previous_files = previous.get("files", {})
+                self._previous_results = previous.get("results", {})
+
+    @classmethod
+    def load(cls, work_dir: str, fingerprint: str) -> "BuildManifest":
+        path = os.path.join(work_dir, manifest_file_name)
+        previous = None
+        if os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    previous = json.load(f)
+            except ValueError:
+                logger.warning(f"Build manifest {path} is corrupted, all sections will be extracted again")
+        return cls(path, fingerprint, previous)
+
+    @staticmethod
+    def _stat(file: str) -> dict:
+        stat = os.stat(file)
+        return {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+    def reuse_file(self, file: str) -> List[dict] | None:
+        """
+        文件自上次构建后未被修改，且每一节都有成功的结果时，直接返回这些结果，无需重新读取
+        :return: 各节 task 的 dump_dict() 列表；需要重新读取时返回 None
+        """
+        previous = self._previous_files.get(file)
+        if previous is None or self._stat(file) != {"mtime": previous["mtime"], "size": previous["size"]}:
+            return None
+        units = previous["units"]
+        if not all(task_key in self._previous_results for task_key in units):
+            return None
+        self.files[file] = previous
+        reused = []
+        for task_key in units:
+            self.results[task_key] = self._previous_results[task_key]
+            reused.append(self._previous_results[task_key])
+        return reused
+
+    def _file_entry(self, file: str) -> dict:
+        if file not in self.files:
+            self.files[file] = {**self._stat(file), "sections": {}, "units": []}
+        return self.files[file]
+
+    def record_section(self, file: str | None, title_path: List[str], content_hash: str):
+        # 记录本次构建中的一节
+        if file is not None:
+            self._file_entry(file)["sections"][_title_key(title_path)] = content_hash
+
+    def record_unit(self, file: str | None, task_key: str) -> dict | None:
+        """
+        记录本次构建中的一个 task
+        :return: 内容未变化时返回上次成功 task 的 dump_dict()，否则返回 None
+        """
+        if file is not None:
+            self._file_entry(file)["units"].append(task_key)
+        reused = self._previous_results.get(task_key)
+        if reused is not None:
+            self.results[task_key] = reused
+        return reused
+
+    def record_result(self, task_key: str, task_dict: dict):
+        self.results[task_key] = task_dict
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": manifest_version,
+                "fingerprint": self.fingerprint,
+                "files": self.files,
+                "results": self.results
+            }, f, ensure_ascii=False)
+        # 写完再替换，中断时不会留下不完整的清单
+        os.replace(tmp_path, self.path)
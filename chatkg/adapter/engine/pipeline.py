@@ -0,0 +1,130 @@
+"""
+有界队列的多线程流水线：生产线程从输入迭代器中取数据，多个工作线程并发处理，结果按完成顺序交出
+队列有界，输入迭代器（如流式读取、构造 task）的推进速度受限于下游的消费速度，内存占用与语料大小无关
+"""
+import json
+import os
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, Tuple
+
+# 生产线程、工作线程结束的标记
+_DONE = object()
+# 阻塞的 put/get 每隔这么久检查一次是否已经停止
+_POLL_INTERVAL = 0.1
+
+
+def stream_map(func: Callable, items: Iterable, workers: int = 4,
+               queue_size: int | None = None) -> Iterator[Tuple[object, object, BaseException | None]]:
+    """
+    :param func: 在工作线程中对每个输入调用，通常是阻塞的网络请求
+    :param workers: 工作线程数
+    :param queue_size: 输入队列与结果队列的容量，默认为 workers 的两倍；同时在流水线中的输入不超过 2 * queue_size + workers 个
+    :return: 按完成顺序交出 (输入, 结果, 异常)，func 抛出异常时结果为 None，异常不会中断流水线
+    """
+    if workers < 1:
+        raise ValueError(f"Invalid workers: {workers}, should be a positive integer")
+    queue_size = queue_size or workers * 2
+    inputs, outputs = queue.Queue(queue_size), queue.Queue(queue_size)
+    stopped = threading.Event()
+    # 生产线程的异常，以及工作线程中 func 抛出的 BaseException（如 SystemExit），由消费方在结束时重新抛出
+    errors = []
+
+    def put(target: queue.Queue, item) -> bool:
+        # 消费方提前退出时不再阻塞在满的队列上
+        while not stopped.is_set():
+            try:
+                target.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(inputs, item):
+                    return
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            for _ in range(workers):
+                put(inputs, _DONE)
+
+    def work():
+        try:
+            while not stopped.is_set():
+                try:
+                    item = inputs.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                try:
+                    output = (item, func(item), None)
+                except Exception as e:
+                    output = (item, None, e)
+                if not put(outputs, output):
+                    return
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            # 无论如何退出都要交出结束标记，否则消费方会一直等待
+            put(outputs, _DONE)
+
+    threads = [threading.Thread(target=produce, name="stream-map-producer", daemon=True)]
+    threads += [threading.Thread(target=work, name=f"stream-map-worker-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    finished = 0
+    try:
+        while finished < workers:
+            output = outputs.get()
+            if output is _DONE:
+                finished += 1
+            else:
+                yield output
+        if errors:
+            raise errors[0]
+    finally:
+        stopped.set()
+        for thread in threads:
+            thread.join()
+
+
+class JsonListWriter:
+    """
+    逐项写出 json 列表，结果与 json.dump(列表, indent=2, ensure_ascii=False) 一致，不需要在内存中保留整个列表
+    先写入临时文件，正常结束时再替换目标文件，中途出错不会留下不完整的 json
+    collect 为 True 时同时在 items 中保留写出的各项
+    """
+
+    def __init__(self, path: str, collect: bool = False):
+        self.path = path
+        self.count = 0
+        self.items = [] if collect else None
+        self._tmp_path = f"{path}.tmp"
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self._tmp_path, "w", encoding="utf-8")
+        self._file.write("[")
+        return self
+
+    def write(self, item):
+        text = json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        self._file.write(("\n  " if self.count == 0 else ",\n  ") + text)
+        self.count += 1
+        if self.items is not None:
+            self.items.append(item)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            # 出错时保留原有的目标文件，丢弃写了一半的临时文件
+            self._file.close()
+            os.remove(self._tmp_path)
+            return False
+        self._file.write("\n]" if self.count else "]")
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return False
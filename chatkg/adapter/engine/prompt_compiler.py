@@ -0,0 +1,140 @@
+"""
+预编译的 prompt 渲染：模板只解析一次，常量（如输出格式）在编译时代入，渲染时把各片段追加到同一个缓冲区后一次拼接，
+同时给出每个 prompt 的字节数与估算的 token 数
+模板语法与 PromptTemplate.from_template 的 f-string 格式一致：{name} 为变量，{{ 与 }} 为转义的花括号
+"""
+from string import Formatter
+from typing import Iterable, List, Tuple
+
+from chatkg.adapter.engine.chunk_planner import ChunkUnit
+from chatkg.utils.tokens import estimate_tokens_from_size
+
+
+class CompiledTemplate:
+    """
+    解析后的模板：字面片段与变量名交替排列，字面片段的字节数与字符数预先算好
+    """
+    __slots__ = ("template", "variables", "_parts")
+
+    def __init__(self, template: str, **constants):
+        """
+        :param constants: 编译时就代入的变量，渲染时不再需要提供
+        """
+        self.template = template
+        parts = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(template):
+            if literal:
+                parts.append(literal)
+            if field_name is None:
+                continue
+            if format_spec or conversion:
+                raise ValueError(f"Format spec and conversion are not supported in prompt templates: {{{field_name}}}")
+            if field_name in constants:
+                parts.append(str(constants[field_name]))
+            else:
+                parts.append(_Variable(field_name))
+        # 相邻的字面片段合并，并预先计算统计量
+        self._parts = []
+        for part in parts:
+            if isinstance(part, str) and self._parts and isinstance(self._parts[-1], _Literal):
+                part = self._parts.pop().text + part
+            self._parts.append(_Literal(part) if isinstance(part, str) else part)
+        self.variables = [part.name for part in self._parts if isinstance(part, _Variable)]
+
+    def render_into(self, buffer: list, stats: list, values: dict):
+        """
+        把渲染结果的各片段追加到 buffer，并把字节数与字符数累加到 stats = [bytes, chars]
+        变量值可以是字符串，也可以是已经渲染好的 (片段列表, [bytes, chars])，后者直接并入
+        """
+        for part in self._parts:
+            if isinstance(part, _Literal):
+                buffer.append(part.text)
+                stats[0] += part.bytes
+                stats[1] += part.chars
+                continue
+            value = values[part.name]
+            if isinstance(value, tuple):
+                pieces, value_stats = value
+                buffer.extend(pieces)
+                stats[0] += value_stats[0]
+                stats[1] += value_stats[1]
+            else:
+                value = str(value)
+                buffer.append(value)
+                stats[0] += len(value.encode("utf-8"))
+                stats[1] += len(value)
+
+    def render(self, **values) -> str:
+        buffer = []
+        self.render_into(buffer, [0, 0], values)
+        return "".join(buffer)
+
+
+class _Literal:
+    __slots__ = ("text", "bytes", "chars")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.bytes = len(text.encode("utf-8"))
+        self.chars = len(text)
+
+
+class _Variable:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class RenderedPrompt:
+    """
+    渲染好的 user prompt，以及其 utf-8 字节数与估算的 token 数
+    """
+    __slots__ = ("text", "bytes", "tokens")
+
+    def __init__(self, text: str, n_bytes: int, tokens: int):
+        self.text = text
+        self.bytes = n_bytes
+        self.tokens = tokens
+
+    def __str__(self):
+        return self.text
+
+
+class PromptCompiler:
+    """
+    抽取任务的 user prompt：插入语依次为公共的上级标题、每一节的标题与正文，再代入 prompt 模板
+    每一级标题的插入语在编译时就代入了级别名称，渲染时只需代入标题与正文
+    """
+
+    def __init__(self,
+                 prompt_template: str,
+                 insertion_template: str,
+                 level_names: List[str],
+                 content_name: str,
+                 output_format: str):
+        self.prompt = CompiledTemplate(prompt_template, output_format=output_format)
+        self.level_insertions = [CompiledTemplate(insertion_template, level_name=name) for name in level_names]
+        self.content_insertion = CompiledTemplate(insertion_template, level_name=content_name)
+
+    def render(self, parent_path: List[str], sections: Iterable[Tuple[List[str], str]]) -> RenderedPrompt:
+        insertion, insertion_stats = [], [0, 0]
+        for i, title in enumerate(parent_path):
+            self.level_insertions[i].render_into(insertion, insertion_stats, {"level_content": title})
+        for title_path, content in sections:
+            self.level_insertions[len(title_path) - 1].render_into(insertion, insertion_stats,
+                                                                   {"level_content": title_path[-1]})
+            self.content_insertion.render_into(insertion, insertion_stats, {"level_content": content})
+        buffer, stats = [], [0, 0]
+        self.prompt.render_into(buffer, stats, {"insertion": (insertion, insertion_stats)})
+        return RenderedPrompt("".join(buffer), stats[0], estimate_tokens_from_size(stats[1], stats[0]))
+
+    def render_section(self, title_path: List[str], content: str) -> RenderedPrompt:
+        # 单独一节：全部上级标题，然后是本节标题与正文
+        return self.render(title_path[:-1], [(title_path, content)])
+
+    def render_unit(self, unit: ChunkUnit) -> RenderedPrompt:
+        return self.render(unit.parent_path, unit.sections)
+
+    def render_many(self, units: Iterable[ChunkUnit]) -> List[RenderedPrompt]:
+        return [self.render_unit(unit) for unit in units]
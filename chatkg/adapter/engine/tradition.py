@@ -1,17 +1,24 @@
 import os
+from functools import partial
+from typing import Any, ClassVar, Tuple
 
-from pydantic import model_validator
-from tqdm import tqdm
+from pydantic import Field, model_validator
 from logging import getLogger
 from chatkg.adapter.engine.base import BaseEngine
-from langchain_core.prompts import PromptTemplate
+from chatkg.adapter.engine.manifest import BuildManifest, section_hash, fingerprint
+from chatkg.adapter.engine.chunk_planner import ChunkPlanner, ChunkUnit, locate_entity
+from chatkg.adapter.engine.graph_writer import GraphWriter
+from chatkg.adapter.engine.journal import OUTPUT, RESULT, SUBMITTED, TaskJournal, journal_file_name
+from chatkg.adapter.engine.pipeline import JsonListWriter, stream_map
+from chatkg.adapter.engine.prompt_compiler import PromptCompiler
+from chatkg.adapter.structure.ColumnarForest import ColumnarForest
 from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult, tree_task_serialize
-from chatkg.adapter.task_model.zhipu import TaskZhipuAI
-from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+from chatkg.adapter.task_model.stream_json import StreamExtractor
 from chatkg.adapter.engine.support_config import TRADITION_SUPPORT
 
 
 import json
+import threading
 import warnings
 
 default_system_prompt = (
@@ -74,6 +81,10 @@ default_output_format = """
     }
 """
 
+# 模板只解析一次，所有 task 共用
+default_prompt_compiler = PromptCompiler(default_prompt_template, default_insertion_template, default_level_names,
+                                         default_content_names, default_output_format)
+
 logger = getLogger(__name__)
 
 tree_type = ["tree", "info_tree", "Tree", "InfoTree"]
@@ -81,13 +92,53 @@ raw_type = ["raw", "Raw", "RAW"]
 
 support_struct_types = tree_type
 
+snapshot_file_name = "forest.snapshot"
+
 
 class TraditionEngine(BaseEngine):
+    # 流式读取：reader 逐文件交出 InfoTree，按文件分批构造、执行 task，不再一次性持有整个语料
+    lazy_reading: bool = Field(default=False)
+    # 增量构建：在 work_dir 中维护构建清单，只为新增或变化的节构造 task，未变化的节复用上次的结果
+    incremental: bool = Field(default=False)
+    # 按 token 预算打包小节、切分大节，不提供时每个有正文的节一个 task
+    chunk_planner: ChunkPlanner | None = Field(default=None)
+    # 读取结果保存为 work_dir 中的二进制快照，源文件与 reader 配置未变化时直接加载，不再解析；流式读取时不生效
+    snapshot: bool = Field(default=False)
+    # 流式流水线：边读取边构造 task，并发调用 llm，每个结果完成即解析、写入 result.json 与图数据库，
+    # 各阶段之间是有界队列，内存占用与语料大小无关；隐含流式读取，result.json 中的结果按完成顺序排列
+    streaming: bool = Field(default=False)
+    # 流式流水线中并发调用 llm 的线程数与队列容量
+    llm_workers: int = Field(default=4, ge=1)
+    queue_size: int = Field(default=16, ge=1)
+    # 图数据库（BaseDatabase 或 {"type": 注册名, ...参数} 形式的配置），提供时抽取结果在构建过程中即写入
+    graph: Any = Field(default=None)
+    components: ClassVar[Tuple[Tuple[str, str], ...]] = BaseEngine.components + (("graph", "database"),)
+    # 每累计多少个结果写一次图数据库
+    graph_batch_size: int = Field(default=8, ge=1)
+    # llm 流式返回时（如 TaskOpenAI(stream=True)），生成过程中闭合的实体与关系随生成解析，task 校验通过后写入图数据库，每累计多少条写一次
+    graph_stream_batch_size: int = Field(default=32, ge=1)
+    # task 日志：在 work_dir 中逐条记录 task 的提交、输出与结果，构建中断后可以用 resume 继续；
+    # 日志随构建不断增长，默认关闭，需要中断后继续的大批量构建再开启
+    journal: bool = Field(default=False)
+
     _final_result: list = []
+    _manifest: BuildManifest | None = None
+    _reused_result: list = []
+    _journal: TaskJournal | None = None
+    # resume 时从日志恢复的 task 状态：task_key -> {状态: 值}
+    _resume_state: dict | None = None
+    _graph_writer: GraphWriter | None = None
+    # 流式返回中各 task 的增量解析器：id(task) -> StreamExtractor，解析出的条目暂存其中，直到 task 的结果写入或丢弃
+    _extractors: dict = {}
+    _extractors_lock: Any = None
 
     _execute_success_cnt: int = 0
+    _execute_reused_cnt: int = 0
     _execute_unprocessed_cnt: int = 0
     _execute_failed_cnt: int = 0
+    # 本次构造的 prompt 的总字节数与估算的总 token 数
+    _execute_prompt_bytes: int = 0
+    _execute_prompt_tokens: int = 0
 
     @model_validator(mode="before")
     def validate_struct_type(cls, values):
@@ -101,96 +152,385 @@ class TraditionEngine(BaseEngine):
         return values
 
     def _execute_reader(self, **reader_kwargs):
-        # 读取文件，构造 InfoTree
-        return self.reader.indexing()
+        # 读取文件，构造 InfoTree；流式读取时返回逐个交出 InfoTree 的生成器；files 用于只读取部分文件
+        files = reader_kwargs.get("files")
+        if self.lazy_reading:
+            return self.reader.iter_indexing(files=files)
+        reader = self.reader if files is None else self.reader.model_copy(update={"file": files})
+        if self.snapshot:
+            return self._load_snapshot(reader)
+        return reader.indexing()
+
+    def _load_snapshot(self, reader):
+        # 快照的指纹包含 reader 的配置与要读取的文件列表，任一变化都重新解析
+        snapshot_path = os.path.join(self.work_dir, snapshot_file_name)
+        snapshot_fp = fingerprint(type(reader).__name__, reader.model_dump_json(exclude={"file"}), *reader.file)
+        forest = ColumnarForest.load(snapshot_path, snapshot_fp)
+        if forest is not None:
+            logger.info(f"Parsed forest loaded from snapshot {snapshot_path}")
+            return forest
+        forest = reader.indexing()
+        os.makedirs(self.work_dir, exist_ok=True)
+        forest.save(snapshot_path, snapshot_fp)
+        return forest
+
+    def _load_manifest(self):
+        # 加载构建清单，返回需要重新读取的文件，未变化文件的结果直接复用
+        self._manifest = BuildManifest.load(self.work_dir, fingerprint(
+            default_system_prompt, default_prompt_template, default_insertion_template, default_output_format,
+            getattr(self.llm, "llm_name", None),
+            self.chunk_planner.model_dump_json() if self.chunk_planner else None
+        ))
+        files = []
+        for file in self.reader.file:
+            reused = self._manifest.reuse_file(file)
+            if reused is None:
+                files.append(file)
+            else:
+                self._reused_result.extend(reused)
+        return files
 
     def _execute_task_maker(self, info):
-        # 初始化 task 列表
-        tasks = []
-        # 遍历 info 树，构造 task
+        return list(self._iter_task_maker(info))
+
+    def _iter_task_maker(self, info):
+        # 遍历 info 树，逐个构造 task，info 可以是 InfoForest 或 ColumnarForest，也可以是交出 InfoTree 的生成器
         for info_tree in info:
-            for node_title_list, node_content in info_tree:
-                if not node_content:
+            for unit in self._iter_units(info_tree):
+                task_key = unit.key
+                # 增量构建时，内容未变化的 task 直接复用上次的结果
+                if self._manifest is not None:
+                    for node_title_list, node_content in unit.sections:
+                        self._manifest.record_section(info_tree.source, node_title_list,
+                                                      section_hash(node_title_list, node_content))
+                    reused = self._manifest.record_unit(info_tree.source, task_key)
+                    if reused is not None:
+                        self._reused_result.append(reused)
+                        continue
+                state = self._resume_state.get(task_key, {}) if self._resume_state else {}
+                # 恢复构建时，中断前已经有结果的 task 直接复用
+                if RESULT in state:
+                    if self._manifest is not None and state[RESULT]["task_status"] == "SUCCESS":
+                        self._manifest.record_result(task_key, state[RESULT])
+                    self._reused_result.append(state[RESULT])
                     continue
-                # 1. 准备插入语，准备路径数组
-                source_list = []
-                temp_insertions = ""
-                for i, title in enumerate(node_title_list):
-                    temp_insertions += default_insertion_template.format(level_name=default_level_names[i],
-                                                                         level_content=title)
-                    source_list.append(title)
-                temp_insertions += default_insertion_template.format(level_name=default_content_names,
-                                                                     level_content=node_content)
-                # 2. 准备 prompt
-                temp_prompt = (PromptTemplate
-                               .from_template(default_prompt_template)
-                               .invoke({"insertion": temp_insertions, "output_format": default_output_format})
-                               .to_string())
-
-                # 3. 构建 task，填补 prompt 添加到 tasks 列表中
-                temp_task_result = InfoTreeTaskResult(source=source_list, entity=[], relation=[])
-                temp_task = InfoTreeTask(task_system_prompt=default_system_prompt,
-                                         task_user_prompt=temp_prompt,
-                                         task_result=temp_task_result,
-                                         task_id=None, task_status="UNPROCESS")
-                tasks.append(temp_task)
-        return tasks
+                task = self._make_task(unit, task_key)
+                # 已有输出的只需重新整理，已提交的异步任务只需重新取结果
+                if OUTPUT in state:
+                    task.task_output = state[OUTPUT]
+                elif SUBMITTED in state:
+                    task.task_id = state[SUBMITTED]
+                self._execute_prompt_bytes += task.task_prompt_bytes
+                self._execute_prompt_tokens += task.task_prompt_tokens
+                yield task
+
+    def _iter_units(self, info_tree):
+        # 默认每个有正文的节一个 task；配置了 chunk_planner 时按 token 预算打包、切分
+        sections = ((node_title_list, node_content) for node_title_list, node_content in info_tree if node_content)
+        if self.chunk_planner is not None:
+            yield from self.chunk_planner.plan(sections)
+        else:
+            for section in sections:
+                yield ChunkUnit([section])
+
+    @staticmethod
+    def _make_task(unit: ChunkUnit, task_key=None):
+        # 1. 渲染 prompt：公共的上级标题，然后是每一节的标题与正文
+        prompt = default_prompt_compiler.render_unit(unit)
+
+        # 2. 构建 task，source 为标题路径（打包时为各节共同的上级标题路径，各节的标题路径在 sources 中）
+        temp_task_result = InfoTreeTaskResult(source=unit.source, sources=unit.sources, entity=[], relation=[])
+        return InfoTreeTask(task_system_prompt=default_system_prompt,
+                            task_user_prompt=prompt.text,
+                            task_result=temp_task_result,
+                            task_id=None, task_key=task_key, task_status="UNPROCESS",
+                            task_prompt_bytes=prompt.bytes, task_prompt_tokens=prompt.tokens,
+                            task_sections=unit.sections if unit.sources is not None else None)
+
+    def _iter_task_batches(self, info):
+        # 流式读取时一棵树（一个文件）一批，否则整个语料一批
+        if self.lazy_reading:
+            for info_tree in info:
+                yield self._execute_task_maker([info_tree])
+        else:
+            yield self._execute_task_maker(info)
+
+    def _execute_tasks(self, tasks, progress_bar=None):
+        # 执行任务
+        self._call_llm(tasks, progress_bar=progress_bar)
+        # 整理输出
+        for task in tasks:
+            self._postprocess_task(task)
+
+    def _call_llm(self, tasks, progress_bar=None):
+        # 恢复构建时已有输出的 task 不再请求
+        pending = [task for task in tasks if task.task_output is None]
+        if progress_bar is not None and len(pending) < len(tasks):
+            progress_bar.update(len(tasks) - len(pending))
+        if not pending:
+            return
+        kwargs = {"progress_bar": progress_bar}
+        # 已记下输出的 task，每个 task 只记一次
+        recorded = set()
+        if self._journal is not None:
+            kwargs["on_submit"] = self._record_submitted
+            kwargs["on_complete"] = lambda task: self._record_output(task, recorded)
+        if self._graph_writer is not None:
+            kwargs["on_delta"] = self._write_streamed
+        try:
+            self.llm.execute_task(pending, **kwargs)
+        finally:
+            # 模型没有回调 on_complete 时在这里补记；出错中断时已经有输出的 task 同样记下，恢复构建时不再请求
+            if self._journal is not None:
+                for task in pending:
+                    if task.task_output is not None:
+                        self._record_output(task, recorded)
+
+    def _write_streamed(self, task, delta: str):
+        # 由 llm 在流式返回时回调，闭合的实体与关系暂存在解析器中，task 校验通过后才写入图数据库（见 _record_task）
+        extractor = self._extractors.get(id(task))
+        if extractor is None:
+            with self._extractors_lock:
+                extractor = self._extractors.setdefault(id(task), StreamExtractor())
+        extractor.feed(delta)
+
+    def _take_extractor(self, task) -> StreamExtractor | None:
+        # 取走 task 的解析器，每个 task 的结果写入或丢弃时都要取走，id 之后可能被其他 task 复用
+        if self._graph_writer is None:
+            return None
+        with self._extractors_lock:
+            return self._extractors.pop(id(task), None)
+
+    def _record_submitted(self, task):
+        # 由 llm 在提交异步任务后回调
+        self._journal.record(task.task_key, SUBMITTED, task.task_id)
+
+    def _record_output(self, task, recorded: set):
+        # 由 llm 在每个 task 得到输出后回调，输出随即写入日志，中途出错时已完成的 task 不会丢失
+        if id(task) not in recorded:
+            recorded.add(id(task))
+            self._journal.record(task.task_key, OUTPUT, task.task_output)
+
+    def _record_task(self, task, graph_writer=None) -> dict:
+        # 整理完成的 task 写入日志、构建清单与图数据库，返回写入 result.json 的内容
+        task_dict = task.dump_dict()
+        if self._journal is not None:
+            self._journal.record(task.task_key, RESULT, task_dict)
+        # 校验未通过（UNPROCESSED）的 task 生成过程中解析出的条目直接丢弃
+        extractor = self._take_extractor(task)
+        if task.task_status == "SUCCESS":
+            if self._manifest is not None:
+                self._manifest.record_result(task.task_key, task_dict)
+            if graph_writer is not None:
+                # 先写入生成过程中已解析的条目，完整的结果再补上其余部分，已写入的跳过
+                for event in extractor.events if extractor is not None else []:
+                    source = task.task_result.source_of(event[1]) if event[0] == "entity" else None
+                    graph_writer.write_streamed(event, source)
+                graph_writer.write(task.task_result)
+        return task_dict
+
+    @staticmethod
+    def _entity_source(task, entity_name: str):
+        # 打包的请求中实体所在的节，无法确定时为 task 的来源
+        if task.task_sections:
+            return locate_entity(task.task_sections, entity_name) or task.task_result.source
+        return task.task_result.source
+
+    def _postprocess_task(self, task):
+        try:
+            task.task_result.entity = task.task_output["知识实体"]
+            task.task_result.relation = task.task_output["实体关系"]
+            task.task_status = "SUCCESS"
+            self._execute_success_cnt += 1
+            # 打包的请求中的实体对应回各自的节
+            if task.task_sections and isinstance(task.task_result.entity, dict):
+                task.task_result.entity_sources = {
+                    name: self._entity_source(task, name) for name in task.task_result.entity}
+        except (KeyError, TypeError):
+            warnings.warn(f"Task {task.task_id} failed")
+            task.task_result.others = task.task_output
+            task.task_status = "UNPROCESSED"
+            self._execute_unprocessed_cnt += 1
+            # TODO 修复：嵌套pydantic json序列化问题——对于info，不要pydantic了！！
+            temp_dict = tree_task_serialize(task)
+            with open(f"{self.work_dir}/unprocessed_{self._execute_unprocessed_cnt}.json",
+                      "w", encoding="utf-8") as f:
+                json.dump(temp_dict, f, indent=2, ensure_ascii=False)
+        # 整理后不再需要各节的正文
+        task.task_sections = None
+
+    def _take_reused_result(self) -> list:
+        # 流式流水线中复用的结果由生产线程追加，这里只取走已有的部分
+        count = len(self._reused_result)
+        reused = self._reused_result[:count]
+        del self._reused_result[:count]
+        self._execute_reused_cnt += count
+        return reused
+
+    def _flush_reused_result(self, final_res: list):
+        # 复用的结果直接输出
+        final_res.extend(self._take_reused_result())
+
+    def _get_graph_writer(self) -> GraphWriter | None:
+        if self.graph is None:
+            return None
+        self._graph_writer = GraphWriter(self.graph, self.graph_batch_size, self.graph_stream_batch_size)
+        self._extractors = {}
+        self._extractors_lock = threading.Lock()
+        return self._graph_writer
+
+    def _execute_streaming(self, files=None):
+        from tqdm import tqdm
+        executing_tasks_progress = tqdm(total=0, desc="Executing tasks")
+
+        def counted(tasks):
+            # 在生产线程中随构造累加进度条总数
+            for task in tasks:
+                executing_tasks_progress.total += 1
+                executing_tasks_progress.refresh()
+                yield task
+
+        tasks = counted(self._iter_task_maker(self.reader.iter_indexing(files=files)))
+        execute_single = partial(self._call_llm, progress_bar=executing_tasks_progress)
+        graph_writer = self._get_graph_writer()
+        urgent_res = []
+        # 与非流式构建一样，写入 result.json 的结果同时保留在 _final_result 中
+        with JsonListWriter(f"{self.work_dir}/result.json", collect=True) as result_writer:
+            for task, _, error in stream_map(lambda task: execute_single([task]), tasks,
+                                             workers=self.llm_workers, queue_size=self.queue_size):
+                if error is not None:
+                    # 未完成的 task 不记录结果，resume 时会重新执行
+                    self._take_extractor(task)
+                    task_dict = task.dump_dict()
+                    urgent_res.append(task_dict)
+                    warnings.warn(f"Unexpected exception occur: {error}")
+                else:
+                    self._postprocess_task(task)
+                    task_dict = self._record_task(task, graph_writer)
+                result_writer.write(task_dict)
+                for reused in self._take_reused_result():
+                    result_writer.write(reused)
+            for reused in self._take_reused_result():
+                result_writer.write(reused)
+        self._final_result = result_writer.items
+        if graph_writer is not None:
+            graph_writer.close()
+        if urgent_res:
+            with open(f"{self.work_dir}/urgent_save.json", "w", encoding="utf-8") as f:
+                json.dump(urgent_res, f, indent=2, ensure_ascii=False)
+            warnings.warn(f"Tasks has urgently saved in {self.work_dir}")
+        return executing_tasks_progress
 
     def execute(self, **kwargs):
+        return self._run()
+
+    def resume(self, work_dir: str | None = None):
+        """
+        按 work_dir 中的 task 日志继续中断的构建：有结果的 task 直接复用，已提交的异步任务重新取结果，其余重新请求
+        """
+        if work_dir is not None:
+            self.work_dir = work_dir
+        return self._run(TaskJournal.replay(os.path.join(self.work_dir, journal_file_name)))
+
+    def _run(self, resume_state: dict | None = None):
         # 0 造工作目录
         os.makedirs(self.work_dir, exist_ok=True)
-        # 1 调用 reader
-        info = self._execute_reader()
-        # 根据每一个 info 节点构造一个 task
-        tasks = self._execute_task_maker(info)
-        # 2. 调用 TaskLLM，构建知识图谱
-        executing_tasks_progress = tqdm(total=info.count_node(), desc="Executing tasks")
+        self._resume_state = resume_state
+        if self.journal:
+            self._journal = TaskJournal(os.path.join(self.work_dir, journal_file_name), resume=resume_state is not None)
         try:
-            # 执行任务
-            self.llm.execute_task(tasks, progress_bar=executing_tasks_progress)
-            # 整理输出
-            for task in tasks:
-                try:
-                    task.task_result.entity = task.task_output["知识实体"],
-                    task.task_result.relation = task.task_output["实体关系"]
-                    task.task_status = "SUCCESS"
-                    self._execute_success_cnt += 1
-                except KeyError:
-                    warnings.warn(f"Task {task.task_id} failed")
-                    task.task_result.others = task.task_result
-                    task.task_status = "UNPROCESSED"
-                    self._execute_unprocessed_cnt += 1
-                    # TODO 修复：嵌套pydantic json序列化问题——对于info，不要pydantic了！！
-                    temp_dict = tree_task_serialize(task)
-                    json.dump(temp_dict, open(f"{self.work_dir}/unprocessed_{self._execute_unprocessed_cnt}.json",
-                                                     "w", encoding="utf-8"), indent=2, ensure_ascii=False)
-        except Exception as e:
-            dump_dict = []
-            for task in tasks:
-                dump_dict.append(tree_task_serialize(task))
-                json.dump(tree_task_serialize(dump_dict), open(f"{self.work_dir}/urgent_save.json",
-                                          "w", encoding="utf-8"), indent=2,
-                          ensure_ascii=False)
-            warnings.warn(f"Unexpected exception occur: {e} \n Tasks has urgently saved in {self.work_dir}")
+            self._execute_build()
+        finally:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self._resume_state = None
+            self._graph_writer = None
+        return self
 
-        # 3. 最终转化输出
+    def _execute_build(self):
+        # 1 调用 reader，增量构建时只读取变化过的文件
+        files = self._load_manifest() if self.incremental else None
+        if self.streaming:
+            # 读取、构造 task、调用 llm、整理与写入结果同时进行
+            executing_tasks_progress = self._execute_streaming(files)
+            self._finish_execute(executing_tasks_progress)
+            return
+        info = self._execute_reader(files=files)
+        # 2. 根据每一个 info 节点构造 task，调用 TaskLLM，构建知识图谱
+        from tqdm import tqdm
+        executing_tasks_progress = tqdm(total=0, desc="Executing tasks")
+        graph_writer = self._get_graph_writer()
         final_res = []
-        for task in tasks:
-            final_res.append(task.dump_dict())
-            json.dump(final_res, open(f"{self.work_dir}/result.json", "w", encoding="utf-8"), indent=2,
-                      ensure_ascii=False)
+        urgent_res = []
+        for tasks in self._iter_task_batches(info):
+            self._flush_reused_result(final_res)
+            if not tasks:
+                continue
+            # 流式读取时总数未知，按批次累加
+            executing_tasks_progress.total += len(tasks)
+            executing_tasks_progress.refresh()
+            try:
+                self._execute_tasks(tasks, progress_bar=executing_tasks_progress)
+            except Exception as e:
+                # 未完成的 task 不记录结果，resume 时会重新执行
+                for task in tasks:
+                    self._take_extractor(task)
+                failed_res = [task.dump_dict() for task in tasks]
+                urgent_res.extend(failed_res)
+                final_res.extend(failed_res)
+                warnings.warn(f"Unexpected exception occur: {e}")
+                continue
+            # 3. 转化输出，流式读取时 task 在这里之后即可释放
+            for task in tasks:
+                final_res.append(self._record_task(task, graph_writer))
+        self._flush_reused_result(final_res)
+        if graph_writer is not None:
+            graph_writer.close()
+        if urgent_res:
+            with open(f"{self.work_dir}/urgent_save.json", "w", encoding="utf-8") as f:
+                json.dump(urgent_res, f, indent=2, ensure_ascii=False)
+            warnings.warn(f"Tasks has urgently saved in {self.work_dir}, use resume() to finish them")
+
+        # 4. 最终输出
+        with open(f"{self.work_dir}/result.json", "w", encoding="utf-8") as f:
+            json.dump(final_res, f, indent=2, ensure_ascii=False)
+        self._final_result = final_res
+        self._finish_execute(executing_tasks_progress)
+
+    def _finish_execute(self, executing_tasks_progress):
+        if self._manifest is not None:
+            self._manifest.save()
+            logger.info(f"Incremental build: {self._execute_reused_cnt} sections reused, "
+                        f"{executing_tasks_progress.total} sections extracted")
+        logger.info(f"Prompts: {executing_tasks_progress.total} tasks, {self._execute_prompt_bytes} bytes, "
+                    f"~{self._execute_prompt_tokens} tokens")
+        cache_stats = getattr(self.llm, "cache_stats", None)
+        if cache_stats is not None:
+            logger.info(f"LLM response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                        f"{cache_stats['entries']} entries, {cache_stats['bytes']} bytes")
+        coalesce_stats = getattr(self.llm, "coalesce_stats", None)
+        if coalesce_stats is not None and coalesce_stats["saved"]:
+            logger.info(f"Identical prompts coalesced: {coalesce_stats['saved']} LLM calls saved")
+        hedge_stats = getattr(self.llm, "hedge_stats", None)
+        if hedge_stats is not None:
+            logger.info(f"Hedged requests: {hedge_stats['fired']} fired, {hedge_stats['won']} won, "
+                        f"{hedge_stats['requests']} requests")
+        for backend in getattr(self.llm, "backend_stats", None) or []:
+            logger.info(f"LLM backend {backend['name']}: {backend['tasks']} tasks, {backend['errors']} errors, "
+                        f"{backend['ejections']} ejections")
         if self._execute_unprocessed_cnt > 0:
             warnings.warn(
                 f"Unprocessed tasks has saved in {self.work_dir}/unprocessed_x.json, you should check it and load it again "
                 f"by GraphBuilder.load_fixed_json()"
             )
-        self._final_result = final_res
         executing_tasks_progress.close()
-        return self
 
 
 if __name__ == '__main__':
     from dotenv import load_dotenv
+    from chatkg.adapter.task_model.zhipu import TaskZhipuAI
+    from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
     load_dotenv()
     task_llm = TaskZhipuAI(llm_name="glm-4-flash", api_key=os.getenv("ZHIPU_API_KEY"))
     task_reader = MarkdownReader(file="ch1.md", skip_mark="<abd>")
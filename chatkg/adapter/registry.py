@@ -0,0 +1,72 @@
+"""
+组件注册表：engine、task_model、reader、database 按名称注册为 "模块路径:类名"，第一次使用时才导入，
+避免 import chatkg 时就加载 zhipuai、langchain、neo4j 等重量级依赖
+"""
+import importlib
+from typing import Any, Dict, List
+
+_registry: Dict[str, Dict[str, Any]] = {
+    "engine": {
+        "tradition": "chatkg.adapter.engine.tradition:TraditionEngine",
+    },
+    "task_model": {
+        "zhipu": "chatkg.adapter.task_model.zhipu:TaskZhipuAI",
+        "local_hf": "chatkg.adapter.task_model.local_hf:TaskLocalHF",
+        "openai": "chatkg.adapter.task_model.openai_compat:TaskOpenAI",
+        "router": "chatkg.adapter.task_model.router:TaskRouter",
+    },
+    "reader": {
+        "markdown": "chatkg.utils.text_reader.MarkdownReader:MarkdownReader",
+    },
+    "database": {
+        "neo4j": "chatkg.adapter.database.GraphNeo4j:GraphNeo4j",
+    },
+}
+
+
+def register(kind: str, name: str, target: str | type):
+    """
+    注册组件
+    :param kind: 组件类别，engine、task_model、reader、database 或自定义类别
+    :param name: 组件名称
+    :param target: "模块路径:类名" 字符串（延迟导入），或已经导入的类
+    """
+    _registry.setdefault(kind, {})[name] = target
+
+
+def get(kind: str, name: str) -> type:
+    # 按名称取组件类，第一次取时导入并缓存
+    if kind not in _registry:
+        raise ValueError(f"Unknown component kind: {kind}, should be one of {list(_registry)}")
+    components = _registry[kind]
+    if name not in components:
+        raise ValueError(f"Unknown {kind}: {name}, should be one of {list(components)}")
+    target = components[name]
+    if isinstance(target, str):
+        target = import_target(target)
+        components[name] = target
+    return target
+
+
+def create(kind: str, name: str, **kwargs):
+    return get(kind, name)(**kwargs)
+
+
+def available(kind: str) -> List[str]:
+    return list(_registry.get(kind, {}))
+
+
+def import_target(target: str):
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr) if attr else module
+
+
+def lazy_getattr(module_name: str, exports: Dict[str, str], name: str):
+    """
+    供包的 __getattr__ 使用，第一次访问导出名称时才导入对应模块
+    :param exports: 导出名称 -> "模块路径:类名"
+    """
+    if name in exports:
+        return import_target(exports[name])
+    raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
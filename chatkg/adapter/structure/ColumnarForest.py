@@ -0,0 +1,437 @@
+"""
+列式存储的 InfoForest：所有树的节点按先序排列在若干并行数组中，标题与源文件路径驻留为编号，
+正文记录为源文件或内部缓冲区中的 (偏移, 长度)；节点数达到百万级时，内存只与节点数成线性的几十字节/节点
+
+各数组可以原样写入二进制快照（save/load），下一次构建在源文件未变化时直接加载，无需重新解析
+"""
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+from pydantic import ConfigDict, PrivateAttr
+
+from chatkg.adapter.structure.base import BaseStructure
+from chatkg.adapter.structure.InfoTree import InfoForest, InfoNode, InfoTree, SourceSpan, get_source_map
+
+# content_file 中的特殊值：无正文、正文在内部缓冲区中、正文由多个 SourceSpan 合并而成
+_NO_CONTENT = -1
+_TEXT = -2
+_MERGED = -3
+
+# 快照文件：文件头 (magic, 版本, 字节序, 元信息长度)，元信息 JSON，之后依次是各数组与字符串表
+snapshot_magic = b"CKGFORST"
+snapshot_version = 1
+_SNAPSHOT_HEADER = struct.Struct("<8sHBxQ")
+_SECTION_HEADER = struct.Struct("<cQ")
+# 按顺序写入快照的数组
+_SNAPSHOT_ARRAYS = ["_parent", "_level", "_title_id", "_subtree_end",
+                    "_content_file", "_content_offset", "_content_length", "_tree_roots"]
+
+
+class ColumnarForest(BaseStructure):
+    """
+    第 i 个节点的信息分布在各数组的第 i 项：
+    parent          父节点下标，根节点为 -1
+    level           标题层级
+    title_id        标题在 titles 中的编号
+    subtree_end     先序排列下子树结束的下标（不含），子树即 [i, subtree_end[i])
+    content_file    正文所在源文件在 files 中的编号，或 _NO_CONTENT/_TEXT/_MERGED
+    content_offset  正文的字节偏移；_MERGED 时为 merged_spans 中的下标
+    content_length  正文的字节长度；_MERGED 时为合并的 SourceSpan 个数
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    _parent: array = PrivateAttr(default_factory=lambda: array("i"))
+    _level: array = PrivateAttr(default_factory=lambda: array("i"))
+    _title_id: array = PrivateAttr(default_factory=lambda: array("i"))
+    _subtree_end: array = PrivateAttr(default_factory=lambda: array("i"))
+    _content_file: array = PrivateAttr(default_factory=lambda: array("i"))
+    _content_offset: array = PrivateAttr(default_factory=lambda: array("q"))
+    _content_length: array = PrivateAttr(default_factory=lambda: array("q"))
+    # 驻留的标题与源文件路径
+    _titles: List[str] = PrivateAttr(default_factory=list)
+    _title_ids: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _files: List[str] = PrivateAttr(default_factory=list)
+    _file_ids: Dict[str, int] = PrivateAttr(default_factory=dict)
+    # 字符串正文以 utf-8 存放在同一个缓冲区中
+    _text: bytearray = PrivateAttr(default_factory=bytearray)
+    _merged_spans: List[Tuple[int, int, int]] = PrivateAttr(default_factory=list)
+    # 每棵树的根节点下标与源文件
+    _tree_roots: array = PrivateAttr(default_factory=lambda: array("i"))
+    _tree_sources: List[str | None] = PrivateAttr(default_factory=list)
+
+    @classmethod
+    def from_forest(cls, forest) -> "ColumnarForest":
+        columnar = cls()
+        for tree in forest:
+            columnar.add_tree(tree)
+        return columnar
+
+    def add_tree(self, tree: InfoTree):
+        # 按先序把 InfoTree 的节点追加到各数组末尾，之后不再引用 tree
+        start = len(self._parent)
+        stack = [(tree.main_root, -1)]
+        while stack:
+            node, parent = stack.pop()
+            index = len(self._parent)
+            self._parent.append(parent)
+            self._level.append(node.level)
+            self._title_id.append(self._intern_title(node.title))
+            self._append_content(node._content)
+            stack.extend((child, index) for child in reversed(node.children))
+        # 先序中子节点总在父节点之后，倒序一遍即可得到每个子树的结束下标
+        end = len(self._parent)
+        subtree_end = array("i", range(start + 1, end + 1))
+        parent = self._parent
+        for index in range(end - 1, start, -1):
+            parent_index = parent[index] - start
+            if subtree_end[index - start] > subtree_end[parent_index]:
+                subtree_end[parent_index] = subtree_end[index - start]
+        self._subtree_end.extend(subtree_end)
+        self._tree_roots.append(start)
+        self._tree_sources.append(tree.source)
+
+    def _intern_title(self, title: str) -> int:
+        title_id = self._title_ids.get(title)
+        if title_id is None:
+            title_id = self._title_ids[title] = len(self._titles)
+            self._titles.append(title)
+        return title_id
+
+    def _intern_file(self, file: str) -> int:
+        file_id = self._file_ids.get(file)
+        if file_id is None:
+            file_id = self._file_ids[file] = len(self._files)
+            self._files.append(file)
+        return file_id
+
+    def _append_content(self, content):
+        if not content:
+            file_id, offset, length = _NO_CONTENT, 0, 0
+        elif isinstance(content, SourceSpan):
+            file_id, offset, length = self._intern_file(content.file), content.offset, content.length
+        elif isinstance(content, list) and all(isinstance(part, SourceSpan) for part in content):
+            file_id, offset, length = _MERGED, len(self._merged_spans), len(content)
+            self._merged_spans.extend((self._intern_file(span.file), span.offset, span.length) for span in content)
+        else:
+            # 字符串，或字符串与 SourceSpan 混合的片段列表（按 InfoNode.content 的方式拼接后存为文本）
+            if isinstance(content, list):
+                content = "".join(part if isinstance(part, str) else part.read() for part in content)
+            data = content.encode("utf-8")
+            file_id, offset, length = _TEXT, len(self._text), len(data)
+            self._text += data
+        self._content_file.append(file_id)
+        self._content_offset.append(offset)
+        self._content_length.append(length)
+
+    def save(self, path: str, fingerprint: str | None = None):
+        """
+        保存为二进制快照：各数组原样写入，标题、源文件路径等字符串各自拼成一个 utf-8 字符串表
+        :param fingerprint: 读取配置的指纹，加载时不一致则视为快照失效
+        """
+        meta = {
+            "fingerprint": fingerprint,
+            # 记录源文件的 mtime 与大小，任一源文件变化即视为快照失效（SourceSpan 也依赖源文件不变）
+            "sources": {file: _stat(file) for file in self._snapshot_sources()},
+            "node_cnt": len(self._parent),
+            "tree_cnt": len(self._tree_roots)
+        }
+        meta = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        byteorder = 0 if sys.byteorder == "little" else 1
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_SNAPSHOT_HEADER.pack(snapshot_magic, snapshot_version, byteorder, len(meta)))
+            f.write(meta)
+            for name in _SNAPSHOT_ARRAYS:
+                _write_array(f, getattr(self, name))
+            _write_array(f, array("q", [value for span in self._merged_spans for value in span]))
+            _write_strings(f, self._titles)
+            _write_strings(f, self._files)
+            # 没有源文件的树记为空字符串
+            _write_strings(f, [source or "" for source in self._tree_sources])
+            _write_array(f, array("B", self._text))
+        # 写完再替换，中断时不会留下不完整的快照
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str | None = None) -> "ColumnarForest | None":
+        """
+        一次读入整个快照，各数组直接从缓冲区复制
+        :return: 快照不存在、版本或指纹不一致、源文件已变化时返回 None
+        """
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            buf = memoryview(f.read())
+        if len(buf) < _SNAPSHOT_HEADER.size:
+            return None
+        magic, version, byteorder, meta_len = _SNAPSHOT_HEADER.unpack_from(buf)
+        if magic != snapshot_magic or version != snapshot_version:
+            return None
+        pos = _SNAPSHOT_HEADER.size
+        meta = json.loads(bytes(buf[pos:pos + meta_len]).decode("utf-8"))
+        pos += meta_len
+        if meta["fingerprint"] != fingerprint:
+            return None
+        for file, stat in meta["sources"].items():
+            if not os.path.isfile(file) or _stat(file) != stat:
+                return None
+        swap = byteorder != (0 if sys.byteorder == "little" else 1)
+        forest = cls()
+        for name in _SNAPSHOT_ARRAYS:
+            values, pos = _read_array(buf, pos, swap)
+            setattr(forest, name, values)
+        merged, pos = _read_array(buf, pos, swap)
+        forest._merged_spans = [tuple(merged[i:i + 3]) for i in range(0, len(merged), 3)]
+        forest._titles, pos = _read_strings(buf, pos, swap)
+        forest._title_ids = {title: i for i, title in enumerate(forest._titles)}
+        forest._files, pos = _read_strings(buf, pos, swap)
+        forest._file_ids = {file: i for i, file in enumerate(forest._files)}
+        sources, pos = _read_strings(buf, pos, swap)
+        forest._tree_sources = [source or None for source in sources]
+        text, pos = _read_array(buf, pos, swap)
+        forest._text = bytearray(text)
+        return forest
+
+    def _snapshot_sources(self) -> List[str]:
+        # 树的源文件与 SourceSpan 引用的文件
+        sources = dict.fromkeys(source for source in self._tree_sources if source)
+        sources.update(dict.fromkeys(self._files))
+        return [file for file in sources if os.path.isfile(file)]
+
+    def to_forest(self) -> InfoForest:
+        # 还原为 InfoNode 构成的 InfoForest，用于需要修改树的场景
+        forest = InfoForest(trees=[])
+        for tree in self:
+            root, end = tree.root_index, self._subtree_end[tree.root_index]
+            nodes = {}
+            for index in range(root, end):
+                node = InfoNode(title=self.title(index), content=self._raw_content(index), level=self._level[index])
+                nodes[index] = node
+                if index != root:
+                    nodes[self._parent[index]].add_child(node)
+            info_tree = InfoTree(nodes[root], source=tree.source)
+            info_tree.node_cnt = end - root - 1
+            forest.add_tree(info_tree)
+        return forest
+
+    def _raw_content(self, index: int):
+        # 与 InfoNode._content 相同的形式：字符串、SourceSpan 或 SourceSpan 列表
+        file_id = self._content_file[index]
+        if file_id == _TEXT or file_id == _NO_CONTENT:
+            return self.content(index)
+        offset, length = self._content_offset[index], self._content_length[index]
+        if file_id == _MERGED:
+            return [SourceSpan(self._files[span_file], span_offset, span_length)
+                    for span_file, span_offset, span_length in self._merged_spans[offset:offset + length]]
+        return SourceSpan(self._files[file_id], offset, length)
+
+    def title(self, index: int) -> str:
+        return self._titles[self._title_id[index]]
+
+    def content(self, index: int) -> str | None:
+        file_id = self._content_file[index]
+        if file_id == _NO_CONTENT:
+            return None
+        offset, length = self._content_offset[index], self._content_length[index]
+        if file_id == _TEXT:
+            return self._text[offset:offset + length].decode("utf-8")
+        if file_id == _MERGED:
+            return "".join(self._read_span(*span) for span in self._merged_spans[offset:offset + length])
+        return self._read_span(file_id, offset, length)
+
+    def _read_span(self, file_id: int, offset: int, length: int) -> str:
+        return get_source_map(self._files[file_id])[offset:offset + length].decode("utf-8")
+
+    def _ancestors(self, index: int) -> List[int]:
+        # 从根节点到 index 的父节点的下标
+        ancestors = []
+        index = self._parent[index]
+        while index >= 0:
+            ancestors.append(index)
+            index = self._parent[index]
+        ancestors.reverse()
+        return ancestors
+
+    def title_path(self, index: int) -> List[str]:
+        return [self.title(i) for i in self._ancestors(index)] + [self.title(index)]
+
+    def children(self, index: int) -> Iterator[int]:
+        # 子节点依次排列：第一个子节点紧跟父节点，下一个子节点紧跟上一个子节点的子树
+        end = self._subtree_end[index]
+        child = index + 1
+        while child < end:
+            yield child
+            child = self._subtree_end[child]
+
+    def iter_sections(self, start: int, end: int) -> Iterator[Tuple[List[str], str | None]]:
+        # 先序遍历 [start, end) 中的节点，标题路径随遍历增减，不逐个节点向上回溯
+        parent, title_id, titles = self._parent, self._title_id, self._titles
+        index_path = self._ancestors(start)
+        title_path = [titles[title_id[index]] for index in index_path]
+        for index in range(start, end):
+            while index_path and index_path[-1] != parent[index]:
+                index_path.pop()
+                title_path.pop()
+            index_path.append(index)
+            title_path.append(titles[title_id[index]])
+            yield list(title_path), self.content(index)
+
+    def count_node(self):
+        # 与 InfoTree.node_cnt 一致，不计每棵树的根节点
+        return len(self._parent) - len(self._tree_roots)
+
+    def __str__(self):
+        return "".join(str(tree) for tree in self)
+
+    def __len__(self):
+        return len(self._tree_roots)
+
+    def __iter__(self) -> Iterator["ColumnarTree"]:
+        return (ColumnarTree(self, i) for i in range(len(self._tree_roots)))
+
+    def __getitem__(self, i: int) -> "ColumnarTree":
+        return ColumnarTree(self, range(len(self._tree_roots))[i])
+
+    def get_index(self):
+        return self.__str__()
+
+
+class ColumnarTree:
+    """
+    ColumnarForest 中一棵树的只读视图，接口与 InfoTree 一致：for title_path, content in tree
+    """
+    __slots__ = ("forest", "tree_index")
+
+    def __init__(self, forest: ColumnarForest, tree_index: int):
+        self.forest = forest
+        self.tree_index = tree_index
+
+    @property
+    def root_index(self) -> int:
+        return self.forest._tree_roots[self.tree_index]
+
+    @property
+    def main_root(self) -> "InfoNodeView":
+        return InfoNodeView(self.forest, self.root_index)
+
+    @property
+    def source(self) -> str | None:
+        return self.forest._tree_sources[self.tree_index]
+
+    @property
+    def node_cnt(self) -> int:
+        root = self.root_index
+        return self.forest._subtree_end[root] - root - 1
+
+    def iter_nodes(self) -> Iterator["InfoNodeView"]:
+        root = self.root_index
+        return (InfoNodeView(self.forest, i) for i in range(root, self.forest._subtree_end[root]))
+
+    def __iter__(self):
+        root = self.root_index
+        return self.forest.iter_sections(root, self.forest._subtree_end[root])
+
+    def __str__(self):
+        forest, root = self.forest, self.root_index
+        lines, index_path = [], []
+        for index in range(root, forest._subtree_end[root]):
+            while index_path and index_path[-1] != forest._parent[index]:
+                index_path.pop()
+            lines.append("  " * len(index_path) + f"{forest.title(index)}\n")
+            index_path.append(index)
+        return "".join(lines)
+
+
+class InfoNodeView:
+    """
+    ColumnarForest 中一个节点的只读视图，接口与 InfoNode 一致，本身只保存 (forest, 下标)
+    """
+    __slots__ = ("forest", "index")
+
+    def __init__(self, forest: ColumnarForest, index: int):
+        self.forest = forest
+        self.index = index
+
+    @property
+    def title(self) -> str:
+        return self.forest.title(self.index)
+
+    @property
+    def level(self) -> int:
+        return self.forest._level[self.index]
+
+    @property
+    def content(self) -> str | None:
+        return self.forest.content(self.index)
+
+    @property
+    def parent(self) -> "InfoNodeView | None":
+        parent = self.forest._parent[self.index]
+        return InfoNodeView(self.forest, parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> List["InfoNodeView"]:
+        return [InfoNodeView(self.forest, child) for child in self.forest.children(self.index)]
+
+    def get_title_path(self) -> List[str]:
+        return self.forest.title_path(self.index)
+
+    def __iter__(self):
+        # 与 InfoNode 一致，遍历当前节点及其所有子节点
+        return self.forest.iter_sections(self.index, self.forest._subtree_end[self.index])
+
+    def __eq__(self, other):
+        return isinstance(other, InfoNodeView) and other.forest is self.forest and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.forest), self.index))
+
+    def __repr__(self):
+        return f"InfoNodeView({self.title!r}, level={self.level})"
+
+
+def _stat(file: str) -> list:
+    stat = os.stat(file)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _write_array(f, values: array):
+    f.write(_SECTION_HEADER.pack(values.typecode.encode("ascii"), len(values)))
+    f.write(values.tobytes())
+
+
+def _read_array(buf: memoryview, pos: int, swap: bool) -> Tuple[array, int]:
+    typecode, length = _SECTION_HEADER.unpack_from(buf, pos)
+    pos += _SECTION_HEADER.size
+    values = array(typecode.decode("ascii"))
+    end = pos + length * values.itemsize
+    values.frombytes(buf[pos:end])
+    if swap:
+        values.byteswap()
+    return values, end
+
+
+def _write_strings(f, strings: List[str]):
+    # 字符串表：各字符串的 utf-8 编码首尾相接，另存每个字符串的结束偏移
+    encoded = [string.encode("utf-8") for string in strings]
+    ends, end = array("q"), 0
+    for data in encoded:
+        end += len(data)
+        ends.append(end)
+    _write_array(f, ends)
+    _write_array(f, array("B", b"".join(encoded)))
+
+
+def _read_strings(buf: memoryview, pos: int, swap: bool) -> Tuple[List[str], int]:
+    ends, pos = _read_array(buf, pos, swap)
+    blob, pos = _read_array(buf, pos, swap)
+    data = blob.tobytes()
+    strings, start = [], 0
+    for end in ends:
+        strings.append(data[start:end].decode("utf-8"))
+        start = end
+    return strings, pos
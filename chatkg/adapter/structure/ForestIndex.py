@@ -0,0 +1,146 @@
+"""
+InfoForest / ColumnarForest 的标题索引：标题路径前缀树、标题 -> 节点、层级 -> 节点，
+建立一次后按路径、标题、层级查找节不再需要遍历整个森林
+"""
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from chatkg.adapter.structure.ColumnarForest import ColumnarTree, InfoNodeView
+from chatkg.adapter.structure.InfoTree import iter_tree_lines
+
+# 字符串形式的标题路径用 / 分隔，如 "第一章/集合"
+path_separator = "/"
+
+
+class _TrieNode:
+    # 前缀树的一项：子标题 -> _TrieNode，以及标题路径恰好到此为止的节点（不同文件中可能有相同的路径）
+    __slots__ = ("children", "nodes")
+
+    def __init__(self):
+        self.children = {}
+        self.nodes = []
+
+
+class ForestIndex:
+    """
+    节点为 InfoNode 或 InfoNodeView，可以直接取 title、content、get_title_path()，或遍历其子树
+    路径可以从树的根节点（书名）写起，也可以省略根节点，如 "第一章/集合" 匹配每棵树中的该路径
+    """
+    node_cnt: int
+
+    def __init__(self, forest: Iterable | None = None):
+        self._trie = _TrieNode()
+        self._titles: Dict[str, list] = {}
+        self._levels: Dict[int, list] = {}
+        self._roots = []
+        # 按需建立的有序标题表，用于前缀查找
+        self._sorted_titles: List[str] | None = None
+        self.node_cnt = 0
+        if forest is not None:
+            for tree in forest:
+                self.add_tree(tree)
+
+    def add_tree(self, tree):
+        # 先序遍历，每个节点挂到父节点对应的前缀树位置下
+        self._roots.append(tree.main_root)
+        if isinstance(tree, ColumnarTree):
+            self._add_columnar_tree(tree)
+        else:
+            stack = [(tree.main_root, self._trie)]
+            while stack:
+                node, parent_trie = stack.pop()
+                trie = self._add_node(node, parent_trie)
+                stack.extend((child, trie) for child in reversed(node.children))
+        self._sorted_titles = None
+
+    def _add_columnar_tree(self, tree: ColumnarTree):
+        # 列式存储中节点已按先序排列，按父节点下标找到其前缀树位置，不必为每个节点构造子节点列表
+        forest, root = tree.forest, tree.root_index
+        parent = forest._parent
+        tries = {}
+        for index in range(root, forest._subtree_end[root]):
+            parent_trie = self._trie if index == root else tries[parent[index]]
+            tries[index] = self._add_node(InfoNodeView(forest, index), parent_trie)
+
+    def _add_node(self, node, parent_trie: _TrieNode) -> _TrieNode:
+        title = node.title
+        trie = parent_trie.children.get(title)
+        if trie is None:
+            trie = parent_trie.children[title] = _TrieNode()
+        trie.nodes.append(node)
+        self._titles.setdefault(title, []).append(node)
+        self._levels.setdefault(node.level, []).append(node)
+        self.node_cnt += 1
+        return trie
+
+    def get(self, path: str | List[str]) -> list:
+        # 标题路径恰好为 path 的节点
+        return [node for trie in self._find(path) for node in trie.nodes]
+
+    def under(self, path: str | List[str], include_self: bool = True) -> Iterator:
+        # path 下的所有节点，按前缀树先序交出
+        for trie in self._find(path):
+            stack = [trie] if include_self else list(reversed(trie.children.values()))
+            while stack:
+                trie = stack.pop()
+                yield from trie.nodes
+                stack.extend(reversed(trie.children.values()))
+
+    def sections(self, path: str | List[str]) -> Iterator[Tuple[List[str], str | None]]:
+        # 与遍历 InfoTree 相同的 (title_path, content)，只包含 path 下的节
+        for node in self.under(path):
+            yield node.get_title_path(), node.content
+
+    def children(self, path: str | List[str]) -> List[str]:
+        # path 下一级的标题
+        titles = {}
+        for trie in self._find(path):
+            titles.update(dict.fromkeys(trie.children))
+        return list(titles)
+
+    def by_title(self, title: str) -> list:
+        return list(self._titles.get(title, []))
+
+    def by_level(self, level: int) -> list:
+        return list(self._levels.get(level, []))
+
+    def search_prefix(self, prefix: str) -> Iterator:
+        # 标题以 prefix 开头的节点，按标题排序
+        if self._sorted_titles is None:
+            self._sorted_titles = sorted(self._titles)
+        titles = self._sorted_titles
+        for i in range(bisect_left(titles, prefix), len(titles)):
+            if not titles[i].startswith(prefix):
+                break
+            yield from self._titles[titles[i]]
+
+    def render(self, path: str | List[str] | None = None, max_depth: int | None = None) -> Iterator[str]:
+        # 逐行交出目录树，不拼接整个字符串；path 为 None 时交出整个森林
+        roots = self._roots if path is None else self.get(path)
+        for root in roots:
+            yield from iter_tree_lines(root, max_depth=max_depth)
+
+    def _find(self, path: str | List[str]) -> List[_TrieNode]:
+        titles = path.split(path_separator) if isinstance(path, str) else list(path)
+        if not titles:
+            return []
+        trie = self._descend(self._trie, titles)
+        if trie is not None:
+            return [trie]
+        # 省略了根节点时，从每个根节点往下找
+        return [trie for trie in (self._descend(root, titles) for root in self._trie.children.values())
+                if trie is not None]
+
+    @staticmethod
+    def _descend(trie: _TrieNode, titles: List[str]) -> _TrieNode | None:
+        for title in titles:
+            trie = trie.children.get(title)
+            if trie is None:
+                return None
+        return trie
+
+    def __len__(self):
+        return self.node_cnt
+
+    def __contains__(self, path: str | List[str]) -> bool:
+        return bool(self._find(path))
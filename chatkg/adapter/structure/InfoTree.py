@@ -2,41 +2,138 @@ from typing import List, Dict
 
 from pydantic import Field, ConfigDict, model_serializer
 
-from chatkg.adapter.database.GraphNeo4j import CypherNodeState, CypherRelationState
+import mmap
+from collections import OrderedDict
+
+from chatkg.adapter.database.CypherState import CypherNodeState, CypherRelationState
 from chatkg.adapter.structure.base import BaseStructure, BaseTaskResult, BaseTask
 import warnings
 import json
 
 
+class SourceSpan:
+    """
+    源文件中的一段正文：(文件, 字节偏移, 字节长度)
+    正文不复制到内存中，只在需要时从内存映射的源文件中解码出来；源文件在索引后不应再被修改
+    """
+    file: str
+    offset: int
+    length: int
+
+    __slots__ = ("file", "offset", "length")
+
+    def __init__(self, file: str, offset: int, length: int):
+        self.file = file
+        self.offset = offset
+        self.length = length
+
+    def read(self) -> str:
+        return get_source_map(self.file)[self.offset:self.offset + self.length].decode("utf-8")
+
+    def __len__(self):
+        return self.length
+
+    def __getstate__(self):
+        return self.file, self.offset, self.length
+
+    def __setstate__(self, state):
+        self.file, self.offset, self.length = state
+
+    def __repr__(self):
+        return f"SourceSpan({self.file!r}, {self.offset}, {self.length})"
+
+
+# 每个进程中缓存最近使用的源文件映射；每个映射都占用一个文件描述符，因此限制数量，超出时关闭最久未用的
+_source_maps: "OrderedDict[str, mmap.mmap]" = OrderedDict()
+max_source_maps = 256
+
+
+def get_source_map(file: str) -> mmap.mmap:
+    source_map = _source_maps.get(file)
+    if source_map is not None:
+        _source_maps.move_to_end(file)
+        return source_map
+    with open(file, "rb") as f:
+        source_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _source_maps[file] = source_map
+    while len(_source_maps) > max_source_maps:
+        _source_maps.popitem(last=False)[1].close()
+    return source_map
+
+
+def release_source_maps():
+    # 关闭所有内存映射，之后再读取 SourceSpan 会重新映射
+    for source_map in _source_maps.values():
+        source_map.close()
+    _source_maps.clear()
+
+
 class InfoNode:
     title: str
-    content: str | None
     level: int
-    struct_info: dict | None = None
-    parent: "InfoNode" = None
+    struct_info: dict | None
+    parent: "InfoNode"
     children: list
 
+    # 不为每个节点分配 __dict__；大量节点时更紧凑的表示见 ColumnarForest
+    __slots__ = ("title", "level", "struct_info", "parent", "children", "_content", "_children_index")
+
     def __init__(self,
                  title: str,
-                 content: str | None,
+                 content: str | SourceSpan | list | None,
                  level: int,
                  parent=None):
         self.title = title
-        self.content = content
+        self._content = content
         self.parent = parent
         self.children = []
         self.level = level
+        self.struct_info = None
+        # InfoTree.insert_node 查找重名子节点用的 title -> node 索引，只在节点位于层级栈上时保留
+        self._children_index = None
+
+    @property
+    def content(self) -> str | None:
+        # 正文可能是字符串，也可能是 SourceSpan，或重名节点合并时的片段列表，读取时才解码
+        content = self._content
+        if isinstance(content, SourceSpan):
+            return content.read()
+        if isinstance(content, list):
+            return "".join(part if isinstance(part, str) else part.read() for part in content)
+        return content
+
+    @content.setter
+    def content(self, value: str | SourceSpan | list | None):
+        self._content = value
+
+    def append_content(self, content: str | SourceSpan | list | None):
+        # 重名节点合并正文：字符串与原先一样直接拼接；
+        # 有 SourceSpan 时（lazy_content）合并为片段列表，不解码，读取时按顺序直接拼接
+        if not content:
+            return
+        if not self._content:
+            self._content = content
+        elif isinstance(self._content, str) and isinstance(content, str):
+            self._content += content
+        else:
+            parts = self._content if isinstance(self._content, list) else [self._content]
+            self._content = parts + (content if isinstance(content, list) else [content])
 
     def add_child(self, node: "InfoNode"):
         node.parent = self
         self.children.append(node)
+        if self._children_index is not None:
+            self._children_index.setdefault(node.title, node)
 
     def get_title_path(self):
-        # 递归获取从根节点到当前节点的title列表
-        if self.parent:
-            return self.parent.get_title_path() + [self.title]
-        else:
-            return [self.title]
+        # 获取从根节点到当前节点的title列表
+        title_path = []
+        node = self
+        while node is not None:
+            title_path.append(node.title)
+            node = node.parent
+        title_path.reverse()
+        return title_path
 
     def to_cypher_obj(self):
         # 生成cypher语句
@@ -73,63 +170,122 @@ class InfoNode:
         return cypherStates
 
     def __iter__(self):
-        # 生成器，用于遍历当前节点及其所有子节点
-        yield self.get_title_path(), self.content
-        for child in self.children:
-            yield from child
+        # 生成器，先序遍历当前节点及其所有子节点；标题路径在遍历中共享前缀、按深度截断，不逐个节点回溯
+        title_path = self.parent.get_title_path() if self.parent else []
+        stack = [(self, len(title_path))]
+        while stack:
+            node, depth = stack.pop()
+            del title_path[depth:]
+            title_path.append(node.title)
+            yield list(title_path), node.content
+            stack.extend((child, depth + 1) for child in reversed(node.children))
+
+
+def iter_tree_lines(root, depth: int = 0, max_depth: int | None = None):
+    """
+    逐行交出以 root 为根的目录树，每行缩进表示深度；root 可以是 InfoNode 或 InfoNodeView
+    :param max_depth: 只展开到相对 root 的该深度，None 表示全部展开
+    """
+    stack = [(root, depth)]
+    while stack:
+        node, node_depth = stack.pop()
+        yield "  " * node_depth + f"{node.title}\n"
+        if max_depth is None or node_depth - depth < max_depth:
+            stack.extend((child, node_depth + 1) for child in reversed(node.children))
+
+
+def _title_index(nodes: list) -> dict:
+    # title -> node，重名时取第一个
+    if len(nodes) == 1:
+        return {nodes[0].title: nodes[0]}
+    index = {}
+    for node in nodes:
+        index.setdefault(node.title, node)
+    return index
 
 
 class InfoTree:
     main_root: InfoNode
     node_cnt: int = 0
+    # 树对应的源文件
+    source: str | None = None
 
-    def __init__(self, node: InfoNode):
+    def __init__(self, node: InfoNode, source: str | None = None):
         self.main_root = node
-
-    def insert_node(self, root: InfoNode, node: InfoNode, node_level: int):
-        if not root:
-            root = self.main_root
-        root_level = root.level
-        if node_level < 0 or root_level < 0:
-            raise ValueError("Info Tree build failed: node level or root level is less than 0")
-        if node_level > root_level:
-            # 如果当前节点的 level 大于 root 的 level，那么当前节点是 root 的子节点
-            if not root.children:
-                # 如果没有子节点，直接添加
-                root.add_child(node)
-                self.node_cnt += 1
-            else:
-                # 如果有子节点，默认当前 node 是当前 root 最后一个 child 的子节点
-                last_child = root.children[-1]
-                self.insert_node(last_child, node, node_level)
-        elif node_level == root_level:
-            # 如果当前节点的 level 等于 root 的 level，那么当前节点是 root 的兄弟节点
-            is_dup, dup_node = self._is_dup_children(root, node)
-            if is_dup:
-                # 如果是重复节点，正文直接在后面追加
-                dup_node.content += node.content
-            else:
-                # 如果不是重复节点，添加到 root.parent 的 children 中
-                root.parent.add_child(node)
-                self.node_cnt += 1
+        self.source = source
+        self.node_cnt = 0
+        self._level_stack = None
+
+    def insert_node(self, root: InfoNode | None, node: InfoNode, node_level: int) -> InfoNode:
+        """
+        按文档顺序插入节点：弹出层级栈中层级不小于 node_level 的节点，栈顶即为父节点；
+        父节点下已有同名子节点时合并，正文追加到已有节点
+        :param root: 保留以兼容旧的调用方式，插入位置只由层级栈决定
+        :return: 承载该节点的节点，合并时为已有的同名节点
+        """
+        nodes = self._level_stack
+        if nodes is None:
+            if self.main_root.level < 0:
+                raise ValueError("Info Tree build failed: root level should not be less than 0")
+            nodes = self._get_level_stack()
+        parent = nodes[-1]
+        if parent.level < node_level:
+            # 栈顶的子节点
+            nodes.append(node)
         else:
-            # 如果当前节点的 level 小于 root 的 level，向上回溯
-            self.insert_node(root.parent, node, node_level)
-
-    @staticmethod
-    def _is_dup_children(root: InfoNode, node: InfoNode):
-        for child in root.children:
-            if child.title == node.title:
-                return True, child
-        return False, None
+            try:
+                while parent.level > node_level:
+                    # 离开层级栈的节点不会再新增子节点，释放其索引
+                    nodes.pop()._children_index = None
+                    parent = nodes[-1]
+                if parent.level == node_level:
+                    # 栈顶的兄弟节点，替换栈顶
+                    parent._children_index = None
+                    parent = nodes[-2]
+                    nodes[-1] = node
+                else:
+                    nodes.append(node)
+            except IndexError:
+                # node_level 不大于根节点的层级；层级栈已不完整，下次插入时重建
+                self._level_stack = None
+                raise ValueError("Info Tree build failed: node level should be greater than root level") from None
+        children = parent.children
+        if children:
+            # 查找同名的兄弟节点，父节点的索引在第一次查找时建立
+            index = parent._children_index
+            if index is None:
+                index = parent._children_index = _title_index(children)
+            dup_node = index.setdefault(node.title, node)
+            if dup_node is not node:
+                # 重复节点，正文直接在后面追加，之后的子标题插入到已有节点下
+                dup_node.append_content(node._content)
+                nodes[-1] = dup_node
+                return dup_node
+        node.parent = parent
+        children.append(node)
+        self.node_cnt += 1
+        return node
+
+    def _get_level_stack(self) -> list:
+        # 层级栈：最右侧路径上的节点，只有这些节点还可能新增子节点
+        if self._level_stack is None:
+            node = self.main_root
+            self._level_stack = [node]
+            while node.children:
+                node = node.children[-1]
+                self._level_stack.append(node)
+        return self._level_stack
+
+    def __getstate__(self):
+        # 层级栈可以由树重建，不随树序列化（如多进程索引时传回主进程）
+        state = self.__dict__.copy()
+        state["_level_stack"] = None
+        return state
 
     def _print_tree(self, root: InfoNode, depth=0):
         if not root:
             return ""
-        result = "  " * depth + f"{root.title}\n"
-        for child in root.children:
-            result += self._print_tree(child, depth + 1)
-        return result
+        return "".join(iter_tree_lines(root, depth))
 
     def __str__(self):
         return self._print_tree(self.main_root)
@@ -138,6 +294,14 @@ class InfoTree:
     def traverse(root: InfoNode):
         return iter(root)
 
+    def iter_nodes(self):
+        # 先序遍历，逐个交出 InfoNode 本身（而非 title_path 与 content）
+        stack = [self.main_root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
     def __iter__(self):
         return self.traverse(self.main_root)
 
@@ -167,6 +331,18 @@ class InfoForest(BaseStructure):
     def __iter__(self):
         return iter(self.trees)
 
+    def save(self, path: str, fingerprint: str | None = None):
+        # 保存为二进制快照，格式见 ColumnarForest.save
+        from chatkg.adapter.structure.ColumnarForest import ColumnarForest
+        ColumnarForest.from_forest(self).save(path, fingerprint)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str | None = None) -> "InfoForest | None":
+        # 从二进制快照还原；只需遍历时直接使用 ColumnarForest.load 更快
+        from chatkg.adapter.structure.ColumnarForest import ColumnarForest
+        forest = ColumnarForest.load(path, fingerprint)
+        return forest.to_forest() if forest is not None else None
+
     def get_index(self):
         return self.__str__()
 
@@ -176,21 +352,36 @@ class InfoTreeTaskResult(BaseTaskResult):
     entity: str | list | None
     relation: str | list | None
     others: str | dict | None
+    # 多个节打包为一个请求时：各节的标题路径，以及实体名 -> 所在节的标题路径（source 为各节共同的上级标题路径）
+    sources: list | None
+    entity_sources: dict | None
 
     def __init__(self, **data):
         self.source = data.get("source")
         self.entity = data.get("entity")
         self.relation = data.get("relation")
         self.others = data.get("others")
+        self.sources = data.get("sources")
+        self.entity_sources = data.get("entity_sources")
 
+    def source_of(self, entity_name: str):
+        # 实体的来源：打包的请求中为实体所在的节，无法确定时与其余情况一样为 source
+        if self.entity_sources and entity_name in self.entity_sources:
+            return self.entity_sources[entity_name]
+        return self.source
 
     def dump_dict(self):
-        return {
+        values = {
             "source": self.source,
             "entity": self.entity,
             "relation": self.relation,
             "others": self.others
         }
+        # 只有打包的请求才有，其余结果的格式不变
+        if self.sources is not None:
+            values["sources"] = self.sources
+            values["entity_sources"] = self.entity_sources
+        return values
 
     @staticmethod
     def from_dict(values: dict):
@@ -198,7 +389,9 @@ class InfoTreeTaskResult(BaseTaskResult):
             source=values.get("source"),
             entity=values.get("entity"),
             relation=values.get("relation"),
-            others=values.get("others")
+            others=values.get("others"),
+            sources=values.get("sources"),
+            entity_sources=values.get("entity_sources")
         )
 
 
@@ -214,10 +407,18 @@ class InfoTreeTask(BaseTask):
         else:
             self.task_result = InfoTreeTaskResult.from_dict(data.get("task_result"))
         self.task_status = data.get("task_status")
+        # 由标题路径与正文计算的稳定标识，跨多次构建不变
+        self.task_key = data.get("task_key")
+        # user prompt 的 utf-8 字节数与估算的 token 数，构造 task 时给出，不随 task 保存
+        self.task_prompt_bytes = data.get("task_prompt_bytes")
+        self.task_prompt_tokens = data.get("task_prompt_tokens")
+        # 多个节打包为一个请求时各节的 (标题路径, 正文)，用于把抽取的实体对应到各节，不随 task 保存
+        self.task_sections = data.get("task_sections")
 
     def dump_dict(self):
         return {
             "task_id": self.task_id,
+            "task_key": self.task_key,
             "task_system_prompt": self.task_system_prompt,
             "task_user_prompt": self.task_user_prompt,
             "task_output": self.task_output,
@@ -251,7 +452,7 @@ def tree_task_serialize(tree_task):
                 "source": tree_task.task_result.source,
                 "entity": tree_task.task_result.entity,
                 "relation": tree_task.task_result.relation,
-                "others": tree_task.task_result
+                "others": tree_task.task_result.others
             },
             "task_status": tree_task.task_status
         }
@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
 from typing import Union, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class BaseStructure(BaseModel, ABC):
+    # 推迟到第一次实例化时才生成校验器，import 时不构建 schema
+    model_config = ConfigDict(defer_build=True)
+
     @abstractmethod
     def get_index(self):
         pass
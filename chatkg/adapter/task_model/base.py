@@ -1,11 +1,16 @@
+import copy
 import os
-from typing import Any, Dict, Optional, List
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, List, Tuple
 
-from langchain_openai import ChatOpenAI
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from abc import ABC, abstractmethod
 
 from chatkg.adapter.structure.base import BaseTask
+from chatkg.adapter.task_model.cache import ResponseCache, response_key
+from chatkg.adapter.task_model.hedging import Hedger
 
 """
 聊天的用 Langchain 的 Chat...，执行任务的用 Task...
@@ -13,6 +18,8 @@ from chatkg.adapter.structure.base import BaseTask
 
 
 class BaseTaskModel(BaseModel, ABC):
+    # 推迟到第一次实例化时才生成校验器，import 时不构建 schema
+    model_config = ConfigDict(defer_build=True)
     # 模型参数
     llm_name: str = Field(default="glm-4-flash")
     llm_kwargs: Dict[str, Any] = Field(default_factory=dict)
@@ -23,6 +30,29 @@ class BaseTaskModel(BaseModel, ABC):
     app_id: Optional[str] = Field(default=None)
     app_sk: Optional[str] = Field(default=None)
     app_ak: Optional[str] = Field(default=None)
+    # 响应缓存的 sqlite 文件路径，None 为不缓存；命中缓存的 task 不再请求 llm
+    cache: Optional[str] = Field(default=None)
+    # 缓存的容量上限（字节），超过后按最近访问时间淘汰
+    cache_max_bytes: int = Field(default=1 << 30, gt=0)
+    # 对冲请求：超过最近完成耗时的 hedge_quantile 分位的 hedge_margin 倍仍未返回的请求再发一次，取先返回的；
+    # 对冲次数不超过请求数的 hedge_max_ratio。由各模型发出请求时使用（TaskZhipuAI 异步模式、TaskOpenAI）
+    hedge: bool = Field(default=False)
+    hedge_quantile: float = Field(default=0.95, gt=0, lt=1)
+    hedge_margin: float = Field(default=2, ge=1)
+    hedge_max_ratio: float = Field(default=0.05, ge=0)
+    # 提示词相同的 task 只请求一次（包括其他线程中正在请求的），输出复制给其余的 task；
+    # coalesce_window 大于 0 时，最近完成的 coalesce_window 个成功的请求也会复用（相当于进程内的响应缓存，跨调用、跨构建），
+    # 流式构建中重复的段落往往在前一个完成后才出现，需要开启才能合并；
+    # 默认关闭，与原先每个 task 各自请求一次的行为一致
+    coalesce: bool = Field(default=False)
+    coalesce_window: int = Field(default=0, ge=0)
+    _response_cache: ResponseCache | None = None
+    _hedger: Hedger | None = None
+    # 提示词哈希 -> 请求完成时设置输出的 Future，请求失败时输出为 None；成功的移入 _recent
+    _inflight: Dict[str, Future] | None = None
+    _recent: OrderedDict | None = None
+    _inflight_lock: Any = None
+    _coalesced_cnt: int = 0
 
     @model_validator(mode="before")
     def validate_environment(cls, values: Dict):
@@ -32,9 +62,159 @@ class BaseTaskModel(BaseModel, ABC):
         values["api_base"] = values.get("api_base") or os.getenv("ZHIPU_API_BASE")
         return values
 
-    @abstractmethod
+    def model_post_init(self, __context: Any):
+        if self.cache is not None:
+            self._response_cache = ResponseCache(self.cache, self.cache_max_bytes)
+        if self.hedge:
+            self._hedger = Hedger(self.hedge_quantile, self.hedge_max_ratio, self.hedge_margin)
+        self._inflight = {}
+        self._recent = OrderedDict()
+        self._inflight_lock = threading.Lock()
+
     def execute_task(self,
                      task: BaseTask | List[BaseTask],
-                     mode="sync",
+                     mode=None,
                      **kwargs):
-        pass
\ No newline at end of file
+        """
+        先查缓存，再按提示词合并相同的 task，只有各组的第一个交给 _execute_task 执行，成功的输出复制给同组的其余 task；
+        其他调用正在请求（或最近请求过）的提示词等待其完成后复制输出。请求失败的，同组的 task 再各自请求一次
+        成功的结果写入缓存
+        :param mode: 执行方式，None 时使用各模型的默认方式
+        :param kwargs: 原样传给 _execute_task；progress_bar 与 on_complete(task) 在每个 task 得到输出时调用
+        """
+        if self._response_cache is None and not self.coalesce:
+            return self._execute_task(task, **self._mode_kwargs(mode), **kwargs)
+        tasks = [task] if isinstance(task, BaseTask) else task
+        progress_bar, on_complete = kwargs.get("progress_bar"), kwargs.get("on_complete")
+        keys, pending = {}, []
+        for single_task in tasks:
+            key = self._cache_key(single_task)
+            output = self._response_cache.get(key) if self._response_cache is not None else None
+            if output is None:
+                keys[id(single_task)] = key
+                pending.append(single_task)
+                continue
+            single_task.task_output = output
+            self._task_done(single_task, progress_bar, on_complete)
+        if not pending:
+            return task
+        leaders, followers, waiters = self._coalesce(pending, keys)
+        try:
+            if leaders:
+                self._execute_task(leaders[0] if isinstance(task, BaseTask) else leaders,
+                                   **self._mode_kwargs(mode), **kwargs)
+        finally:
+            self._release(leaders, keys)
+        self._put_cache(leaders, keys)
+        retry = []
+        for single_task, leader in followers:
+            if self._cacheable(leader):
+                self._share(leader.task_output, single_task, progress_bar, on_complete)
+            else:
+                retry.append(single_task)
+        for single_task, future in waiters:
+            output = future.result()
+            if output is None:
+                retry.append(single_task)
+            else:
+                self._share(output, single_task, progress_bar, on_complete)
+        if retry:
+            self._execute_task(retry[0] if isinstance(task, BaseTask) else retry, **self._mode_kwargs(mode), **kwargs)
+            self._put_cache(retry, keys)
+        return task
+
+    def _put_cache(self, tasks: List[BaseTask], keys: Dict[int, str]):
+        if self._response_cache is not None:
+            self._response_cache.put_many((keys[id(single_task)], single_task.task_output)
+                                          for single_task in tasks if self._cacheable(single_task))
+
+    def _coalesce(self, tasks: List[BaseTask], keys: Dict[int, str]) \
+            -> Tuple[List[BaseTask], List[Tuple[BaseTask, BaseTask]], List[Tuple[BaseTask, Future]]]:
+        # 分出需要请求的 task、与本次调用中同组第一个 task 相同的 task、等待其他调用请求结果的 task
+        if not self.coalesce:
+            return tasks, [], []
+        leaders, followers, waiters, first = [], [], [], {}
+        with self._inflight_lock:
+            for single_task in tasks:
+                key = keys[id(single_task)]
+                if key in first:
+                    followers.append((single_task, first[key]))
+                elif key in self._inflight:
+                    waiters.append((single_task, self._inflight[key]))
+                elif key in self._recent:
+                    self._recent.move_to_end(key)
+                    waiters.append((single_task, self._recent[key]))
+                else:
+                    first[key] = single_task
+                    self._inflight[key] = Future()
+                    leaders.append(single_task)
+        return leaders, followers, waiters
+
+    def _release(self, leaders: List[BaseTask], keys: Dict[int, str]):
+        # 请求完成（或出错）后唤醒等待的调用，失败的（无法解析的输出等）为 None，由等待的调用自行请求
+        if not self.coalesce:
+            return
+        with self._inflight_lock:
+            for single_task in leaders:
+                key = keys[id(single_task)]
+                future = self._inflight.pop(key)
+                if not self._cacheable(single_task):
+                    future.set_result(None)
+                    continue
+                future.set_result(single_task.task_output)
+                if self.coalesce_window:
+                    self._recent[key] = future
+                    if len(self._recent) > self.coalesce_window:
+                        self._recent.popitem(last=False)
+
+    def _share(self, output, task: BaseTask, progress_bar=None, on_complete=None):
+        # 每个 task 一份输出，task 各自的 task_result（来源等）不变
+        task.task_output = copy.deepcopy(output)
+        with self._inflight_lock:
+            self._coalesced_cnt += 1
+        self._task_done(task, progress_bar, on_complete)
+
+    @staticmethod
+    def _task_done(task: BaseTask, progress_bar=None, on_complete=None):
+        # 每个 task 写回输出后调用：通知调用方（如 task 日志立即记下输出），更新进度条
+        if on_complete is not None:
+            on_complete(task)
+        if progress_bar:
+            progress_bar.update(1)
+
+    @staticmethod
+    def _mode_kwargs(mode) -> dict:
+        return {} if mode is None else {"mode": mode}
+
+    def _cache_params(self) -> dict:
+        # 影响输出的参数，参与缓存键的计算
+        return {"type": type(self).__name__, "api_base": self.api_base, "llm_kwargs": self.llm_kwargs}
+
+    def _cache_key(self, task: BaseTask) -> str:
+        return response_key(self.llm_name, task.task_system_prompt, task.task_user_prompt, self._cache_params())
+
+    @staticmethod
+    def _cacheable(task: BaseTask) -> bool:
+        # 请求失败或输出无法解析（{"raw": 原始输出}）的不缓存，下次重新请求
+        output = task.task_output
+        return output is not None and not (isinstance(output, dict) and set(output) == {"raw"})
+
+    @property
+    def cache_stats(self) -> dict | None:
+        return self._response_cache.stats() if self._response_cache is not None else None
+
+    @property
+    def coalesce_stats(self) -> dict | None:
+        # saved 为合并后省下的请求数
+        return {"saved": self._coalesced_cnt} if self.coalesce else None
+
+    @property
+    def hedge_stats(self) -> dict | None:
+        return self._hedger.stats() if self._hedger is not None else None
+
+    @abstractmethod
+    def _execute_task(self,
+                      task: BaseTask | List[BaseTask],
+                      mode="sync",
+                      **kwargs):
+        pass
@@ -0,0 +1,62 @@
+"""
+批量任务的请求与结果文件：task 序列化为批量请求的 jsonl（每行一个请求，以 custom_id 标识），
+结果文件逐行解析后按 custom_id 写回 task
+批量任务不要求实时返回，单价通常更低，适合不在意延迟的大规模重建
+"""
+import json
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+from chatkg.adapter.structure.base import BaseTask
+
+batch_endpoint = "/v4/chat/completions"
+
+
+def write_batch_file(tasks: List[BaseTask], file: BinaryIO, llm_name: str) -> List[str]:
+    """
+    :return: 与 tasks 一一对应的 custom_id；同一批中可能有 prompt 相同的 task，custom_id 取序号而不是 task_key
+    """
+    custom_ids = []
+    for i, task in enumerate(tasks):
+        custom_id = f"task-{i}"
+        request = {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": batch_endpoint,
+            "body": {
+                "model": llm_name,
+                "messages": [
+                    {"role": "system", "content": task.task_system_prompt},
+                    {"role": "user", "content": task.task_user_prompt},
+                ]
+            }
+        }
+        file.write(json.dumps(request, ensure_ascii=False).encode("utf-8"))
+        file.write(b"\n")
+        custom_ids.append(custom_id)
+    return custom_ids
+
+
+def iter_jsonl(chunks: Iterable[bytes]) -> Iterator[dict]:
+    # 结果文件按块下载，凑齐一行就交出，不必等整个文件
+    rest = b""
+    for chunk in chunks:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if rest.strip():
+        yield json.loads(rest)
+
+
+def parse_batch_line(record: dict) -> Tuple[str, str | None, dict | None, str | None]:
+    """
+    :return: (custom_id, 输出内容, token 用量, 错误信息)，请求失败时输出内容为 None
+    """
+    custom_id = record.get("custom_id")
+    response = record.get("response") or {}
+    body = response.get("body") or {}
+    if record.get("error") or response.get("status_code", 200) != 200 or not body.get("choices"):
+        error = record.get("error") or body.get("error") or f"status code {response.get('status_code')}"
+        return custom_id, None, None, str(error)
+    return custom_id, body["choices"][0]["message"]["content"], body.get("usage"), None
@@ -0,0 +1,102 @@
+"""
+持久化的 llm 响应缓存：以模型、prompt 与生成参数的哈希为键，保存整理后的 task_output
+重复构建、只修改入库步骤时，已经抽取过的 task 直接取缓存，不再请求 llm
+存储为 sqlite，超过容量上限时按最近访问时间淘汰
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 超过容量上限时淘汰到上限的这个比例，避免每次写入都触发淘汰
+_EVICT_RATIO = 0.9
+
+
+def response_key(llm_name: str, system_prompt: str | None, user_prompt: str | None, params: dict) -> str:
+    payload = json.dumps([llm_name, system_prompt, user_prompt, params], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    线程安全，同一个缓存可以被流式流水线的多个线程同时使用
+    hits、misses 为本次打开以来的命中与未命中次数
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1 << 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses ("
+                           "key TEXT PRIMARY KEY, output TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str):
+        # 未命中时返回 None；命中时刷新访问时间
+        with self._lock:
+            row = self._conn.execute("SELECT output FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put_many(self, items):
+        # items 为 (键, 输出)，一次事务写入
+        # 同一批中相同的键只保留最后一个，容量才不会重复计算
+        rows = {}
+        for key, output in items:
+            text = json.dumps(output, ensure_ascii=False)
+            rows[key] = (key, text, len(text.encode("utf-8")), time.time())
+        rows = list(rows.values())
+        if not rows:
+            return
+        with self._lock:
+            for key, _, size, _ in rows:
+                old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._size += size - (old[0] if old else 0)
+            self._conn.executemany("INSERT OR REPLACE INTO responses (key, output, size, accessed) VALUES (?, ?, ?, ?)",
+                                   rows)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def put(self, key: str, output):
+        self.put_many([(key, output)])
+
+    def _evict(self):
+        target = self.max_bytes * _EVICT_RATIO
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self), "bytes": self._size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
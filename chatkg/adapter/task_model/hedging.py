@@ -0,0 +1,118 @@
+"""
+对冲请求：一个请求超过最近完成耗时的 p95 的 margin 倍仍未返回时，再发出一个相同的请求，取先返回的结果，取消其余的
+少数慢请求往往决定了整批任务的总耗时；额外发出的请求数不超过请求总数的 max_ratio，控制额外开销
+一批请求同时开始时，耗时刚超过 p95 的普通请求也有 5%，只按 p95 对冲会把额度用在它们身上，留给真正慢的请求的所剩无几
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """
+    请求的耗时取自最近 window 个成功的请求，不足 min_samples 个时不对冲
+    requests、fired、won 分别为请求数、发出对冲请求的次数、对冲请求先返回的次数；线程安全，同一个模型的所有调用共用
+    """
+
+    def __init__(self, quantile: float = 0.95, max_ratio: float = 0.05, margin: float = 2., min_samples: int = 20,
+                 window: int = 256):
+        self.quantile = quantile
+        self.margin = margin
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float | None:
+        # 等待多久后对冲，样本不足时为 None
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.quantile))] * self.margin
+
+    def _start(self):
+        with self._lock:
+            self.requests += 1
+
+    def _try_fire(self) -> bool:
+        # 额外开销的上限：对冲次数不超过请求数的 max_ratio
+        with self._lock:
+            if self.fired + 1 > self.requests * self.max_ratio:
+                return False
+            self.fired += 1
+            return True
+
+    def _finish(self, latency: float, hedge_won: bool):
+        with self._lock:
+            self._latencies.append(latency)
+            if hedge_won:
+                self.won += 1
+
+    async def run_async(self, make_attempt: Callable[[int], Awaitable[T]]) -> T:
+        """
+        :param make_attempt: 以第几次尝试（0 为原请求，1 为对冲请求）为参数，返回发出并等待请求的协程；失败时抛出异常
+        """
+        import asyncio
+        self._start()
+        delay = self.delay()
+        starts = [time.monotonic()]
+        attempts = [asyncio.ensure_future(make_attempt(0))]
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if not done and self._try_fire():
+            starts.append(time.monotonic())
+            attempts.append(asyncio.ensure_future(make_attempt(1)))
+        try:
+            pending = set(attempts)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    # 先返回的失败时，等待另一个
+                    if attempt.exception() is None or not pending:
+                        index = attempts.index(attempt)
+                        result = attempt.result()
+                        self._finish(time.monotonic() - starts[index], index > 0)
+                        return result
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def run_sync(self, make_attempt: Callable[[int], T], executor: Executor) -> T:
+        """
+        线程中使用：请求在调用方给出的线程池中发出，线程数至少为同时调用数的两倍；
+        阻塞的请求无法中断，落后的请求在后台结束后丢弃其结果，线程池关闭时不必等待它们
+        """
+        self._start()
+        delay = self.delay()
+        if delay is None:
+            start = time.monotonic()
+            result = make_attempt(0)
+            self._finish(time.monotonic() - start, False)
+            return result
+        starts = [time.monotonic()]
+        attempts = [executor.submit(make_attempt, 0)]
+        done, _ = wait(attempts, timeout=delay)
+        if not done and self._try_fire():
+            starts.append(time.monotonic())
+            attempts.append(executor.submit(make_attempt, 1))
+        pending = set(attempts)
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is None or not pending:
+                    for other in pending:
+                        other.cancel()
+                    index = attempts.index(attempt)
+                    result = attempt.result()
+                    self._finish(time.monotonic() - starts[index], index > 0)
+                    return result
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "fired": self.fired, "won": self.won}
@@ -0,0 +1,210 @@
+"""
+本地 transformers 模型（如 finetune/ 中微调的 ChatGLM3、Qwen 抽取模型）执行抽取任务：
+checkpoint（含 PEFT adapter）只加载一次，待执行的 task 按 prompt 长度排序后分成补齐的批次一起 generate
+所有调用（包括流式流水线的多个线程）提交到同一个队列，由一个生成线程凑批执行，模型只在这个线程中使用
+torch、transformers、peft 为可选依赖（见 requirements-local.txt），在第一次执行任务时才导入
+"""
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List
+
+from pydantic import ConfigDict, Field, model_validator
+
+from chatkg.adapter.structure.base import BaseTask
+from chatkg.adapter.task_model.base import BaseTaskModel
+from chatkg.utils.json_output import parse_to_json
+
+
+def plan_batches(lengths: List[int], batch_size: int, max_batch_tokens: int | None = None,
+                 max_new_tokens: int = 0) -> List[List[int]]:
+    """
+    按长度排序后切分批次，长度相近的 prompt 在同一批，补齐的 padding 最少
+    :param max_batch_tokens: 一批补齐后的 token 总数上限（每行按最长的 prompt 加 max_new_tokens 计），至少一行
+    :return: 每批中的下标
+    """
+    batches, batch = [], []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if batch:
+            # 已排序，加入后的最长即当前这个
+            padded = (len(batch) + 1) * (lengths[index] + max_new_tokens)
+            if len(batch) >= batch_size or (max_batch_tokens is not None and padded > max_batch_tokens):
+                batches.append(batch)
+                batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class _Request:
+    __slots__ = ("input_ids", "text", "error", "done")
+
+    def __init__(self, input_ids: List[int]):
+        self.input_ids = input_ids
+        self.text = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class TaskLocalHF(BaseTaskModel):
+    # model_path 与 pydantic 的 model_ 保留前缀冲突
+    model_config = ConfigDict(protected_namespaces=())
+    # checkpoint 目录，包含 adapter_config.json 时按 PEFT adapter 加载，基座模型取自 adapter 配置
+    model_path: str
+    # cpu、cuda、cuda:0 等，None 时有 gpu 用 gpu
+    device: str | None = Field(default=None)
+    # float32、float16、bfloat16，None 时用 checkpoint 的默认精度
+    torch_dtype: str | None = Field(default=None)
+    trust_remote_code: bool = True
+    json_output: bool = True
+    # 每批最多的 task 数，以及补齐后的 token 总数上限（控制显存）
+    batch_size: int = Field(default=8, ge=1)
+    max_batch_tokens: int | None = Field(default=None, ge=1)
+    max_new_tokens: int = Field(default=1024, ge=1)
+    # 队列中的 task 不足一批时，等待其他调用凑批的时间（秒）
+    batch_wait: float = Field(default=0.05, ge=0)
+    _model: Any = None
+    _tokenizer: Any = None
+    _torch_device: Any = None
+    _pad_token_id: int | None = None
+    _eos_token_ids: List[int] | None = None
+    _requests: Any = None
+    _worker: Any = None
+    _load_lock: Any = None
+
+    @model_validator(mode="before")
+    def validate_llm_name(cls, values: Dict):
+        # 缓存键中的模型名称默认取 checkpoint 路径
+        if not values.get("llm_name"):
+            values["llm_name"] = values.get("model_path")
+        return values
+
+    def model_post_init(self, __context: Any):
+        super().model_post_init(__context)
+        self._requests = queue.Queue()
+        self._load_lock = threading.Lock()
+
+    def _cache_params(self) -> dict:
+        # llm_name 可能由参数或环境变量 LLM_NAME 给出，与 checkpoint 无关，切换 checkpoint 时缓存随之失效
+        return {**super()._cache_params(), "model_path": self.model_path,
+                "max_new_tokens": self.max_new_tokens, "json_output": self.json_output}
+
+    def _execute_task(self,
+                      task: BaseTask | List[BaseTask],
+                      mode=None,
+                      **kwargs) -> BaseTask | List[BaseTask]:
+        # 本地模型只有一种执行方式，mode 不起作用
+        tasks = [task] if isinstance(task, BaseTask) else task
+        progress_bar, on_complete = kwargs.get("progress_bar"), kwargs.get("on_complete")
+        self._load()
+        requests = [_Request(self._encode(single_task)) for single_task in tasks]
+        for request in requests:
+            self._requests.put(request)
+        for single_task, request in zip(tasks, requests):
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+            single_task.task_output = parse_to_json(request.text) if self.json_output else request.text
+            self._task_done(single_task, progress_bar, on_complete)
+        return task
+
+    def _load(self):
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+            model_kwargs = {"trust_remote_code": self.trust_remote_code}
+            if self.torch_dtype is not None:
+                model_kwargs["torch_dtype"] = getattr(torch, self.torch_dtype)
+            # 与 finetune/chatglm3-6b/inference_hf.py 相同的加载方式
+            if os.path.exists(os.path.join(self.model_path, "adapter_config.json")):
+                from peft import AutoPeftModelForCausalLM
+                model = AutoPeftModelForCausalLM.from_pretrained(self.model_path, **model_kwargs)
+                tokenizer_path = model.peft_config["default"].base_model_name_or_path
+            else:
+                model = AutoModelForCausalLM.from_pretrained(self.model_path, **model_kwargs)
+                tokenizer_path = self.model_path
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer_path, trust_remote_code=self.trust_remote_code)
+            device = self.device or ("cuda" if torch.cuda.is_available() else "cpu")
+            self._torch_device = torch.device(device)
+            model.to(self._torch_device).eval()
+            self._pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+            self._eos_token_ids = [tokenizer.eos_token_id]
+            if hasattr(tokenizer, "get_command"):
+                # ChatGLM3 在轮到用户或工具发言时结束，与 model.chat 一致
+                self._eos_token_ids += [tokenizer.get_command("<|user|>"), tokenizer.get_command("<|observation|>")]
+            self._tokenizer = tokenizer
+            self._worker = threading.Thread(target=self._generate_forever, name="local-hf-generate", daemon=True)
+            self._model = model
+            self._worker.start()
+
+    def _encode(self, task: BaseTask) -> List[int]:
+        tokenizer = self._tokenizer
+        if hasattr(tokenizer, "build_chat_input"):
+            # ChatGLM3 的对话格式
+            history = [{"role": "system", "content": task.task_system_prompt}] if task.task_system_prompt else []
+            return tokenizer.build_chat_input(task.task_user_prompt, history=history, role="user")["input_ids"][0].tolist()
+        messages = [{"role": "user", "content": task.task_user_prompt}]
+        if task.task_system_prompt:
+            messages.insert(0, {"role": "system", "content": task.task_system_prompt})
+        if getattr(tokenizer, "chat_template", None):
+            return tokenizer.apply_chat_template(messages, add_generation_prompt=True)
+        # 没有对话模板的模型直接拼接
+        return tokenizer("\n\n".join(message["content"] for message in messages))["input_ids"]
+
+    def _take_requests(self) -> List[_Request]:
+        # 阻塞到有请求，再取走队列中已有的全部；不足一批时等待 batch_wait 秒凑批
+        requests = [self._requests.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while True:
+            try:
+                requests.append(self._requests.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            timeout = deadline - time.monotonic()
+            if len(requests) >= self.batch_size or timeout <= 0:
+                return requests
+            try:
+                requests.append(self._requests.get(timeout=timeout))
+            except queue.Empty:
+                return requests
+
+    def _generate_forever(self):
+        while True:
+            requests = self._take_requests()
+            lengths = [len(request.input_ids) for request in requests]
+            for indexes in plan_batches(lengths, self.batch_size, self.max_batch_tokens, self.max_new_tokens):
+                batch = [requests[i] for i in indexes]
+                try:
+                    texts = self._generate([request.input_ids for request in batch])
+                except Exception as e:
+                    for request in batch:
+                        request.error = e
+                        request.done.set()
+                    continue
+                for request, text in zip(batch, texts):
+                    request.text = text
+                    request.done.set()
+
+    def _generate(self, batch: List[List[int]]) -> List[str]:
+        import torch
+        # 左侧补齐，生成的部分从同一列开始
+        max_length = max(len(input_ids) for input_ids in batch)
+        input_ids = [[self._pad_token_id] * (max_length - len(ids)) + ids for ids in batch]
+        attention_mask = [[0] * (max_length - len(ids)) + [1] * len(ids) for ids in batch]
+        with torch.inference_mode():
+            output = self._model.generate(
+                input_ids=torch.tensor(input_ids, device=self._torch_device),
+                attention_mask=torch.tensor(attention_mask, device=self._torch_device),
+                max_new_tokens=self.max_new_tokens,
+                do_sample=False,
+                pad_token_id=self._pad_token_id,
+                eos_token_id=self._eos_token_ids,
+            )
+        return self._tokenizer.batch_decode(output[:, max_length:], skip_special_tokens=True)
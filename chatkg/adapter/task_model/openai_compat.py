@@ -0,0 +1,202 @@
+"""
+OpenAI 兼容接口（vLLM、内部推理集群等）执行抽取任务：
+同一个服务地址的所有模型实例共用一个保持连接的 httpx 连接池（安装了 h2 时使用 HTTP/2），不必每次请求重新握手
+支持流式返回（SSE）与每个请求单独的超时
+"""
+import importlib.util
+import json
+import os
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pydantic import Field, model_validator
+
+from chatkg.adapter.structure.base import BaseTask
+from chatkg.adapter.task_model.base import BaseTaskModel
+from chatkg.adapter.task_model.rate_limit import RateLimiter
+from chatkg.utils.json_output import parse_to_json
+
+# (服务地址, 是否 HTTP/2) -> httpx.Client
+_shared_clients: Dict[Tuple[str, bool], Any] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(base_url: str, http2: bool, max_connections: int):
+    # 同一个服务地址只建一个连接池，第一次创建时的 max_connections 生效
+    key = (base_url, http2)
+    client = _shared_clients.get(key)
+    if client is None:
+        with _shared_clients_lock:
+            client = _shared_clients.get(key)
+            if client is None:
+                import httpx
+                client = httpx.Client(base_url=base_url, http2=http2,
+                                      limits=httpx.Limits(max_connections=max_connections,
+                                                          max_keepalive_connections=max_connections))
+                _shared_clients[key] = client
+    return client
+
+
+def iter_sse_data(lines: Iterator[str]) -> Iterator[dict]:
+    # 逐个交出 SSE 中 data: 行的 json，[DONE] 之后不再交出，但仍读完响应，连接才能放回连接池
+    done = False
+    for line in lines:
+        if done or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            done = True
+        elif data:
+            yield json.loads(data)
+
+
+class _DeltaGate:
+    # 转发原请求的流式片段，close 之后不再转发；正在转发的片段先完成，close 返回后调用方可以放心清理
+    __slots__ = ("_on_delta", "_lock", "_closed")
+
+    def __init__(self, on_delta):
+        self._on_delta = on_delta
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def on_delta(self, task: BaseTask, delta: str):
+        with self._lock:
+            if not self._closed and self._on_delta is not None:
+                self._on_delta(task, delta)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+
+
+class TaskOpenAI(BaseTaskModel):
+    # api_base 为服务地址，如 http://127.0.0.1:8000/v1；未给出时服务地址与 api_key 取自环境变量 OPENAI_BASE_URL、OPENAI_API_KEY
+    json_output: bool = True
+    # 流式返回：边生成边接收，可以通过 on_delta(task, 片段) 回调逐段处理
+    stream: bool = False
+    # 每个请求的超时（秒）：读取超时为两次收到数据之间的最长等待，另有建立连接的超时；execute_task(timeout=...) 可以单独指定
+    timeout: float = Field(default=120, gt=0)
+    connect_timeout: float = Field(default=10, gt=0)
+    # 同时发出的请求数，以及连接池的连接数上限
+    max_concurrency: int = Field(default=8, ge=1)
+    max_connections: int = Field(default=16, ge=1)
+    # None 时安装了 h2 就使用 HTTP/2
+    http2: bool | None = Field(default=None)
+    # 每分钟请求数、token 数上限，None 为不限制
+    rpm: int | None = Field(default=None, ge=1)
+    tpm: int | None = Field(default=None, ge=1)
+    _rate_limiter: RateLimiter | None = None
+
+    @model_validator(mode="before")
+    def validate_environment(cls, values: Dict):
+        # 覆盖基类的同名校验：只读取 OpenAI 兼容接口自己的环境变量，不使用 ZHIPU_API_KEY 等，避免把其他服务的密钥发给这里配置的地址
+        values["llm_name"] = values.get("llm_name") or os.getenv("LLM_NAME")
+        values["api_key"] = values.get("api_key") or os.getenv("OPENAI_API_KEY")
+        values["base_url"] = values.get("base_url") or values.get("api_base") or os.getenv("OPENAI_BASE_URL")
+        return values
+
+    def model_post_init(self, __context: Any):
+        super().model_post_init(__context)
+        self._rate_limiter = RateLimiter(self.rpm, self.tpm)
+
+    @property
+    def client(self):
+        if not self.api_base:
+            raise ValueError("api_base (base_url) is required for OpenAI-compatible endpoints")
+        http2 = self.http2 if self.http2 is not None else importlib.util.find_spec("h2") is not None
+        return get_shared_client(self.api_base.rstrip("/"), http2, self.max_connections)
+
+    def _execute_task(self,
+                      task: BaseTask | List[BaseTask],
+                      mode=None,
+                      **kwargs) -> BaseTask | List[BaseTask]:
+        # 阻塞的 httpx 请求在线程中并发，连接池线程安全；mode 不起作用
+        concurrency = 1 if isinstance(task, BaseTask) else min(self.max_concurrency, len(task)) or 1
+        # 对冲时原请求与对冲请求在这个线程池中发出：每个并发的请求最多两个，落后的请求结束前仍占着线程，再多留一倍
+        hedge_executor = ThreadPoolExecutor(4 * concurrency, thread_name_prefix="hedge") \
+            if self._hedger is not None else None
+        try:
+            if isinstance(task, BaseTask):
+                return self._request(task, hedge_executor, **kwargs)
+            errors = []
+            with ThreadPoolExecutor(concurrency, thread_name_prefix="openai") as executor:
+                for future in [executor.submit(self._request, single_task, hedge_executor, **kwargs)
+                               for single_task in task]:
+                    if future.exception() is not None:
+                        errors.append(future.exception())
+        finally:
+            if hedge_executor is not None:
+                # 落后的请求不等待，结束后线程随之退出
+                hedge_executor.shutdown(wait=False, cancel_futures=True)
+        if errors:
+            # 其余 task 的输出已经写回，只是这一批作为整体失败
+            raise errors[0]
+        return task
+
+    def _cache_params(self) -> dict:
+        return {**super()._cache_params(), "json_output": self.json_output}
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def _request(self, task: BaseTask, hedge_executor: ThreadPoolExecutor | None = None, **kwargs) -> BaseTask:
+        if hedge_executor is not None:
+            # 流式的片段只交给原请求的 on_delta，对冲请求先返回时以其完整输出为准，原请求之后的片段不再交出
+            delta_gate = _DeltaGate(kwargs.get("on_delta"))
+            try:
+                content, usage = self._hedger.run_sync(lambda index: self._complete(
+                    task, **{**kwargs, "on_delta": delta_gate.on_delta if index == 0 else None}), hedge_executor)
+            finally:
+                delta_gate.close()
+        else:
+            content, usage = self._complete(task, **kwargs)
+        if usage and usage.get("completion_tokens"):
+            self._rate_limiter.consume(usage["completion_tokens"])
+        task.task_output = parse_to_json(content) if self.json_output else content
+        self._task_done(task, kwargs.get("progress_bar"), kwargs.get("on_complete"))
+        return task
+
+    def _complete(self, task: BaseTask, **kwargs) -> Tuple[str, dict | None]:
+        # 发出一次请求，返回输出内容与 token 用量，不修改 task
+        import httpx
+        tokens = getattr(task, "task_prompt_tokens", None) or 0
+        self._rate_limiter.acquire(tokens)
+        body = {
+            **self.llm_kwargs,
+            "model": self.llm_name,
+            "messages": [
+                {"role": "system", "content": task.task_system_prompt},
+                {"role": "user", "content": task.task_user_prompt},
+            ],
+            "stream": self.stream,
+        }
+        timeout = httpx.Timeout(kwargs.get("timeout") or self.timeout, connect=self.connect_timeout)
+        if self.stream:
+            return self._request_stream(task, body, timeout, kwargs.get("on_delta"))
+        response = self.client.post("/chat/completions", json=body, headers=self._headers(), timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        return data["choices"][0]["message"]["content"], data.get("usage")
+
+    def _request_stream(self, task: BaseTask, body: dict, timeout, on_delta=None) -> Tuple[str, dict | None]:
+        pieces, usage = [], None
+        with self.client.stream("POST", "/chat/completions", json=body, headers=self._headers(),
+                                timeout=timeout) as response:
+            if response.is_error:
+                response.read()
+                response.raise_for_status()
+            for chunk in iter_sse_data(response.iter_lines()):
+                # 部分服务在最后一段中给出 usage
+                usage = chunk.get("usage") or usage
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    pieces.append(delta)
+                    if on_delta is not None:
+                        on_delta(task, delta)
+        if not pieces:
+            warnings.warn(f"Empty streamed response for task {getattr(task, 'task_key', None)}")
+        return "".join(pieces), usage
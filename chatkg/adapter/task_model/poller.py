@@ -0,0 +1,133 @@
+"""
+异步任务结果的统一轮询：所有待取结果的任务 id 放在按下次查询时间排序的堆中，由一个轮询协程按时查询，
+而不是每个任务各自按固定间隔循环查询
+第一次查询的时间取最近观测到的完成耗时的中位数，之后每次未完成就按指数退避，并加随机抖动避免同时到期
+观测到的是查到完成时的耗时，偏大；第一次查询的抖动只往前取，估计值才会从上方收敛而不是越估越晚
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+# 退避的倍数与随机抖动的幅度
+_BACKOFF = 2.
+_JITTER = 0.2
+
+
+class CompletionStats:
+    """
+    最近 window 个任务从提交到取回结果的耗时，线程安全，同一个模型的多次调用共用
+    """
+
+    def __init__(self, default: float, window: int = 64):
+        self.default = default
+        self._durations = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, duration: float):
+        with self._lock:
+            self._durations.append(duration)
+
+    def expected(self) -> float:
+        # 还没有观测时用默认值
+        with self._lock:
+            if not self._durations:
+                return self.default
+            durations = sorted(self._durations)
+        return durations[len(durations) // 2]
+
+
+class _Job:
+    __slots__ = ("job_id", "submitted", "attempt", "future")
+
+    def __init__(self, job_id: str, future: asyncio.Future):
+        self.job_id = job_id
+        self.submitted = time.monotonic()
+        self.attempt = 0
+        self.future = future
+
+
+class CompletionPoller:
+    """
+    在一个事件循环中使用：wait 登记任务并等待其结果，轮询协程在有任务待查时运行，没有时退出
+    retrieve 为阻塞的查询函数，在 executor 中执行；返回值的 task_status 为 SUCCESS 或 FAILED 时视为完成
+    """
+
+    def __init__(self,
+                 retrieve: Callable,
+                 stats: CompletionStats,
+                 executor=None,
+                 min_interval: float = 0.1,
+                 max_interval: float = 30.):
+        self.retrieve = retrieve
+        self.stats = stats
+        self.executor = executor
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.retrieve_cnt = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._runner: asyncio.Task | None = None
+
+    def _delay(self, job: _Job) -> float:
+        # 第一次在预计完成时查询，之后从预计耗时的一部分开始指数退避
+        expected = self.stats.expected()
+        if job.attempt == 0:
+            delay = expected * random.uniform(1 - _JITTER, 1)
+        else:
+            delay = expected / 4 * _BACKOFF ** (job.attempt - 1) * random.uniform(1 - _JITTER, 1 + _JITTER)
+        return min(max(delay, self.min_interval), self.max_interval)
+
+    def _schedule(self, job: _Job):
+        heapq.heappush(self._heap, (time.monotonic() + self._delay(job), next(self._seq), job))
+
+    async def wait(self, job_id: str):
+        loop = asyncio.get_running_loop()
+        job = _Job(job_id, loop.create_future())
+        self._schedule(job)
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._runner is None or self._runner.done():
+            self._runner = loop.create_task(self._run())
+        return await job.future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._heap:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.monotonic()
+            if timeout > 0:
+                # 新任务登记时提前醒来，重新计算最早的到期时间
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due = []
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+            self.retrieve_cnt += len(due)
+            responses = await asyncio.gather(
+                *(loop.run_in_executor(self.executor, self.retrieve, job.job_id) for job in due),
+                return_exceptions=True)
+            now = time.monotonic()
+            for job, response in zip(due, responses):
+                if job.future.done():
+                    # 等待方已经取消
+                    continue
+                if isinstance(response, BaseException):
+                    job.future.set_exception(response)
+                elif response.task_status in ("SUCCESS", "FAILED"):
+                    if response.task_status == "SUCCESS":
+                        self.stats.observe(now - job.submitted)
+                    job.future.set_result(response)
+                else:
+                    job.attempt += 1
+                    self._schedule(job)
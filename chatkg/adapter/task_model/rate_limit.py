@@ -0,0 +1,84 @@
+"""
+按分钟限额的令牌桶：RPM（每分钟请求数）与 TPM（每分钟 token 数）
+线程安全，同一个限流器可以同时被多个线程、多个事件循环使用（流式流水线中每个工作线程各自 asyncio.run）
+"""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    容量为每分钟限额，按 限额/60 每秒匀速补充；令牌可以透支（如请求完成后才知道的输出 token），透支部分由之后的请求等待补回
+    """
+    __slots__ = ("capacity", "rate", "_tokens", "_updated")
+
+    def __init__(self, per_minute: float):
+        if per_minute <= 0:
+            raise ValueError(f"Invalid limit: {per_minute}, should be positive")
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        # 取出 amount 个令牌还需要等待的秒数，超过容量的请求只要求桶是满的，否则永远等不到
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0. if self._tokens >= amount else (amount - self._tokens) / self.rate
+
+    def take(self, amount: float):
+        self._tokens -= amount
+
+
+class RateLimiter:
+    """
+    rpm、tpm 为 None 时不限制对应的量
+    acquire 在请求前取出 1 个请求令牌与 prompt 的 token 数，两个桶都足够时才一起取出；consume 在请求完成后补记输出的 token
+    """
+
+    def __init__(self, rpm: int | None = None, tpm: int | None = None):
+        self._requests = TokenBucket(rpm) if rpm else None
+        self._tokens = TokenBucket(tpm) if tpm else None
+        self._lock = threading.Lock()
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        wait = 0.
+        if self._requests is not None:
+            wait = self._requests.wait_time(1, now)
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait_time(tokens, now))
+        return wait
+
+    def delay(self, tokens: int = 0) -> float:
+        # 现在请求需要等待的秒数，不取出令牌，用于在多个限流器之间选择
+        with self._lock:
+            return self._wait_time(tokens, time.monotonic())
+
+    def _try_acquire(self, tokens: int) -> float:
+        with self._lock:
+            wait = self._wait_time(tokens, time.monotonic())
+            if wait > 0:
+                return wait
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None:
+                self._tokens.take(tokens)
+            return 0.
+
+    def acquire(self, tokens: int = 0):
+        while (wait := self._try_acquire(tokens)) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        while (wait := self._try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def consume(self, tokens: int):
+        if self._tokens is not None and tokens > 0:
+            with self._lock:
+                self._tokens.take(tokens)
@@ -0,0 +1,235 @@
+"""
+在多个后端（多个 api key、多个地域的服务地址，或本地模型加 api）之间分配任务的路由模型，对引擎而言与单个模型相同：
+待执行的 task 放在共享队列中，每个后端的工作线程按自身的速度取走一小批执行，响应快、限额剩余多的后端取得多；
+按观测到的耗时，慢的后端在其余后端能更早排空队列时不再取走 task，避免最后一批拖慢整体
+返回 429、5xx 或连接失败的后端暂时摘除，冷却后重新加入；出错批次中没有输出的 task 放回队列由其他后端执行
+"""
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import Any, Dict, List, Union
+
+from pydantic import Field, model_validator
+
+from chatkg.adapter import registry
+from chatkg.adapter.structure.base import BaseTask
+from chatkg.adapter.task_model.base import BaseTaskModel
+
+logger = getLogger(__name__)
+
+# 没有状态码时，按异常类名（含父类）判断是否为连接失败、超时：httpx.TransportError、zhipuai.APIConnectionError 等
+_CONNECTION_ERRORS = {"TransportError", "APIConnectionError", "ConnectionError", "TimeoutError"}
+# 耗时的指数滑动平均系数
+_LATENCY_ALPHA = 0.3
+
+
+def status_code(error: BaseException) -> int | None:
+    # zhipuai.APIStatusError 有 status_code，httpx.HTTPStatusError 的状态码在 response 上
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    # 限流、服务端错误、连接失败是后端暂时不可用，换一个后端重试；其余错误（如请求参数错误）换后端也不会成功
+    code = status_code(error)
+    if code is not None:
+        return code == 429 or code >= 500
+    return any(cls.__name__ in _CONNECTION_ERRORS for cls in type(error).__mro__)
+
+
+def retry_after(error: BaseException) -> float | None:
+    # 429 响应的 Retry-After（秒数形式）
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _Backend:
+    """
+    后端的状态，同一个路由模型的所有调用共用，由路由模型的锁保护
+    latency 为一批的耗时按 task 数平均（指数滑动平均），None 为还没有观测；后端内部并发执行时偏大，但各后端同样偏大，可以比较
+    """
+    __slots__ = ("model", "name", "latency", "ejected_until", "failures", "tasks", "errors", "ejections")
+
+    def __init__(self, model: BaseTaskModel, name: str):
+        self.model = model
+        self.name = name
+        self.latency = None
+        self.ejected_until = 0.
+        self.failures = 0
+        self.tasks = 0
+        self.errors = 0
+        self.ejections = 0
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        # 摘除的剩余时间，以及限额用完时需要等待的时间
+        wait = max(0., self.ejected_until - now)
+        rate_limiter = getattr(self.model, "_rate_limiter", None)
+        if rate_limiter is not None:
+            wait = max(wait, rate_limiter.delay(tokens))
+        return wait
+
+
+class _Dispatch:
+    # 一次 execute_task 调用的待执行队列
+    __slots__ = ("pending", "in_flight", "attempts", "error", "cond")
+
+    def __init__(self, tasks: List[BaseTask]):
+        self.pending = deque(tasks)
+        self.in_flight = 0
+        self.attempts: Dict[int, int] = {}
+        self.error: BaseException | None = None
+        self.cond = threading.Condition()
+
+
+class TaskRouter(BaseTaskModel):
+    # 后端模型，或 {"type": 注册名, ...参数} 形式的配置；各后端的限流、缓存、对冲等参数各自配置
+    backends: List[Union[BaseTaskModel, dict]]
+    # 每个后端同时执行的批数，以及每批最多的 task 数
+    backend_concurrency: int = Field(default=2, ge=1)
+    chunk_size: int = Field(default=8, ge=1)
+    # 出错后的摘除时间（秒），连续出错时翻倍，不超过 max_eject_seconds；响应给出 Retry-After 时取较大者
+    eject_seconds: float = Field(default=10, gt=0)
+    max_eject_seconds: float = Field(default=300, gt=0)
+    # 单个 task 在各后端上累计的最多尝试次数，超过后整批失败
+    max_attempts: int = Field(default=5, ge=1)
+    _backends: List[_Backend] | None = None
+    _lock: Any = None
+
+    @model_validator(mode="before")
+    def validate_backends(cls, values: Dict):
+        backends = []
+        for backend in values.get("backends") or []:
+            if isinstance(backend, dict) and "type" in backend:
+                backend = dict(backend)
+                backend = registry.create("task_model", backend.pop("type"), **backend)
+            backends.append(backend)
+        if not backends:
+            raise ValueError("At least one backend is required")
+        values["backends"] = backends
+        # 缓存键中的模型名称默认取各后端的模型名称
+        if not values.get("llm_name"):
+            values["llm_name"] = "+".join(sorted({getattr(backend, "llm_name", None) or "" for backend in backends}))
+        return values
+
+    def model_post_init(self, __context: Any):
+        super().model_post_init(__context)
+        self._lock = threading.Lock()
+        self._backends = [_Backend(model, f"{i}:{type(model).__name__}:{model.llm_name}")
+                          for i, model in enumerate(self.backends)]
+
+    def _cache_params(self) -> dict:
+        return {"type": type(self).__name__,
+                "backends": [{"llm_name": model.llm_name, **model._cache_params()} for model in self.backends]}
+
+    def _execute_task(self,
+                      task: BaseTask | List[BaseTask],
+                      mode=None,
+                      **kwargs) -> BaseTask | List[BaseTask]:
+        """
+        各后端的工作线程从共享队列中取 task 执行，mode 与其余参数原样传给后端
+        """
+        dispatch = _Dispatch([task] if isinstance(task, BaseTask) else list(task))
+        workers = [backend for backend in self._backends for _ in range(self.backend_concurrency)]
+        with ThreadPoolExecutor(len(workers), thread_name_prefix="router") as executor:
+            for backend in workers:
+                executor.submit(self._work, backend, dispatch, len(workers), mode, kwargs)
+        if dispatch.error is not None:
+            raise dispatch.error
+        return task
+
+    def _work(self, backend: _Backend, dispatch: _Dispatch, worker_cnt: int, mode, kwargs: dict):
+        while (chunk := self._take(backend, dispatch, worker_cnt)) is not None:
+            start = time.monotonic()
+            try:
+                backend.model.execute_task(chunk, **self._mode_kwargs(mode), **kwargs)
+            except Exception as e:
+                self._on_error(backend, dispatch, chunk, e)
+            else:
+                self._on_success(backend, len(chunk), (time.monotonic() - start) / len(chunk))
+            with dispatch.cond:
+                dispatch.in_flight -= 1
+                dispatch.cond.notify_all()
+
+    def _take(self, backend: _Backend, dispatch: _Dispatch, worker_cnt: int) -> List[BaseTask] | None:
+        # 阻塞到可以为这个后端取走一批 task；队列排空且没有在执行的批次，或出现不可重试的错误时返回 None
+        with dispatch.cond:
+            while True:
+                if dispatch.error is not None or (not dispatch.pending and dispatch.in_flight == 0):
+                    return None
+                wait = None
+                if dispatch.pending:
+                    wait = backend.wait_time(getattr(dispatch.pending[0], "task_prompt_tokens", None) or 0,
+                                             time.monotonic())
+                    if wait <= 0:
+                        # 队列快排空时每批取少一些，分给更多的后端同时执行；还没有观测耗时的后端先取一个试探
+                        size = min(self.chunk_size, math.ceil(len(dispatch.pending) / worker_cnt))
+                        if backend.latency is None:
+                            size = 1
+                        if dispatch.in_flight == 0 or self._worth_taking(backend, size, len(dispatch.pending)):
+                            dispatch.in_flight += 1
+                            return [dispatch.pending.popleft() for _ in range(min(size, len(dispatch.pending)))]
+                        wait = None
+                # 等待其他批次完成（可能放回 task）、摘除到期或限额恢复
+                dispatch.cond.wait(wait)
+
+    def _worth_taking(self, backend: _Backend, size: int, pending_cnt: int) -> bool:
+        # 这个后端执行完这一批的时间，不晚于其余可用后端排空队列（再加上它们执行这一批的耗时）时才取
+        if backend.latency is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            others = [other.latency for other in self._backends
+                      if other is not backend and other.latency and other.ejected_until <= now]
+        if not others:
+            return True
+        throughput = sum(self.backend_concurrency / latency for latency in others)
+        return backend.latency * size <= pending_cnt / throughput + min(others) * size
+
+    def _on_success(self, backend: _Backend, task_cnt: int, task_seconds: float):
+        with self._lock:
+            backend.tasks += task_cnt
+            backend.failures = 0
+            backend.latency = task_seconds if backend.latency is None else \
+                (1 - _LATENCY_ALPHA) * backend.latency + _LATENCY_ALPHA * task_seconds
+
+    def _on_error(self, backend: _Backend, dispatch: _Dispatch, chunk: List[BaseTask], error: Exception):
+        retryable = is_retryable(error)
+        with self._lock:
+            backend.errors += 1
+        if retryable:
+            with self._lock:
+                backend.failures += 1
+                backend.ejections += 1
+                seconds = min(self.eject_seconds * 2 ** (backend.failures - 1), self.max_eject_seconds)
+                seconds = max(seconds, retry_after(error) or 0.)
+                backend.ejected_until = time.monotonic() + seconds
+            logger.warning(f"Backend {backend.name} ejected for {seconds:.1f}s: {error!r}")
+        with dispatch.cond:
+            if not retryable:
+                dispatch.error = dispatch.error or error
+                return
+            # 后端在出错前已经写回输出的 task 不再执行
+            for single_task in chunk:
+                if single_task.task_output is not None:
+                    continue
+                attempts = dispatch.attempts.get(id(single_task), 0) + 1
+                dispatch.attempts[id(single_task)] = attempts
+                if attempts >= self.max_attempts:
+                    dispatch.error = dispatch.error or error
+                    return
+                dispatch.pending.appendleft(single_task)
+
+    @property
+    def backend_stats(self) -> List[dict]:
+        with self._lock:
+            return [{"name": backend.name, "tasks": backend.tasks, "errors": backend.errors,
+                     "ejections": backend.ejections, "latency": backend.latency} for backend in self._backends]
@@ -0,0 +1,198 @@
+"""
+流式返回的抽取结果的增量解析：逐段输入模型输出的文本，每个 知识实体 条目、每条 实体关系 在其 json 值闭合时立即交出，
+不必等整个输出生成完再 parse_to_json，写入图数据库可以与生成同时进行
+只解析第一个顶层对象，之前的说明文字、```json 代码块标记与之后的内容都跳过；说明文字中的 { 开始的内容不是合法 json 时，
+从出错处重新寻找下一个 {；完整的输出仍由 parse_to_json 解析
+"""
+import json
+import re
+from typing import List, Tuple
+
+entity_key = "知识实体"
+relation_key = "实体关系"
+
+_WHITESPACE = " \t\r\n"
+# 字符串中只有引号与转义符需要处理，其余部分直接跳过
+_STRING_SPECIAL = re.compile(r'["\\]')
+# 数字、true、false、null 在遇到这些字符时结束
+_SCALAR_END = ",}]" + _WHITESPACE
+_SCALAR_START = "-0123456789tfn"
+# 已处理的文本超过这个长度且之后不再需要时丢弃
+_COMPACT_SIZE = 4096
+
+
+class StreamExtractor:
+    """
+    feed 返回本段文本中闭合的条目：("entity", 实体名, 属性) 与 ("relation", 实体1, 关系名, 实体2)
+    实体关系 的值可以是单个实体名或实体名列表，列表中的每个实体名各交出一条关系；无法解析的值跳过
+    events 为当前顶层对象中已闭合的全部条目；重新寻找顶层对象时清空，之前 feed 返回的条目随之作废，
+    因此应在输出校验通过后再使用 events
+    """
+    __slots__ = ("events", "_text", "_pos", "_stack", "_string_start", "_escape", "_scalar_start", "_captures",
+                 "_done")
+
+    def __init__(self):
+        self.events: List[Tuple] = []
+        self._text = ""
+        self._pos = 0
+        # 每层容器为 [类型 "{" 或 "[", 当前的键或下标, 期待的下一个记号]
+        self._stack: List[list] = []
+        self._string_start: int | None = None
+        self._escape = False
+        self._scalar_start: int | None = None
+        # 需要交出的值所在的层数 -> 值在文本中的起始位置
+        self._captures = {}
+        self._done = False
+
+    def feed(self, chunk: str) -> List[Tuple]:
+        count = len(self.events)
+        self._text += chunk
+        text, i = self._text, self._pos
+        while i < len(text) and not self._done:
+            c = text[i]
+            if self._string_start is not None:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                match = _STRING_SPECIAL.search(text, i)
+                if match is None:
+                    i = len(text)
+                    continue
+                i = match.start()
+                if text[i] == "\\":
+                    self._escape = True
+                else:
+                    self._end_string(i)
+                i += 1
+                continue
+            if self._scalar_start is not None:
+                if c not in _SCALAR_END:
+                    i += 1
+                    continue
+                # 分隔符还要作为下一个记号处理
+                self._end_value(i)
+                self._scalar_start = None
+            if not self._stack:
+                if c == "{":
+                    self._stack.append(["{", None, "key"])
+            elif c not in _WHITESPACE and not self._consume(c, i):
+                # 不是合法的 json（如说明文字中的 {），从这个字符起重新寻找顶层对象
+                self._reset()
+                count = 0
+                continue
+            i += 1
+        self._pos = i
+        self._compact()
+        return self.events[count:]
+
+    def _consume(self, c: str, i: int) -> bool:
+        # 返回 False 表示 c 在这里不合法
+        frame = self._stack[-1]
+        state = frame[2]
+        if state == "key":
+            if c == '"':
+                self._string_start = i
+            elif c == "}":
+                self._close(i)
+            else:
+                return False
+        elif state == "colon":
+            if c != ":":
+                return False
+            frame[2] = "value"
+        elif state == "value":
+            if c == "]" and frame[0] == "[":
+                self._close(i)
+                return True
+            if c not in '{["' and c not in _SCALAR_START:
+                return False
+            self._begin_value(c, i)
+            if c in "{[":
+                self._stack.append(["{", None, "key"] if c == "{" else ["[", 0, "value"])
+            elif c == '"':
+                self._string_start = i
+            else:
+                self._scalar_start = i
+        elif state == "comma":
+            if c == ",":
+                if frame[0] == "{":
+                    frame[2] = "key"
+                else:
+                    frame[1] += 1
+                    frame[2] = "value"
+            elif c == ("}" if frame[0] == "{" else "]"):
+                self._close(i)
+            else:
+                return False
+        return True
+
+    def _reset(self):
+        self.events = []
+        self._stack = []
+        self._string_start = None
+        self._escape = False
+        self._scalar_start = None
+        self._captures = {}
+
+    def _end_string(self, i: int):
+        start, self._string_start = self._string_start, None
+        frame = self._stack[-1]
+        if frame[2] == "key":
+            try:
+                frame[1] = json.loads(self._text[start:i + 1])
+            except ValueError:
+                frame[1] = None
+            frame[2] = "colon"
+        else:
+            self._end_value(i + 1)
+
+    def _close(self, i: int):
+        self._stack.pop()
+        if not self._stack:
+            self._done = True
+            return
+        self._end_value(i + 1)
+
+    def _begin_value(self, c: str, i: int):
+        path = [frame[1] for frame in self._stack]
+        if path[0] == entity_key:
+            wanted = len(path) == 2
+        elif path[0] == relation_key:
+            # 关系的值是单个实体名，或列表中的实体名；整个列表不交出，避免重复
+            wanted = (len(path) == 3 and c == '"') or (len(path) == 4 and self._stack[-1][0] == "[")
+        else:
+            wanted = False
+        if wanted:
+            self._captures[len(self._stack)] = i
+
+    def _end_value(self, end: int):
+        # 值在 end 之前结束，需要交出的解析后交出
+        start = self._captures.pop(len(self._stack), None)
+        if start is not None:
+            try:
+                value = json.loads(self._text[start:end])
+            except ValueError:
+                value = None
+            if value is not None:
+                path = [frame[1] for frame in self._stack]
+                if path[0] == entity_key:
+                    self.events.append(("entity", path[1], value))
+                elif not isinstance(value, (dict, list)):
+                    self.events.append(("relation", path[1], path[2], str(value)))
+        self._stack[-1][2] = "comma"
+
+    def _compact(self):
+        # 丢弃不再需要的文本，各位置随之前移
+        starts = [start for start in (self._string_start, self._scalar_start) if start is not None]
+        starts.extend(self._captures.values())
+        base = min(starts, default=self._pos)
+        if base < _COMPACT_SIZE:
+            return
+        self._text = self._text[base:]
+        self._pos -= base
+        if self._string_start is not None:
+            self._string_start -= base
+        if self._scalar_start is not None:
+            self._scalar_start -= base
+        self._captures = {depth: start - base for depth, start in self._captures.items()}
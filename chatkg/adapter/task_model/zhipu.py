@@ -1,41 +1,98 @@
-import re
+import tempfile
+import threading
+import time
 import warnings
-from typing import List, Any, Coroutine
-from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Any, Coroutine, Literal
+
+from pydantic import Field
 
 from zhipuai import ZhipuAI
 
 from chatkg.adapter.structure.base import BaseTask
+from chatkg.adapter.task_model.batch import batch_endpoint, iter_jsonl, parse_batch_line, write_batch_file
 from chatkg.adapter.task_model.base import BaseTaskModel
+from chatkg.adapter.task_model.poller import CompletionPoller, CompletionStats
+from chatkg.adapter.task_model.rate_limit import RateLimiter
+# parse_to_json、extract_json_code_block 原先定义在这里，保留导入以兼容
+from chatkg.utils.json_output import extract_json_code_block, parse_to_json
+from chatkg.utils.tokens import estimate_tokens
 
-import time
-import json
 import asyncio
 
 
 class TaskZhipuAI(BaseTaskModel):
     json_output: bool = True
+    # 默认的执行方式：sync 逐个请求，async 异步任务并发请求，batch 整批作为一个批量任务提交（延迟高、成本低，
+    # 适合一次交给 llm 的 task 较多的分批构建，流式流水线中每个 task 会单独成为一个批量任务）
+    mode: Literal["sync", "async", "batch"] = Field(default="async")
+    # 异步模式下同时在途（已提交、未取回结果）的请求数上限
+    max_concurrency: int = Field(default=8, ge=1)
+    # 每分钟请求数、token 数上限，None 为不限制；同一个模型的所有调用（包括流式流水线的多个线程）共用限额
+    rpm: int | None = Field(default=None, ge=1)
+    tpm: int | None = Field(default=None, ge=1)
+    # 异步任务提交后第一次查询结果前的等待（秒），观测到任务的完成耗时后改用其中位数；批量任务的状态查询也从这个间隔开始
+    poll_interval: float = Field(default=2, gt=0)
+    # 未完成时指数退避的查询间隔上限（秒）
+    max_poll_interval: float = Field(default=30, gt=0)
     _zhipu_client: ZhipuAI | None = None
-    _progress_bar: tqdm | None = None
-
-    def execute_task(self,
-                     task: BaseTask | List[BaseTask],
-                     mode="async",
-                     **kwargs) -> Coroutine[Any, Any, BaseTask | list[BaseTask]] | BaseTask | tuple[Any]:
-        # 1 client
-        self._zhipu_client = ZhipuAI(api_key=self.api_key)
-        # 2 进度条
-        # TODO 换成装饰器围绕递增的进度条
-        self._progress_bar = kwargs.get("progress_bar")
-        # 3 执行任务
+    _client_lock: Any = None
+    _rate_limiter: RateLimiter | None = None
+    _completion_stats: CompletionStats | None = None
+
+    def model_post_init(self, __context: Any):
+        super().model_post_init(__context)
+        self._rate_limiter = RateLimiter(self.rpm, self.tpm)
+        self._completion_stats = CompletionStats(self.poll_interval)
+        self._client_lock = threading.Lock()
+
+    def _execute_task(self,
+                      task: BaseTask | List[BaseTask],
+                      mode=None,
+                      **kwargs) -> Coroutine[Any, Any, BaseTask | list[BaseTask]] | BaseTask | tuple[Any]:
+        # 1 client，整个构建过程共用一个（连接池随之复用）
+        self._get_client()
+        # 2 执行任务；进度条与完成回调随 kwargs 传给每个 task，流式流水线的多个线程共用同一个实例
+        mode = mode or self.mode
         if mode == "sync":
             return self._execute_sync(task, **kwargs)
         elif mode == "async":
             return asyncio.run(self._execute_async(task, **kwargs))
-
+        elif mode == "batch":
+            return self._execute_batch(task, **kwargs)
+        raise ValueError(f"Unsupported mode: {mode}")
+
+    def _cache_params(self) -> dict:
+        return {**super()._cache_params(), "json_output": self.json_output}
+
+    def _get_client(self) -> ZhipuAI:
+        if self._zhipu_client is None:
+            with self._client_lock:
+                if self._zhipu_client is None:
+                    self._zhipu_client = self._create_client()
+        return self._zhipu_client
+
+    def _create_client(self) -> ZhipuAI:
+        return ZhipuAI(api_key=self.api_key, base_url=self.api_base)
+
+    @staticmethod
+    def _prompt_tokens(task: BaseTask) -> int:
+        # 构造 task 时已经估算过的用已有的，否则按 prompt 估算
+        tokens = getattr(task, "task_prompt_tokens", None)
+        if tokens is None:
+            tokens = estimate_tokens(task.task_system_prompt or "") + estimate_tokens(task.task_user_prompt or "")
+        return tokens
+
+    def _record_usage(self, response):
+        # 输出的 token 在请求完成后才知道，补记到 TPM 限额
+        usage = getattr(response, "usage", None)
+        if usage is not None and usage.completion_tokens:
+            self._rate_limiter.consume(usage.completion_tokens)
 
     def _submit_sync_single(self, task: BaseTask, **kwargs):
         client = self._zhipu_client
+        self._rate_limiter.acquire(self._prompt_tokens(task))
         response = client.chat.completions.create(
             model=self.llm_name,
             messages=[
@@ -43,102 +100,133 @@ class TaskZhipuAI(BaseTaskModel):
                 {"role": "user", "content": task.task_user_prompt},
             ]
         )
+        self._record_usage(response)
         task.task_output = response.choices[0].message.content
         if self.json_output:
             task.task_output = parse_to_json(task.task_output)
+        self._task_done(task, kwargs.get("progress_bar"), kwargs.get("on_complete"))
         return task
 
-    async def _execute_sync(self, task: BaseTask | List[BaseTask], **kwargs) -> BaseTask | List[BaseTask]:
+    def _execute_sync(self, task: BaseTask | List[BaseTask], **kwargs) -> BaseTask | List[BaseTask]:
         if isinstance(task, BaseTask):
             return self._submit_sync_single(task, **kwargs)
         elif isinstance(task, List):
-            for task in task:
-                self._submit_sync_single(task, **kwargs)
+            for single_task in task:
+                self._submit_sync_single(single_task, **kwargs)
             return task
 
-    async def _submit_async_single(self, task: BaseTask, **kwargs):
+    async def _submit_async_single(self, task: BaseTask, executor: ThreadPoolExecutor, **kwargs) -> str:
         client = self._zhipu_client
-        # 异步、任务式请求
-        response = client.chat.asyncCompletions.create(
+        await self._rate_limiter.acquire_async(self._prompt_tokens(task))
+        # 异步、任务式请求；sdk 的调用是阻塞的，放到线程池中执行，不阻塞事件循环
+        response = await asyncio.get_running_loop().run_in_executor(executor, partial(
+            client.chat.asyncCompletions.create,
             model=self.llm_name,
             messages=[
                 {"role": "system", "content": task.task_system_prompt},
                 {"role": "user", "content": task.task_user_prompt},
             ]
-        )
-        task.task_id = response.id
-        return task
-
-    async def _collect_async_single(self, task: BaseTask, **kwargs):
-        client = self._zhipu_client
-        # 等待异步任务完成
-        temp_response = None
-        temp_task_status = "PROCESSING"
-        while temp_task_status != "SUCCESS":
-            time.sleep(2)
-            if temp_task_status == "FAILED":
-                warnings.warn(f"Task {task.task_id} failed!")
-                temp_response = {
-                    "choices": [
-                        {
-                            "message": {
-                                "content": "Task failed!"
-                            }
-                        }
-                    ]
-                }
-                break
-            temp_response = client.chat.asyncCompletions.retrieve_completion_result(task.task_id)
-            temp_task_status = temp_response.task_status
-        task.task_output = temp_response.choices[0].message.content
+        ))
+        return response.id
+
+    def _apply_async_result(self, task: BaseTask, temp_response, progress_bar=None, on_complete=None):
+        if temp_response.task_status == "SUCCESS":
+            self._record_usage(temp_response)
+            task.task_output = temp_response.choices[0].message.content
+        else:
+            warnings.warn(f"Task {task.task_id} failed!")
+            task.task_output = "Task failed!"
         if self.json_output:
             task.task_output = parse_to_json(task.task_output)
-        if self._progress_bar:
-            self._progress_bar.update(1)
+        self._task_done(task, progress_bar, on_complete)
         return task
 
+    async def _execute_async_single(self, task: BaseTask, semaphore: asyncio.Semaphore,
+                                    executor: ThreadPoolExecutor, poller: CompletionPoller, **kwargs):
+        async def attempt(index: int):
+            # 提交后等待统一的轮询取回结果，等待期间让出事件循环给其他请求
+            job_id = await self._submit_async_single(task, executor, **kwargs)
+            if index == 0:
+                task.task_id = job_id
+                # 调用方（如 task 日志）需要在提交后立即记下任务 id；对冲请求不记录
+                on_submit = kwargs.get("on_submit")
+                if on_submit is not None:
+                    on_submit(task)
+            return await poller.wait(job_id)
+
+        apply_result = partial(self._apply_async_result, task, progress_bar=kwargs.get("progress_bar"),
+                               on_complete=kwargs.get("on_complete"))
+        # 从提交到取回结果都占用一个并发名额
+        async with semaphore:
+            if task.task_id is not None:
+                # 已经提交过（恢复构建），直接取结果；任务已过期等取不到时重新提交
+                try:
+                    return apply_result(await poller.wait(task.task_id))
+                except Exception as e:
+                    warnings.warn(f"Task {task.task_id} can not be collected, submitting again: {e}")
+            if self._hedger is not None:
+                return apply_result(await self._hedger.run_async(attempt))
+            return apply_result(await attempt(0))
+
     async def _execute_async(self, tasks: BaseTask | List[BaseTask], **kwargs):
-        if isinstance(tasks, BaseTask):
-            await self._submit_async_single(tasks, **kwargs)
-            result = await self._collect_async_single(tasks, **kwargs)
-            return result
-        elif isinstance(tasks, List):
-            # 创建任务列表来异步执行提交操作
-            submit_tasks = [self._submit_async_single(task, **kwargs) for task in tasks]
-            # 等待所有提交操作完成
-            await asyncio.gather(*submit_tasks)
-            # 创建任务列表来异步执行收集操作
-            collect_tasks = [self._collect_async_single(task, **kwargs) for task in tasks]
-            # 等待所有收集操作完成并获取结果
-            results = await asyncio.gather(*collect_tasks)
-            return results
-
-
-def parse_to_json(raw_str: str) -> dict:
-    try:
-        # 把 json 字符串转换为字典
-        out = json.loads(raw_str)
-    except Exception as e1:
-        # 若生成markdown代码块字符串，需要从代码块中提取json字符串
-        try:
-            # 从代码块中提取json字符串
-            out = json.loads(raw_str.split("```")[1])
-        except Exception as e2:
-            try:
-                # 从代码块中提取json字符串
-                out = extract_json_code_block(raw_str)
-            except Exception as e3:
-                # 若都失败，返回原始字符串
-                out = {
-                    "raw": raw_str
-                }
-                warnings.warn(f"Failed to parse to json: {raw_str}")
-    return out
-
-
-def extract_json_code_block(raw_str: str):
-    # Regular expression to match ```json ... ```
-    pattern = re.compile(r'```json\s*(.*?)\s*```', re.DOTALL)
-    # Find all matches
-    matches = pattern.findall(raw_str)
-    return json.loads(matches[0])
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        with ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="zhipu") as executor:
+            poller = CompletionPoller(self._zhipu_client.chat.asyncCompletions.retrieve_completion_result,
+                                      self._completion_stats, executor, max_interval=self.max_poll_interval)
+            if isinstance(tasks, BaseTask):
+                return await self._execute_async_single(tasks, semaphore, executor, poller, **kwargs)
+            elif isinstance(tasks, List):
+                # 所有任务同时开始，由信号量限制在途的请求数，由限流器限制请求速率
+                return await asyncio.gather(
+                    *(self._execute_async_single(task, semaphore, executor, poller, **kwargs) for task in tasks))
+
+    def _execute_batch(self, task: BaseTask | List[BaseTask], **kwargs) -> BaseTask | List[BaseTask]:
+        tasks = [task] if isinstance(task, BaseTask) else task
+        client = self._zhipu_client
+        # 1 序列化为 jsonl 并上传，临时文件在磁盘上，大批量时不占内存
+        with tempfile.TemporaryFile() as f:
+            custom_ids = write_batch_file(tasks, f, self.llm_name)
+            f.seek(0)
+            input_file = client.files.create(file=("tasks.jsonl", f), purpose="batch")
+        batch = client.batches.create(input_file_id=input_file.id, endpoint=batch_endpoint, completion_window="24h")
+        # 2 等待批量任务结束
+        batch = self._wait_batch(batch)
+        # 3 逐行读取结果文件与错误文件，按 custom_id 写回 task
+        set_output = partial(self._set_output, progress_bar=kwargs.get("progress_bar"),
+                             on_complete=kwargs.get("on_complete"))
+        pending = dict(zip(custom_ids, tasks))
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for record in iter_jsonl(client.files.content(file_id).iter_bytes()):
+                custom_id, content, usage, error = parse_batch_line(record)
+                single_task = pending.pop(custom_id, None)
+                if single_task is None:
+                    continue
+                if error is not None:
+                    warnings.warn(f"Task {custom_id} in batch {batch.id} failed: {error}")
+                    content = "Task failed!"
+                elif usage:
+                    self._rate_limiter.consume(usage.get("completion_tokens", 0))
+                set_output(single_task, content)
+        if pending:
+            warnings.warn(f"{len(pending)} tasks have no result in batch {batch.id} ({batch.status})")
+            for single_task in pending.values():
+                set_output(single_task, "Task failed!")
+        return task
+
+    def _wait_batch(self, batch):
+        # 批量任务通常要几分钟到几小时，查询间隔指数增长到 max_poll_interval
+        interval = self.poll_interval
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+            batch = self._zhipu_client.batches.retrieve(batch.id)
+        if batch.status != "completed":
+            warnings.warn(f"Batch {batch.id} ended with status {batch.status}")
+        return batch
+
+    def _set_output(self, task: BaseTask, content: str, progress_bar=None, on_complete=None):
+        task.task_output = parse_to_json(content) if self.json_output else content
+        self._task_done(task, progress_bar, on_complete)
+
@@ -8,16 +8,6 @@ import warnings
 import time
 from typing import List
 
-from numpy.ma.extras import unique
-from tqdm import tqdm
-from langchain_core.prompts import PromptTemplate
-from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
-from chatkg.adapter.database.GraphNeo4j import GraphNeo4j, CypherNodeState
-from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
-from zhipuai import ZhipuAI
-
-from chatkg.adapter.database import CypherRelationState
-
 default_system_prompt = (
     "你是一个知识提取助手，你的任务是分析用户提供的文本，并从中提取关键信息。"
     "在提取信息时，请专注于事实、数据点和关键概念。"
@@ -111,11 +101,28 @@ class GraphBuilder:
             raise ValueError(f"Value must be one of {self._allowed_engines}")
         self._engine = new_val
 
-    def get_doc_trees(self, **engine_kwargs):
+    def get_doc_trees(self, snapshot: str | None = None, **engine_kwargs):
+        # snapshot：二进制快照路径，源文件与读取参数未变化时直接从快照加载解析结果
         if self.doc_struct is None:
-            self.doc_struct = str(MarkdownReader(file=self.file, **engine_kwargs).indexing())
+            if snapshot is None:
+                from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+                self.doc_struct = str(MarkdownReader(file=self.file, **engine_kwargs).indexing())
+            else:
+                self.doc_struct = str(self._load_doc_forest(snapshot, engine_kwargs))
         return self.doc_struct
 
+    def _load_doc_forest(self, snapshot: str, kwargs):
+        from chatkg.adapter.engine.manifest import fingerprint
+        from chatkg.adapter.structure.ColumnarForest import ColumnarForest
+        from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+        reader = MarkdownReader(file=self.file, **kwargs)
+        snapshot_fp = fingerprint(type(reader).__name__, reader.model_dump_json(exclude={"file"}), *reader.file)
+        forest = ColumnarForest.load(snapshot, snapshot_fp)
+        if forest is None:
+            forest = reader.indexing()
+            forest.save(snapshot, snapshot_fp)
+        return forest
+
     def build(self, **engine_kwargs):
         if self.engine == "graphrag":
             self._graphrag_engine(engine_kwargs)
@@ -127,6 +134,9 @@ class GraphBuilder:
 
 
     def _tradition_engine(self, kwargs):
+        from tqdm import tqdm
+        from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
+        from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
         # 0. 建立一个缓存工作目录，后续会用到
         temp_dir = f"temp/{time.strftime('%Y%m%d%H%M%S')}"
         if not os.path.exists(temp_dir):
@@ -137,34 +147,26 @@ class GraphBuilder:
         tasks = []
         # 1.1 读取文件
         info = MarkdownReader(file=self.file, **kwargs).indexing()
-        # 1.2 根据每一个 info 节点构造一个 task
+        # 1.2 根据每一个 info 节点构造一个 task，模板只解析一次
+        from chatkg.adapter.engine.prompt_compiler import PromptCompiler
+        prompt_compiler = PromptCompiler(self.prompt_template, self.insertion_template, default_level_names,
+                                         default_content_names, default_output_format)
         executing_tasks_progress = tqdm(total=info.count_node(), desc="Executing tasks")
         for info_tree in info:
             for node_title_list, node_content in info_tree:
                 if not node_content:
                     continue
-                # 1.2.1 准备插入语，准备路径数组
-                source_list = []
-                temp_insertions = ""
-                for i, title in enumerate(node_title_list):
-                    temp_insertions += self.insertion_template.format(level_name=default_level_names[i],
-                                                                      level_content=title)
-                    source_list.append(title)
-                temp_insertions += self.insertion_template.format(level_name=default_content_names,
-                                                                  level_content=node_content)
-                # 1.2.2 准备 prompt
-                temp_prompt = (PromptTemplate
-                               .from_template(self.prompt_template)
-                               .invoke({"insertion": temp_insertions, "output_format": default_output_format})
-                               .to_string())
-                # 1.2.3 构建 task，填补 prompt 添加到 tasks 列表中
-                temp_task_result = InfoTreeTaskResult(source=source_list, entity=[], relation=[])
-                temp_task = InfoTreeTask(task_user_prompt=temp_prompt, task_result=temp_task_result)
+                # 1.2.1 准备 prompt：各级标题与正文的插入语代入模板
+                temp_prompt = prompt_compiler.render_section(node_title_list, node_content)
+                # 1.2.2 构建 task，填补 prompt 添加到 tasks 列表中
+                temp_task_result = InfoTreeTaskResult(source=list(node_title_list), entity=[], relation=[])
+                temp_task = InfoTreeTask(task_user_prompt=temp_prompt.text, task_result=temp_task_result,
+                                         task_prompt_bytes=temp_prompt.bytes, task_prompt_tokens=temp_prompt.tokens)
                 tasks.append(temp_task)
         # 2. 调用 TaskLLM，构建知识图谱
         try:
             # 2.1 从llm参数中获取client，当前这里是智谱AI，后续再做拓展
-            client: ZhipuAI = kwargs.get("llm")
+            client = kwargs.get("llm")
             for task in tasks:
                 # 2.2 异步、任务式请求（默认）
                 temp_response = client.chat.asyncCompletions.create(
@@ -269,6 +271,7 @@ class GraphBuilder:
         pass
 
     def load(self, file_path):
+        from chatkg.adapter.structure.InfoTree import InfoTreeTask
         with open(file_path, "r", encoding="utf-8") as f:
             self._final_result = json.load(f)
         new_final_result = []
@@ -280,6 +283,7 @@ class GraphBuilder:
     def persist(self, **kwargs):
         if self._final_result is None:
             raise ValueError("No result to persist")
+        from chatkg.adapter.database.CypherState import CypherNodeState, CypherRelationState
         # 1. 获取图数据库客户端
         graph = kwargs.get("graph_client")
         # 2. 去重，节点合并（关系不用合并）  测试方案：单纯的结果合并
@@ -287,7 +291,7 @@ class GraphBuilder:
         for result in self._final_result:
             for node in result.task_result.entity:
                 # 此时的 node 都是 key 为名，value 为属性的字典
-                result.task_result.entity[node]["source"] = result.task_result.source
+                result.task_result.entity[node]["source"] = result.task_result.source_of(node)
                 if node not in extract_node_dict:
                     extract_node_dict[node] = result.task_result.entity[node]
                 else:
@@ -344,8 +348,7 @@ def merge_dicts(dict1, dict2, skip_keys=None):
             # If key exists in both, concatenate their values
             if key not in skip_keys:
                 if type(dict1[key]) is list and type(dict2[key]) is list:
-                    merged_dict[key] = dict1[key] + dict2[key]
-                    merged_dict[key] = list(unique(merged_dict[key]))
+                    merged_dict[key] = unique(dict1[key] + dict2[key])
                 else:
                     merged_dict[key] = str(dict1[key]) + "\n" + str(dict2[key])
         else:
@@ -358,6 +361,22 @@ def merge_dicts(dict1, dict2, skip_keys=None):
     return merged_dict
 
 
+def unique(items: list) -> list:
+    # 保序去重，元素不可哈希（如标题路径列表）时按 json 字符串去重
+    seen = set()
+    result = []
+    for item in items:
+        key = item
+        try:
+            hash(key)
+        except TypeError:
+            key = json.dumps(item, ensure_ascii=False, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
+
+
 if __name__ == "__main__":
     """
     GraphBuilder类将会是用户使用本程序的核心类之一，用户将会通过这个类来构建知识图谱。
@@ -365,6 +384,8 @@ if __name__ == "__main__":
     这个类还在不断完善开发，后续会将每个组件拆分到其他文件中，以便于维护。
     """
     from dotenv import load_dotenv
+    from zhipuai import ZhipuAI
+    from chatkg.adapter.database.GraphNeo4j import GraphNeo4j
     load_dotenv()
 
     zhipu_client = ZhipuAI(api_key=os.getenv("ZHIPU_API_KEY"))
@@ -0,0 +1,36 @@
+"""
+解析 llm 输出的 json：直接是 json，或包含在 markdown 代码块中；各任务模型共用，不依赖任何模型的 sdk
+"""
+import json
+import re
+import warnings
+
+
+def parse_to_json(raw_str: str) -> dict:
+    try:
+        # 把 json 字符串转换为字典
+        out = json.loads(raw_str)
+    except Exception as e1:
+        # 若生成markdown代码块字符串，需要从代码块中提取json字符串
+        try:
+            # 从代码块中提取json字符串
+            out = json.loads(raw_str.split("```")[1])
+        except Exception as e2:
+            try:
+                # 从代码块中提取json字符串
+                out = extract_json_code_block(raw_str)
+            except Exception as e3:
+                # 若都失败，返回原始字符串
+                out = {
+                    "raw": raw_str
+                }
+                warnings.warn(f"Failed to parse to json: {raw_str}")
+    return out
+
+
+def extract_json_code_block(raw_str: str):
+    # Regular expression to match ```json ... ```
+    pattern = re.compile(r'```json\s*(.*?)\s*```', re.DOTALL)
+    # Find all matches
+    matches = pattern.findall(raw_str)
+    return json.loads(matches[0])
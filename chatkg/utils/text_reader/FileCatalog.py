@@ -0,0 +1,115 @@
+import json
+import os
+from fnmatch import fnmatch
+from typing import Dict, Iterator, List
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+# 进程内的目录清单缓存：目录路径 -> {"mtime": ..., "files": [...], "dirs": [...]}
+_listing_cache: Dict[str, dict] = {}
+
+
+class FileCatalog(BaseModel):
+    """
+    文件目录：用 os.scandir 遍历 root 下的文件，支持 include/exclude 通配符、文件类型与最大深度，
+    可以作为迭代器在遍历完成前就交出文件
+
+    遍历结果按目录缓存，并记录目录的 mtime；目录中增删文件或子目录会改变其 mtime，
+    mtime 不变的目录直接使用缓存的清单，不再 scandir
+    """
+    # 推迟到第一次实例化时才生成校验器，import 时不构建 schema
+    model_config = ConfigDict(defer_build=True)
+    root: str
+    # 通配符匹配相对 root 的路径（/ 分隔），include 为空时不过滤
+    include: List[str] = Field(default_factory=list)
+    # 匹配的文件被排除，匹配的目录整棵子树被跳过
+    exclude: List[str] = Field(default_factory=list)
+    # 文件扩展名（不含点）
+    file_type: List[str] | None = Field(default=None)
+    # 最大深度，0 表示只列出 root 下的文件，None 表示不限制
+    max_depth: int | None = Field(default=None)
+    # 缓存文件，不提供时只在进程内缓存
+    cache_file: str | None = Field(default=None)
+
+    @field_validator("file_type", mode="before")
+    def check_file_type(cls, value):
+        if isinstance(value, str):
+            value = [value]
+        return value
+
+    def __iter__(self):
+        return self.iter_files()
+
+    def list_files(self) -> List[str]:
+        return list(self.iter_files())
+
+    def iter_files(self) -> Iterator[str]:
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f"Directory not found: {self.root}")
+        cache = self._load_cache()
+        dirty = False
+        # 深度优先，目录内按名称排序，保证每次遍历的顺序一致
+        stack = [(self.root, "", 0)]
+        # 已遍历目录的 (st_dev, st_ino)：符号链接指向的目录照常进入，但同一目录只遍历一次，链接成环时不会无限遍历
+        visited = set()
+        try:
+            while stack:
+                directory, rel_dir, depth = stack.pop()
+                stat = os.stat(directory)
+                if (stat.st_dev, stat.st_ino) in visited:
+                    continue
+                visited.add((stat.st_dev, stat.st_ino))
+                listing, updated = _list_directory(directory, stat.st_mtime_ns, cache)
+                dirty = dirty or updated
+                for name in listing["files"]:
+                    rel_path = f"{rel_dir}{name}"
+                    if self._match_file(name, rel_path):
+                        yield os.path.join(directory, name)
+                if self.max_depth is not None and depth >= self.max_depth:
+                    continue
+                for name in reversed(listing["dirs"]):
+                    rel_path = f"{rel_dir}{name}"
+                    if not self._excluded(rel_path):
+                        stack.append((os.path.join(directory, name), f"{rel_path}/", depth + 1))
+        finally:
+            # 调用方提前结束遍历（break、异常）时，已经列出的目录也写入缓存
+            if dirty:
+                self._save_cache(cache)
+
+    def _match_file(self, name: str, rel_path: str) -> bool:
+        if self.file_type and name.rsplit(".", 1)[-1] not in self.file_type:
+            return False
+        if self.include and not any(fnmatch(rel_path, pattern) for pattern in self.include):
+            return False
+        return not self._excluded(rel_path)
+
+    def _excluded(self, rel_path: str) -> bool:
+        return any(fnmatch(rel_path, pattern) for pattern in self.exclude)
+
+    def _load_cache(self) -> Dict[str, dict]:
+        if self.cache_file and os.path.isfile(self.cache_file):
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                _listing_cache.update(json.load(f))
+        return _listing_cache
+
+    def _save_cache(self, cache: Dict[str, dict]):
+        if not self.cache_file:
+            return
+        root = os.path.join(self.root, "")
+        with open(self.cache_file, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in cache.items() if k == self.root or k.startswith(root)}, f, ensure_ascii=False)
+
+
+def _list_directory(directory: str, mtime: int, cache: Dict[str, dict]):
+    cached = cache.get(directory)
+    if cached is not None and cached["mtime"] == mtime:
+        return cached, False
+    files, dirs = [], []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            (dirs if entry.is_dir() else files).append(entry.name)
+    files.sort()
+    dirs.sort()
+    listing = {"mtime": mtime, "files": files, "dirs": dirs}
+    cache[directory] = listing
+    return listing, True
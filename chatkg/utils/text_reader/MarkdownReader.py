@@ -1,74 +1,160 @@
-from pydantic import Field
-from tqdm import tqdm
+import os
+from functools import partial
+from typing import Iterator
 
+from pydantic import Field, field_validator, model_validator
 
-from langchain_text_splitters import MarkdownHeaderTextSplitter
-from chatkg.adapter.structure.InfoTree import InfoForest, InfoTree, InfoNode
-from chatkg.utils.text_reader.base import BaseReader
+
+from chatkg.adapter.structure.ColumnarForest import ColumnarForest
+from chatkg.adapter.structure.InfoTree import InfoForest, InfoTree, InfoNode, get_source_map
+from chatkg.utils.text_reader.base import BaseReader, parallel_map_ordered
+from chatkg.utils.text_reader.markdown_parser import parse_markdown, default_root_title
+
+# native：内置单遍标题解析器；langchain：MarkdownHeaderTextSplitter，保留用于结果比对
+support_parsers = ["native", "langchain"]
 
 
 class MarkdownReader(BaseReader):
     skip_mark: str
     index_str: str | None = Field(default=None)
+    # 并行索引的进程数，None 表示使用全部 CPU，1 表示在当前进程中串行索引
+    workers: int | None = Field(default=1)
+    # 文件数少于该值时不值得启动进程池，回退为串行索引
+    parallel_min_files: int = Field(default=8)
+    # 标题解析器，见 support_parsers
+    parser: str = Field(default="native")
+    # 节点正文只记录为源文件中的 SourceSpan，通过内存映射按需读取，仅 native 解析器支持
+    lazy_content: bool = Field(default=False)
+    # indexing() 返回列式存储的 ColumnarForest，节点数很多时内存占用远小于 InfoForest
+    columnar: bool = Field(default=False)
 
-    def indexing(self):
-        splitter = MarkdownHeaderTextSplitter(
-            headers_to_split_on=[
-                ("#", "Header1"),
-                ("##", "Header2"),
-                ("###", "Header3"),
-                ("####", "Header4"),
-                ("#####", "Header5"),
-                ("######", "Header6"),
-                ("#######", "Header7"),
-                ("########", "Header8")
-            ],
-            return_each_line=False,
-        )
+    @field_validator("parser")
+    def check_parser(cls, value):
+        if value not in support_parsers:
+            raise ValueError(f"Unsupported parser: {value}, should be one of {support_parsers}")
+        return value
+
+    @model_validator(mode="after")
+    def check_lazy_content(self):
+        if self.lazy_content and self.parser != "native":
+            raise ValueError("lazy_content is only supported by the native parser")
+        return self
 
-        forest = InfoForest()
+    def indexing(self):
+        # 列式存储时每棵树解析后立即转存到数组中，InfoTree 随即释放
+        forest = ColumnarForest() if self.columnar else InfoForest()
         # 1. 逐个处理md文件
-        for md in tqdm(self.file, desc="Indexing markdown files"):
-            # 打开文件，加载文件内容
-            with open(md, "r", encoding="utf-8") as f:
-                markdown_text = f.read()
-            # 分割/格式化文件内容
-            doc_para_list = splitter.split_text(markdown_text)
-            # 构造 info 树
-            temp_node = None
-            info_tree = InfoTree(
-                InfoNode(
-                    title="《离散数学》",
-                    content=None,
-                    parent=None,
-                    level=0
-                )
-            )
-            for doc in doc_para_list:
-                if self.skip_mark in str(doc.metadata):
-                    continue
-                # 获得最后一个键值对的键值对应的值
-                title_list = list(doc.metadata.keys())
-                now_doc_title = doc.metadata[title_list[-1]]
-                now_doc_level = len(title_list)
-                now_doc_content = doc.page_content
-                now_node = InfoNode(
-                    title=now_doc_title,
-                    content=now_doc_content,
-                    level=now_doc_level
-                )
-                # 给这个 temp_node 只是为了方便插入节点，减小时间复杂度
-                info_tree.insert_node(temp_node, now_node, now_doc_level)
-                temp_node = now_node
+        for info_tree in self.iter_indexing():
             forest.add_tree(info_tree)
         return forest
 
+    def iter_indexing(self, unit: str = "tree", files: list | None = None) -> Iterator[InfoTree | InfoNode]:
+        # 流式索引：每次只读取、解析一个文件，交出一棵 InfoTree（或逐个交出 InfoNode），
+        # 交出后不再持有引用，峰值内存只取决于最大的单个文件；files 用于只索引部分文件
+        files = self.file if files is None else files
+        if unit not in ("tree", "node"):
+            raise ValueError(f"Invalid indexing unit: {unit}, should be 'tree' or 'node'")
+        index_file = partial(_index_markdown_file, skip_mark=self.skip_mark, parser=self.parser,
+                             lazy_content=self.lazy_content)
+        # FileCatalog 边遍历边交出文件，总数未知
+        file_cnt = len(files) if isinstance(files, list) else None
+        workers = self._resolve_workers(file_cnt)
+        if workers > 1:
+            # 多进程并行解析，结果仍按文件顺序交出
+            info_trees = parallel_map_ordered(index_file, files, workers)
+        else:
+            info_trees = map(index_file, files)
+        from tqdm import tqdm
+        for info_tree in tqdm(info_trees, total=file_cnt, desc="Indexing markdown files"):
+            if unit == "tree":
+                yield info_tree
+            else:
+                yield from info_tree.iter_nodes()
+
+    def _resolve_workers(self, file_cnt: int | None) -> int:
+        workers = self.workers if self.workers is not None else os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError(f"Invalid workers: {self.workers}, should be a positive integer or None")
+        if file_cnt is None:
+            return workers
+        return min(workers, file_cnt) if file_cnt >= self.parallel_min_files else 1
+
     def get_index(self):
         if self.index_str is None:
             raise ValueError("Index not found, please indexing first")
         return self.indexing()
 
 
+# 每个进程只构造一次 splitter
+_splitter = None
+
+
+def _index_markdown_file(md: str, skip_mark: str, parser: str = "native", lazy_content: bool = False) -> InfoTree:
+    if parser != "native":
+        info_tree = _index_markdown_file_langchain(md, skip_mark)
+    elif lazy_content and os.path.getsize(md) > 0:
+        # 直接在内存映射上解析，正文只记录偏移与长度
+        abs_md = os.path.abspath(md)
+        info_tree = parse_markdown(get_source_map(abs_md), skip_mark=skip_mark, source=abs_md)
+    else:
+        with open(md, "rb") as f:
+            info_tree = parse_markdown(f.read(), skip_mark=skip_mark)
+    info_tree.source = md
+    return info_tree
+
+
+def _index_markdown_file_langchain(md: str, skip_mark: str) -> InfoTree:
+    global _splitter
+    if _splitter is None:
+        _splitter = _build_splitter()
+    # 打开文件，加载文件内容
+    with open(md, "r", encoding="utf-8") as f:
+        markdown_text = f.read()
+    # 分割/格式化文件内容
+    doc_para_list = _splitter.split_text(markdown_text)
+    # 构造 info 树
+    info_tree = InfoTree(
+        InfoNode(
+            title=default_root_title,
+            content=None,
+            parent=None,
+            level=0
+        )
+    )
+    for doc in doc_para_list:
+        if skip_mark in str(doc.metadata):
+            continue
+        # 获得最后一个键值对的键值对应的值
+        title_list = list(doc.metadata.keys())
+        now_doc_title = doc.metadata[title_list[-1]]
+        now_doc_level = len(title_list)
+        now_doc_content = doc.page_content
+        now_node = InfoNode(
+            title=now_doc_title,
+            content=now_doc_content,
+            level=now_doc_level
+        )
+        info_tree.insert_node(None, now_node, now_doc_level)
+    return info_tree
+
+
+def _build_splitter():
+    from langchain_text_splitters import MarkdownHeaderTextSplitter
+    return MarkdownHeaderTextSplitter(
+        headers_to_split_on=[
+            ("#", "Header1"),
+            ("##", "Header2"),
+            ("###", "Header3"),
+            ("####", "Header4"),
+            ("#####", "Header5"),
+            ("######", "Header6"),
+            ("#######", "Header7"),
+            ("########", "Header8")
+        ],
+        return_each_line=False,
+    )
+
+
 # if __name__ == "__main__":
 #     # 1. 创建MarkdownReader对象
 #     md_reader = MarkdownReader(file="../../core/temp/ch1.md", skip_mark="<abd>")
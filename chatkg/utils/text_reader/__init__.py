@@ -1,3 +1,4 @@
+from chatkg.utils.text_reader.FileCatalog import FileCatalog
 from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
 
-__all__ = ["MarkdownReader"]
\ No newline at end of file
+__all__ = ["FileCatalog", "MarkdownReader"]
\ No newline at end of file
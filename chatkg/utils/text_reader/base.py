@@ -1,12 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import Dict
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator
 
-from pydantic import BaseModel, field_validator, model_validator
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
 
 import os
 
+from chatkg.utils.text_reader.FileCatalog import FileCatalog
+
+
 class BaseReader(BaseModel, ABC):
-    file: str | list | None
+    # 推迟到第一次实例化时才生成校验器，import 时不构建 schema
+    model_config = ConfigDict(defer_build=True)
+    # 文件路径、目录路径、文件路径列表，或按需遍历的 FileCatalog
+    file: str | list | FileCatalog | None
     file_type: str | list | None = None
 
 
@@ -18,6 +25,16 @@ class BaseReader(BaseModel, ABC):
     def get_index(self):
         pass
 
+    def iter_indexing(self, unit: str = "tree", files: list | None = None):
+        # 默认实现：一次性索引后再逐个交出，支持流式读取的 reader 应重写此方法；files 用于只索引部分文件
+        reader = self if files is None else self.model_copy(update={"file": files})
+        forest = reader.indexing()
+        for info_tree in forest:
+            if unit == "tree":
+                yield info_tree
+            else:
+                yield from info_tree.iter_nodes()
+
     @field_validator('file_type')
     def check_file_type(cls, value):
         if not value:
@@ -42,8 +59,7 @@ class BaseReader(BaseModel, ABC):
             if isfile(file):
                 file = [file]
             elif isdir(file):
-                file_list = []
-                list_files(file, file_list, file_type)
+                file_list = FileCatalog(root=file, file_type=file_type).list_files()
                 if file_list:
                     file = file_list
                 else:
@@ -54,6 +70,10 @@ class BaseReader(BaseModel, ABC):
             for f in file:
                 if not os.path.isfile(f):
                     raise FileNotFoundError(f"File not found: {f}")
+        elif isinstance(file, FileCatalog):
+            # 目录在读取时才遍历，reader 可以在遍历完成前开始工作
+            if not isdir(file.root):
+                raise FileNotFoundError(f"Directory not found: {file.root}")
         else:
             raise ValueError(f"Invalid file param: {file}")
         values["file"] = file
@@ -68,17 +88,25 @@ def isfile(path):
 
 
 def list_files(directory, file_list, file_type=None):
-    # 遍历指定目录下的所有文件和子目录
-    for item in os.listdir(directory):
-        # 拼接完整的文件或目录路径
-        path = os.path.join(directory, item)
-        # 如果是目录，递归调用list_files函数
-        if isdir(path):
-            list_files(path, file_list)
-        # 如果是文件，将路径添加到列表中
-        else:
-            if not file_type:
-                file_list.append(path)
-            else:
-                if path.split(".")[-1] in file_type:
-                    file_list.append(path)
\ No newline at end of file
+    # 遍历指定目录下的所有文件（含子目录），按 file_type 过滤
+    file_list.extend(FileCatalog(root=directory, file_type=file_type).iter_files())
+
+
+def parallel_map_ordered(func: Callable, items: Iterable, workers: int, window: int | None = None) -> Iterator:
+    """
+    用进程池执行 func，按 items 的原始顺序交出结果
+    :param func: 可被 pickle 的模块级函数
+    :param items: 待处理的参数
+    :param workers: 进程数
+    :param window: 同时在途的任务数，默认为进程数的两倍，限制已完成但未被消费的结果占用的内存
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    window = window or workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
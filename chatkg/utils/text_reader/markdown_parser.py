@@ -0,0 +1,116 @@
+"""
+原生 markdown 标题解析器：一次线性扫描，直接把各级标题及其正文构造成 InfoTree
+
+与 MarkdownHeaderTextSplitter 的约定保持一致：
+- 1~8 个 # 加空格（或仅有 #）的行是标题，节点的 level 为其在标题栈中的深度
+- ``` 与 ~~~ 围起来的代码块中的 # 不视为标题
+- 标题（或其任一上级标题）中含有 skip_mark 的整节跳过
+不同之处在于正文保留原始文本（不逐行 strip），没有正文的标题也会成为节点，保证标题路径完整
+"""
+from chatkg.adapter.structure.InfoTree import InfoTree, InfoNode, SourceSpan
+
+default_root_title = "《离散数学》"
+
+_BOM = b"\xef\xbb\xbf"
+_WHITESPACE = b" \t\r\n\f\v"
+_MAX_HEADER_MARKS = 8
+
+
+class _Section:
+    # 标题栈中的一项：标题的 # 个数、对应节点（被跳过时为 None）
+    __slots__ = ("marks", "node")
+
+    def __init__(self, marks: int, node: InfoNode | None):
+        self.marks = marks
+        self.node = node
+
+
+def parse_markdown(buf: bytes,
+                   skip_mark: str | None = None,
+                   root_title: str = default_root_title,
+                   source: str | None = None) -> InfoTree:
+    """
+    解析 utf-8 编码的 markdown 文本
+    :param buf: 文件内容，bytes 或任意支持切片与 find 的缓冲区（如 mmap）
+    :param skip_mark: 跳过标记
+    :param root_title: 根节点标题
+    :param source: buf 对应的源文件路径，提供时节点正文只记录为 SourceSpan，不解码、不复制
+    :return: InfoTree
+    """
+    skip = skip_mark.encode("utf-8") if skip_mark else None
+    root = InfoNode(title=root_title, content=None, level=0)
+    info_tree = InfoTree(root)
+    stack = [_Section(0, root)]
+
+    pos = len(_BOM) if buf[:len(_BOM)] == _BOM else 0
+    end_of_buf = len(buf)
+    body_start = pos
+    fence = None
+    while pos < end_of_buf:
+        line_end = buf.find(b"\n", pos)
+        if line_end == -1:
+            line_end = end_of_buf
+        next_pos = line_end + 1
+        line = buf[pos:line_end].strip()
+        # 1. 代码块内的行一律是正文
+        if fence is not None:
+            if line.startswith(fence):
+                fence = None
+        elif line.startswith(b"```") and line.count(b"```") == 1:
+            fence = b"```"
+        elif line.startswith(b"~~~"):
+            fence = b"~~~"
+        # 2. 标题行：结束上一节正文，压入新标题
+        elif line.startswith(b"#"):
+            marks = _header_marks(line)
+            if marks:
+                _close_section(buf, stack[-1], body_start, pos, source)
+                while stack[-1].marks >= marks:
+                    stack.pop()
+                title = "".join(filter(str.isprintable, line[marks:].strip().decode("utf-8")))
+                stack.append(_open_section(info_tree, stack, marks, title, skip))
+                body_start = next_pos
+        pos = next_pos
+    _close_section(buf, stack[-1], body_start, end_of_buf, source)
+    return info_tree
+
+
+def _header_marks(line: bytes) -> int:
+    marks = len(line) - len(line.lstrip(b"#"))
+    if marks > _MAX_HEADER_MARKS:
+        return 0
+    if len(line) == marks or line[marks:marks + 1] == b" ":
+        return marks
+    return 0
+
+
+def _open_section(info_tree: InfoTree, stack: list, marks: int, title: str, skip: bytes | None) -> _Section:
+    parent = stack[-1]
+    if parent.node is None or (skip and skip in title.encode("utf-8")):
+        # 被跳过的标题及其所有子标题都不构造节点
+        return _Section(marks, None)
+    # 同一父标题下的重名标题由 InfoTree 合并为一个节点
+    level = len(stack)
+    node = info_tree.insert_node(None, InfoNode(title=title, content=None, level=level), level)
+    return _Section(marks, node)
+
+
+def _close_section(buf, section: _Section, start: int, end: int, source: str | None):
+    if section.node is None:
+        return
+    start, end = _trim(buf, start, end)
+    if start >= end:
+        return
+    if source is None:
+        section.node.append_content(buf[start:end].decode("utf-8"))
+    else:
+        section.node.append_content(SourceSpan(source, start, end - start))
+
+
+def _trim(buf, start: int, end: int):
+    # 只移动下标去掉首尾空白，不复制正文
+    while start < end and buf[start] in _WHITESPACE:
+        start += 1
+    while end > start and buf[end - 1] in _WHITESPACE:
+        end -= 1
+    return start, end
@@ -0,0 +1,14 @@
+"""
+不分词的 token 数估算，用于构造请求时的预算与限流；引擎与各任务模型共用
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    return estimate_tokens_from_size(len(text), len(text.encode("utf-8")))
+
+
+def estimate_tokens_from_size(chars: int, n_bytes: int) -> int:
+    # 中日韩字符大致一个字一个 token，其余字符大致四个一个 token；
+    # utf-8 中中日韩字符及全角标点都是 3 字节、ASCII 为 1 字节，由字节数与字符数即可估出宽字符个数，无需逐字匹配
+    wide_cnt = min((n_bytes - chars) // 2, chars)
+    return wide_cnt + (chars - wide_cnt + 3) // 4
@@ -0,0 +1,38 @@
+"""
+不请求 api 的任务模型与测试语料，供 test/engine 中的测试使用
+"""
+from typing import List
+
+from chatkg.adapter.task_model.base import BaseTaskModel
+
+
+class FakeLLM(BaseTaskModel):
+    """
+    每个 task 的输出为以其标题路径最后一级命名的实体；requested 记下请求过的 task_key
+    构造时需给出 llm_name（否则取自环境变量 LLM_NAME）
+    fail_after 个 task 之后抛出异常，模拟构建中断；notify 为 False 时不回调 on_complete，模拟未适配的模型
+    """
+    fail_after: int | None = None
+    notify: bool = True
+    requested: List[str] = []
+
+    def _execute_task(self, task, mode=None, **kwargs):
+        for single_task in task if isinstance(task, list) else [task]:
+            if self.fail_after is not None and len(self.requested) >= self.fail_after:
+                raise RuntimeError("interrupted")
+            self.requested.append(single_task.task_key)
+            source = single_task.task_result.source
+            name = source[-1] if isinstance(source, list) and source else str(source)
+            single_task.task_output = {"知识实体": {name: {"来源": "测试"}}, "实体关系": {}}
+            if self.notify:
+                self._task_done(single_task, kwargs.get("progress_bar"), kwargs.get("on_complete"))
+        return task
+
+
+def write_markdown(path: str, sections: int, title: str = "测试") -> str:
+    # 一个一级标题下 sections 个正文各不相同的二级标题
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# {title}\n\n")
+        for i in range(sections):
+            f.write(f"## 第{i}节\n\n第{i}节的正文，内容各不相同：{i * 7919}。\n\n")
+    return path
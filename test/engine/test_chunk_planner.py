@@ -0,0 +1,107 @@
+"""
+按 token 预算规划抽取请求：打包相邻的小节、切分大节并保留重叠、打包时实体对应回各自的节
+用法：pytest test/engine
+"""
+import pytest
+
+from chatkg.adapter.engine.chunk_planner import ChunkPlanner, locate_entity
+from chatkg.adapter.engine.tradition import TraditionEngine
+from chatkg.adapter.structure.InfoTree import InfoTreeTaskResult
+
+
+def make_planner(**kwargs):
+    # 不加载 tiktoken，ASCII 文本按四个字符一个 token 估算
+    return ChunkPlanner(encoding=None, **kwargs)
+
+
+def make_lines(n: int) -> str:
+    return "".join(f"line {i:04d} of the section\n" for i in range(n))
+
+
+def test_pack_siblings_under_same_parent():
+    planner = make_planner(max_tokens=64)
+    sections = [(["doc", "a", f"a{i}"], f"short text {i}") for i in range(3)] + \
+               [(["doc", "b", "b0"], "other parent")]
+    units = list(planner.plan(sections))
+    assert [len(unit.sections) for unit in units] == [3, 1]
+    # 打包时 source 为共同的上级标题路径，各节的标题路径在 sources 中
+    assert units[0].source == ["doc", "a"]
+    assert units[0].sources == [["doc", "a", f"a{i}"] for i in range(3)]
+    assert units[1].source == ["doc", "b", "b0"] and units[1].sources is None
+
+    units = list(make_planner(max_tokens=64, pack=False).plan(sections))
+    assert [len(unit.sections) for unit in units] == [1, 1, 1, 1]
+
+
+def test_pack_respects_budget():
+    planner = make_planner(max_tokens=40)
+    sections = [(["doc", "a", f"a{i}"], "x" * 60) for i in range(4)]
+    units = list(planner.plan(sections))
+    for unit in units:
+        assert sum(planner.count_tokens(content) + sum(planner.count_tokens(title) for title in path)
+                   for path, content in unit.sections) <= planner.max_tokens
+    assert sum(len(unit.sections) for unit in units) == 4 and len(units) == 2
+
+
+def test_split_with_overlap():
+    planner = make_planner(max_tokens=64, overlap_tokens=16)
+    title_path = ["doc", "big"]
+    content = make_lines(40)
+    units = list(planner.plan([(title_path, content)]))
+    assert len(units) > 1
+    assert [unit.part for unit in units] == list(range(len(units)))
+    assert all(unit.parts == len(units) and unit.source == title_path for unit in units)
+    budget = planner.max_tokens - sum(planner.count_tokens(title) for title in title_path)
+    pieces = [unit.sections[0][1] for unit in units]
+    for piece in pieces:
+        assert planner.count_tokens(piece) <= budget
+    # 每段以上一段的尾部若干行开头，重叠不超过 overlap_tokens
+    for previous, piece in zip(pieces, pieces[1:]):
+        previous_lines, lines = previous.splitlines(keepends=True), piece.splitlines(keepends=True)
+        overlap = next(n for n in range(len(lines), -1, -1) if previous_lines[len(previous_lines) - n:] == lines[:n])
+        assert overlap > 0
+        assert sum(planner.count_tokens(line) for line in lines[:overlap]) <= planner.overlap_tokens
+    # 去掉重叠后按顺序覆盖全部正文
+    merged = pieces[0].splitlines(keepends=True)
+    for piece in pieces[1:]:
+        lines = piece.splitlines(keepends=True)
+        overlap = next(n for n in range(len(lines), -1, -1) if merged[len(merged) - n:] == lines[:n])
+        merged.extend(lines[overlap:])
+    assert "".join(merged) == content
+
+
+def test_split_without_overlap():
+    planner = make_planner(max_tokens=64, overlap_tokens=0)
+    content = make_lines(40)
+    pieces = [unit.sections[0][1] for unit in planner.plan([(["doc", "big"], content)])]
+    assert "".join(pieces) == content
+
+
+def test_long_title_path_falls_back_to_minimum_budget():
+    planner = make_planner(max_tokens=64, overlap_tokens=0)
+    title_path = ["doc", "t" * 300]
+    with pytest.warns(UserWarning, match="Title path"):
+        units = list(planner.plan([(title_path, make_lines(20))]))
+    # 不会退化为每段一两个字符
+    assert len(units) <= 20
+    assert all(planner.count_tokens(unit.sections[0][1]) <= planner.max_tokens // 4 for unit in units)
+
+
+def test_packed_entities_map_to_their_sections():
+    planner = make_planner(max_tokens=256)
+    sections = [(["doc", "集合", "并集"], "并集的定义与性质"), (["doc", "集合", "交集"], "交集运算满足交换律")]
+    unit, = planner.plan(sections)
+    assert locate_entity(unit.sections, "交换律") == ["doc", "集合", "交集"]
+    assert locate_entity(unit.sections, "并集") == ["doc", "集合", "并集"]
+    assert locate_entity(unit.sections, "幂集") is None
+
+    task = TraditionEngine._make_task(unit, unit.key)
+    task.task_output = {"知识实体": {"并集": {}, "交换律": {}, "幂集": {}}, "实体关系": {}}
+    engine = TraditionEngine.model_construct()
+    engine._postprocess_task(task)
+    result = InfoTreeTaskResult.from_dict(task.task_result.dump_dict())
+    assert result.source == ["doc", "集合"] and result.sources == [path for path, _ in sections]
+    assert result.source_of("并集") == ["doc", "集合", "并集"]
+    assert result.source_of("交换律") == ["doc", "集合", "交集"]
+    assert result.source_of("幂集") == ["doc", "集合"]
+    assert task.task_sections is None
@@ -0,0 +1,46 @@
+"""
+提示词相同的 task 合并请求：只请求一次，输出各自一份，task_result 中的来源保持各自的
+用法：pytest test/engine
+"""
+from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
+from fake_llm import FakeLLM
+
+
+def make_task(key: str, source: list, prompt: str = "重复的段落"):
+    return InfoTreeTask(task_system_prompt="system", task_user_prompt=prompt, task_key=key,
+                        task_result=InfoTreeTaskResult(source=source, entity=[], relation=[]))
+
+
+def test_followers_keep_own_source():
+    llm = FakeLLM(llm_name="fake", requested=[], coalesce=True)
+    tasks = [make_task(f"k{i}", ["文档", f"第{i}节"]) for i in range(3)] + [make_task("other", ["文档", "其他"], "其他")]
+    completed = []
+    llm.execute_task(tasks, on_complete=completed.append)
+    assert llm.requested == ["k0", "other"]
+    assert llm.coalesce_stats == {"saved": 2}
+    assert [task.task_result.source for task in tasks[:3]] == [["文档", f"第{i}节"] for i in range(3)]
+    # 输出相同但各自一份，修改一个不影响其他
+    assert tasks[1].task_output == tasks[0].task_output and tasks[1].task_output is not tasks[0].task_output
+    assert sorted(task.task_key for task in completed) == sorted(task.task_key for task in tasks)
+
+
+def test_coalesce_is_off_by_default():
+    llm = FakeLLM(llm_name="fake", requested=[])
+    llm.execute_task([make_task(f"k{i}", ["文档", f"第{i}节"]) for i in range(3)])
+    assert llm.requested == ["k0", "k1", "k2"]
+    assert llm.coalesce_stats is None
+
+
+def test_recent_window_is_opt_in():
+    # 开启后默认只合并正在请求的，完成后再出现的相同提示词重新请求
+    llm = FakeLLM(llm_name="fake", requested=[], coalesce=True)
+    llm.execute_task([make_task("a", ["文档", "甲"])])
+    llm.execute_task([make_task("b", ["文档", "乙"])])
+    assert llm.requested == ["a", "b"]
+
+    llm = FakeLLM(llm_name="fake", requested=[], coalesce=True, coalesce_window=16)
+    llm.execute_task([make_task("a", ["文档", "甲"])])
+    task = make_task("b", ["文档", "乙"])
+    llm.execute_task([task])
+    assert llm.requested == ["a"]
+    assert task.task_result.source == ["文档", "乙"] and task.task_output is not None
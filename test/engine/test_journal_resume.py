@@ -0,0 +1,72 @@
+"""
+task 日志：构建中途出错时已完成的 task 的输出已写入日志，resume 只重新请求未完成的 task
+用法：pytest test/engine
+"""
+import json
+import os
+
+import pytest
+
+from chatkg.adapter.engine.journal import OUTPUT, RESULT, TaskJournal, journal_file_name
+from chatkg.adapter.engine.tradition import TraditionEngine
+from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+from fake_llm import FakeLLM, write_markdown
+
+section_cnt = 8
+completed_cnt = 3
+
+
+def make_engine(llm, files, work_dir):
+    return TraditionEngine(llm=llm, reader=MarkdownReader(file=files, skip_mark="<abd>"), work_dir=work_dir,
+                           struct_type="tree", journal=True)
+
+
+@pytest.mark.parametrize("notify", [True, False])
+def test_resume_requests_only_unfinished_tasks(tmp_path, notify):
+    files = [write_markdown(str(tmp_path / "doc.md"), section_cnt)]
+    work_dir = str(tmp_path / "work_dir")
+    crashing = FakeLLM(llm_name="fake", fail_after=completed_cnt, notify=notify, requested=[])
+    # 出错的批次不中断构建，写入 urgent_save.json 后提示 resume
+    with pytest.warns(UserWarning, match="resume"):
+        make_engine(crashing, files, work_dir).execute()
+    assert len(crashing.requested) == completed_cnt
+
+    # 出错前完成的 task 的输出都已写入日志
+    states = TaskJournal.replay(os.path.join(work_dir, journal_file_name))
+    outputs = {key for key, state in states.items() if OUTPUT in state}
+    assert outputs == set(crashing.requested)
+
+    llm = FakeLLM(llm_name="fake", requested=[])
+    make_engine(llm, files, work_dir).resume()
+    assert len(llm.requested) == section_cnt - completed_cnt
+    assert not set(llm.requested) & set(crashing.requested)
+    with open(os.path.join(work_dir, "result.json"), encoding="utf-8") as f:
+        assert len(json.load(f)) == section_cnt
+    states = TaskJournal.replay(os.path.join(work_dir, journal_file_name))
+    assert len(states) == section_cnt and all(RESULT in state for state in states.values())
+
+
+def test_journal_is_off_by_default(tmp_path):
+    files = [write_markdown(str(tmp_path / "doc.md"), section_cnt)]
+    work_dir = str(tmp_path / "work_dir")
+    TraditionEngine(llm=FakeLLM(llm_name="fake", requested=[]), reader=MarkdownReader(file=files, skip_mark="<abd>"),
+                    work_dir=work_dir, struct_type="tree").execute()
+    assert not os.path.exists(os.path.join(work_dir, journal_file_name))
+
+
+def test_replay_skips_partial_last_line(tmp_path):
+    path = str(tmp_path / journal_file_name)
+    journal = TaskJournal(path)
+    journal.record("a", OUTPUT, {"x": 1})
+    journal.record("a", RESULT, {"y": 2})
+    journal.record("b", OUTPUT, "out")
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "c", "state": "out')
+    assert TaskJournal.replay(path) == {"a": {OUTPUT: {"x": 1}, RESULT: {"y": 2}}, "b": {OUTPUT: "out"}}
+    # 续写时截掉写了一半的行
+    journal = TaskJournal(path, resume=True)
+    journal.record("c", OUTPUT, None)
+    journal.close()
+    assert TaskJournal.replay(path)["c"] == {OUTPUT: None}
+    assert TaskJournal.replay(str(tmp_path / "missing.jsonl")) == {}
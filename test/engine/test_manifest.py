@@ -0,0 +1,61 @@
+"""
+增量构建：未修改的文件直接复用上次的结果，修改过的文件只重新抽取变化的节
+用法：pytest test/engine
+"""
+import json
+import os
+
+from chatkg.adapter.engine.manifest import manifest_file_name
+from chatkg.adapter.engine.tradition import TraditionEngine
+from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+from fake_llm import FakeLLM, write_markdown
+
+section_cnt = 4
+
+
+def build(files, work_dir):
+    llm = FakeLLM(llm_name="fake", requested=[])
+    engine = TraditionEngine(llm=llm, reader=MarkdownReader(file=files, skip_mark="<abd>"), work_dir=work_dir,
+                             struct_type="tree", incremental=True)
+    engine.execute()
+    with open(os.path.join(work_dir, "result.json"), encoding="utf-8") as f:
+        results = json.load(f)
+    return llm.requested, results
+
+
+def test_unchanged_file_reused_edited_file_extracted(tmp_path):
+    files = [write_markdown(str(tmp_path / "a.md"), section_cnt, "甲"),
+             write_markdown(str(tmp_path / "b.md"), section_cnt, "乙")]
+    work_dir = str(tmp_path / "work_dir")
+    requested, results = build(files, work_dir)
+    assert len(requested) == 2 * section_cnt and len(results) == 2 * section_cnt
+    assert not os.path.exists(os.path.join(work_dir, manifest_file_name + ".tmp"))
+
+    # 未修改：不请求 llm，结果与上次相同
+    requested, reused = build(files, work_dir)
+    assert requested == []
+    assert sorted(map(json.dumps, reused)) == sorted(map(json.dumps, results))
+
+    # 修改 b.md 中的一节：只重新抽取这一节
+    with open(files[1], encoding="utf-8") as f:
+        text = f.read()
+    with open(files[1], "w", encoding="utf-8") as f:
+        f.write(text.replace("第1节的正文", "第1节修改后的正文"))
+    requested, results = build(files, work_dir)
+    assert len(requested) == 1 and len(results) == 2 * section_cnt
+    edited = [result for result in results if result["task_key"] == requested[0]]
+    assert edited and "修改后" in edited[0]["task_user_prompt"]
+
+
+def test_corrupted_manifest_rebuilds(tmp_path):
+    files = [write_markdown(str(tmp_path / "a.md"), section_cnt)]
+    work_dir = str(tmp_path / "work_dir")
+    build(files, work_dir)
+    path = os.path.join(work_dir, manifest_file_name)
+    with open(path, "r+", encoding="utf-8") as f:
+        f.truncate(os.path.getsize(path) // 2)
+    requested, results = build(files, work_dir)
+    assert len(requested) == section_cnt and len(results) == section_cnt
+    # 重新写入完整的清单
+    requested, _ = build(files, work_dir)
+    assert requested == []
@@ -0,0 +1,65 @@
+"""
+预编译的 prompt 渲染与原来每个 task 用 str.format 拼接插入语、PromptTemplate 代入模板的结果逐字一致
+用法：pytest test/engine
+"""
+import pytest
+
+from chatkg.adapter.engine.chunk_planner import ChunkUnit
+from chatkg.adapter.engine.prompt_compiler import CompiledTemplate
+from chatkg.adapter.engine.tradition import (default_content_names, default_insertion_template, default_level_names,
+                                             default_output_format, default_prompt_compiler, default_prompt_template)
+
+units = [
+    ChunkUnit([(["离散数学", "集合"], "集合是一些对象的整体。")]),
+    ChunkUnit([(["离散数学", "集合", "表示法", "描述法"], "{x | x > 0} 与 {{转义}} 都是正文，不是变量")]),
+    ChunkUnit([(["离散数学", "计数", "排列"], "排列正文"), (["离散数学", "计数", "组合"], "组合正文\n多行")]),
+    ChunkUnit([(["书"], "只有书名的一节")]),
+]
+
+
+def old_insertion(unit: ChunkUnit) -> str:
+    insertion = ""
+    for i, title in enumerate(unit.parent_path):
+        insertion += default_insertion_template.format(level_name=default_level_names[i], level_content=title)
+    for title_path, content in unit.sections:
+        insertion += default_insertion_template.format(level_name=default_level_names[len(title_path) - 1],
+                                                       level_content=title_path[-1])
+        insertion += default_insertion_template.format(level_name=default_content_names, level_content=content)
+    return insertion
+
+
+@pytest.mark.parametrize("unit", units, ids=range(len(units)))
+def test_matches_str_format(unit):
+    expected = default_prompt_template.format(insertion=old_insertion(unit), output_format=default_output_format)
+    prompt = default_prompt_compiler.render_unit(unit)
+    assert prompt.text == expected
+    assert prompt.bytes == len(expected.encode("utf-8"))
+    assert prompt.tokens > 0
+
+
+@pytest.mark.parametrize("unit", units, ids=range(len(units)))
+def test_matches_prompt_template(unit):
+    prompts = pytest.importorskip("langchain_core.prompts")
+    expected = (prompts.PromptTemplate
+                .from_template(default_prompt_template)
+                .invoke({"insertion": old_insertion(unit), "output_format": default_output_format})
+                .to_string())
+    assert default_prompt_compiler.render_unit(unit).text == expected
+
+
+def test_render_section_and_many():
+    title_path, content = units[0].sections[0]
+    assert default_prompt_compiler.render_section(title_path, content).text == \
+        default_prompt_compiler.render_unit(units[0]).text
+    assert [prompt.text for prompt in default_prompt_compiler.render_many(units)] == \
+        [default_prompt_compiler.render_unit(unit).text for unit in units]
+
+
+def test_compiled_template():
+    template = CompiledTemplate("{{字面}} {a}-{b}-{a}", b="常量")
+    assert template.variables == ["a", "a"]
+    assert template.render(a="变量") == "{字面} 变量-常量-变量"
+    with pytest.raises(ValueError):
+        CompiledTemplate("{a:>10}")
+    with pytest.raises(ValueError):
+        CompiledTemplate("{a!r}")
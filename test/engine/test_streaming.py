@@ -0,0 +1,82 @@
+"""
+流式流水线：读取、构造 task、调用 llm 与写出结果同时进行，结果与逐批构建一致，并保留在 _final_result 中；
+llm 流式返回时生成过程中解析出的条目在 task 校验通过后才写入图数据库
+用法：pytest test/engine
+"""
+import json
+import os
+
+import pytest
+
+from chatkg.adapter.engine.tradition import TraditionEngine
+from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+from fake_llm import FakeLLM, write_markdown
+
+section_cnt = 12
+
+
+class StreamingFakeLLM(FakeLLM):
+    """
+    按片段回调 on_delta 后再给出输出；来源以 bad_section 结尾的 task 输出缺少 实体关系，校验不通过
+    """
+    bad_section: str = "第1节"
+
+    def _execute_task(self, task, mode=None, **kwargs):
+        for single_task in task if isinstance(task, list) else [task]:
+            name = single_task.task_result.source[-1]
+            output = {"知识实体": {name: {"来源": "测试"}}, "实体关系": {name: {"属于": "测试"}}}
+            if name == self.bad_section:
+                del output["实体关系"]
+            raw = "```json\n" + json.dumps(output, ensure_ascii=False) + "\n```"
+            for i in range(0, len(raw), 5):
+                kwargs["on_delta"](single_task, raw[i:i + 5])
+            self.requested.append(single_task.task_key)
+            single_task.task_output = output
+        return task
+
+
+class RecordingGraph:
+    def __init__(self):
+        self.written = []
+
+    def execute_build(self, states):
+        self.written.extend(states)
+
+
+def build(files, work_dir, **kwargs):
+    engine = TraditionEngine(llm=FakeLLM(llm_name="fake", requested=[]),
+                             reader=MarkdownReader(file=files, skip_mark="<abd>"),
+                             work_dir=work_dir, struct_type="tree", **kwargs)
+    return engine.execute()
+
+
+def sources(results):
+    return sorted(json.dumps(result["task_result"]["source"], ensure_ascii=False) for result in results)
+
+
+@pytest.mark.parametrize("llm_workers", [1, 4])
+def test_streaming_matches_batch_build(tmp_path, llm_workers):
+    files = [write_markdown(str(tmp_path / f"doc{i}.md"), section_cnt, title=f"文档{i}") for i in range(2)]
+    batch = build(files, str(tmp_path / "batch"))
+    streaming = build(files, str(tmp_path / "streaming"), streaming=True, llm_workers=llm_workers)
+
+    assert len(streaming._final_result) == 2 * section_cnt
+    assert all(result["task_status"] == "SUCCESS" for result in streaming._final_result)
+    assert sources(streaming._final_result) == sources(batch._final_result)
+    with open(os.path.join(streaming.work_dir, "result.json"), encoding="utf-8") as f:
+        assert json.load(f) == streaming._final_result
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_streamed_entries_wait_for_validation(tmp_path, streaming):
+    files = [write_markdown(str(tmp_path / "doc.md"), 3)]
+    graph = RecordingGraph()
+    engine = TraditionEngine(llm=StreamingFakeLLM(llm_name="fake", requested=[]),
+                             reader=MarkdownReader(file=files, skip_mark="<abd>"), graph=graph,
+                             work_dir=str(tmp_path / "work_dir"), struct_type="tree", streaming=streaming)
+    with pytest.warns(UserWarning, match="failed"):
+        engine.execute()
+    names = [state.node_attr["name"] for state in graph.written if hasattr(state, "node_attr")]
+    # 校验不通过的 第1节 生成过程中解析出的实体不写入
+    assert sorted(names) == ["第0节", "第2节"]
+    assert not engine._extractors
@@ -0,0 +1,149 @@
+"""
+本地的批量任务服务：实现智谱批量接口中用到的部分（上传文件、创建与查询批量任务、下载结果文件），
+每个请求的输出中带有其 user prompt 的哈希，用于检查结果是否按 custom_id 写回了对应的 task
+用法：python test/graph_build/batch_server.py [markdown 文件]，启动服务后以 batch 模式执行该文件的全部 task 并检查结果
+"""
+import email
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+default_file = os.path.join(os.path.dirname(__file__), "ch1.md")
+# user prompt 中包含这个标记的请求返回错误，用于检查错误文件的处理
+fail_mark = "<fail>"
+
+
+def prompt_digest(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+class LocalBatchServer(ThreadingHTTPServer):
+    """
+    批量任务创建后经过 processing_time 秒完成；完成前查询状态为 in_progress
+    """
+
+    def __init__(self, address=("127.0.0.1", 0), processing_time: float = 0.5):
+        super().__init__(address, _Handler)
+        self.processing_time = processing_time
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def add_file(self, content: bytes, filename: str, purpose: str) -> dict:
+        file = {"id": f"file-{uuid.uuid4().hex}", "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"}
+        with self.lock:
+            self.files[file["id"]] = (file, content)
+        return file
+
+    def create_batch(self, input_file_id: str, endpoint: str) -> dict:
+        batch = {"id": f"batch-{uuid.uuid4().hex}", "object": "batch", "endpoint": endpoint,
+                 "input_file_id": input_file_id, "completion_window": "24h", "status": "in_progress",
+                 "created_at": int(time.time()), "output_file_id": None, "error_file_id": None,
+                 "request_counts": {"total": 0, "completed": 0, "failed": 0}}
+        with self.lock:
+            self.batches[batch["id"]] = batch
+        threading.Timer(self.processing_time, self._complete, (batch["id"],)).start()
+        return batch
+
+    def _complete(self, batch_id: str):
+        batch = self.batches[batch_id]
+        _, content = self.files[batch["input_file_id"]]
+        outputs, errors = [], []
+        for line in content.splitlines():
+            request = json.loads(line)
+            prompt = request["body"]["messages"][-1]["content"]
+            if fail_mark in prompt:
+                errors.append({"custom_id": request["custom_id"], "response": {"status_code": 400, "body": {
+                    "error": {"code": "1214", "message": "invalid request"}}}})
+                continue
+            answer = {"知识实体": {prompt_digest(prompt): {"属性": "本地"}}, "实体关系": {}}
+            outputs.append({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": {
+                "choices": [{"index": 0, "message": {"role": "assistant",
+                                                     "content": json.dumps(answer, ensure_ascii=False)}}],
+                "usage": {"prompt_tokens": len(prompt), "completion_tokens": 10}}}})
+        batch["request_counts"] = {"total": len(outputs) + len(errors), "completed": len(outputs),
+                                   "failed": len(errors)}
+        for key, lines in (("output_file_id", outputs), ("error_file_id", errors)):
+            if lines:
+                data = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+                batch[key] = self.add_file(data, f"{key}.jsonl", "batch")["id"]
+        batch["status"] = "completed"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: LocalBatchServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, value, status: int = 200):
+        self._send(status, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/files"):
+            # multipart/form-data：file 与 purpose 两个字段
+            message = email.message_from_bytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body)
+            fields = {part.get_param("name", header="content-disposition"): part for part in message.get_payload()}
+            file = fields["file"]
+            self._send_json(self.server.add_file(file.get_payload(decode=True), file.get_filename(),
+                                                 fields["purpose"].get_payload(decode=True).decode("utf-8")))
+        elif self.path.endswith("/batches"):
+            request = json.loads(body)
+            self._send_json(self.server.create_batch(request["input_file_id"], request["endpoint"]))
+        else:
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, 404)
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in self.server.batches:
+            self._send_json(self.server.batches[parts[-1]])
+        elif len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content" and parts[-2] in self.server.files:
+            self._send(200, self.server.files[parts[-2]][1], "application/octet-stream")
+        else:
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, 404)
+
+
+if __name__ == "__main__":
+    from chatkg.adapter.engine.chunk_planner import ChunkUnit
+    from chatkg.adapter.engine.tradition import TraditionEngine
+    from chatkg.adapter.task_model.zhipu import TaskZhipuAI
+    from chatkg.utils.text_reader.MarkdownReader import _index_markdown_file
+
+    file = sys.argv[1] if len(sys.argv) > 1 else default_file
+    server = LocalBatchServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    info_tree = _index_markdown_file(file, skip_mark="<abd>")
+    tasks = [TraditionEngine._make_task(ChunkUnit([(title_path, content)]))
+             for title_path, content in info_tree if content]
+    tasks[0].task_user_prompt += fail_mark
+    llm = TaskZhipuAI(llm_name="glm-4-flash", api_key="local.secret", base_url=server.base_url, mode="batch",
+                      poll_interval=0.1)
+    start = time.perf_counter()
+    llm.execute_task(tasks)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    if tasks[0].task_output != {"raw": "Task failed!"}:
+        sys.exit(f"Failed request should be marked as failed: {tasks[0].task_output}")
+    for task in tasks[1:]:
+        if task.task_output != {"知识实体": {prompt_digest(task.task_user_prompt): {"属性": "本地"}}, "实体关系": {}}:
+            sys.exit(f"Result written back to the wrong task: {task.task_result.source}")
+    print(f"{os.path.basename(file)}: {len(tasks)} tasks in one batch, {elapsed:.2f}s, results matched by custom_id")
@@ -0,0 +1,76 @@
+"""
+TaskZhipuAI 异步模式的并发度：用模拟延迟的本地 client 代替智谱接口，比较不同 max_concurrency 下的总耗时与平均每个任务的查询次数
+同一个模型连续执行两批任务，第二批的首次查询时间取自第一批观测到的完成耗时
+用法：python test/graph_build/bench_async_llm.py [任务数] [单个请求耗时（秒）]
+"""
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
+from chatkg.adapter.task_model.zhipu import TaskZhipuAI
+
+
+class LocalAsyncCompletions:
+    # 与 client.chat.asyncCompletions 相同的接口：create 立即返回任务 id，任务在 latency 秒后完成
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.submitted = {}
+        self.retrieve_cnt = 0
+        self.lock = threading.Lock()
+
+    def create(self, model, messages):
+        # 提交本身也有网络往返
+        time.sleep(0.01)
+        with self.lock:
+            task_id = str(len(self.submitted))
+            self.submitted[task_id] = time.monotonic()
+        return SimpleNamespace(id=task_id)
+
+    def retrieve_completion_result(self, task_id):
+        time.sleep(0.01)
+        with self.lock:
+            self.retrieve_cnt += 1
+        if time.monotonic() - self.submitted[task_id] < self.latency:
+            return SimpleNamespace(task_status="PROCESSING", choices=None, usage=None)
+        message = SimpleNamespace(content='{"知识实体": {}, "实体关系": {}}')
+        return SimpleNamespace(task_status="SUCCESS", choices=[SimpleNamespace(message=message)],
+                               usage=SimpleNamespace(completion_tokens=10))
+
+
+class LocalTaskZhipuAI(TaskZhipuAI):
+    latency: float = 0.2
+
+    def _create_client(self):
+        return SimpleNamespace(chat=SimpleNamespace(asyncCompletions=LocalAsyncCompletions(self.latency)))
+
+
+def make_tasks(n: int):
+    return [InfoTreeTask(task_system_prompt="system", task_user_prompt=f"section {i}", task_result=InfoTreeTaskResult())
+            for i in range(n)]
+
+
+def bench(llm: LocalTaskZhipuAI, n: int) -> float:
+    tasks = make_tasks(n)
+    start = time.perf_counter()
+    llm.execute_task(tasks, mode="async")
+    elapsed = time.perf_counter() - start
+    if any(task.task_output != {"知识实体": {}, "实体关系": {}} for task in tasks):
+        sys.exit("Unexpected task output")
+    return elapsed
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    for concurrency in (1, 4, 16, 64):
+        # 每批的提示词相同，关闭合并，每批都真正发出请求
+        llm = LocalTaskZhipuAI(llm_name="glm-4-flash", api_key="local", latency=latency, poll_interval=latency / 4,
+                               max_concurrency=concurrency, coalesce=False)
+        for batch in (1, 2):
+            completions = llm._get_client().chat.asyncCompletions
+            retrieve_cnt = completions.retrieve_cnt
+            elapsed = bench(llm, n)
+            print(f"max_concurrency={concurrency:3d} batch {batch}: {n} tasks in {elapsed:6.2f}s, "
+                  f"{(completions.retrieve_cnt - retrieve_cnt) / n:.2f} retrieves/task")
@@ -0,0 +1,43 @@
+"""
+对比内置单遍标题解析器与 MarkdownHeaderTextSplitter：解析耗时与结果一致性
+用法：python test/graph_build/bench_header_parser.py [markdown 文件] [重复次数]
+"""
+import os
+import sys
+import time
+
+from chatkg.utils.text_reader.MarkdownReader import _index_markdown_file
+
+default_file = os.path.join(os.path.dirname(__file__), "ch1.md")
+
+
+def bench(parser: str, file: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        _index_markdown_file(file, skip_mark="<abd>", parser=parser)
+    return (time.perf_counter() - start) / repeat
+
+
+def sections(parser: str, file: str):
+    # 只比较有正文的节；正文去掉全部空白后比较，native 保留原始排版而 langchain 逐行 strip
+    info_tree = _index_markdown_file(file, skip_mark="<abd>", parser=parser)
+    return [(title_path, "".join(content.split())) for title_path, content in info_tree if content]
+
+
+if __name__ == "__main__":
+    file = sys.argv[1] if len(sys.argv) > 1 else default_file
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    native_sections = sections("native", file)
+    langchain_sections = sections("langchain", file)
+    if native_sections != langchain_sections:
+        for native, langchain in zip(native_sections, langchain_sections):
+            if native != langchain:
+                print(f"First mismatch:\n  native:    {native[0]}\n  langchain: {langchain[0]}")
+                break
+        sys.exit(f"Parity check failed: {len(native_sections)} native vs {len(langchain_sections)} langchain sections")
+    native_time = bench("native", file, repeat)
+    langchain_time = bench("langchain", file, repeat)
+    print(f"{os.path.basename(file)} ({os.path.getsize(file) / 1024:.0f} KB), {len(native_sections)} sections")
+    print(f"native:    {native_time * 1000:.2f} ms")
+    print(f"langchain: {langchain_time * 1000:.2f} ms")
+    print(f"speedup:   {langchain_time / native_time:.1f}x")
@@ -0,0 +1,82 @@
+"""
+对冲请求对尾延迟的影响：本地 client 中少数任务（slow_ratio）的耗时是其余任务的 slow_factor 倍，
+比较 TaskZhipuAI 异步模式开启与关闭 hedge 时每批任务的总耗时、单个任务耗时的 p50/p99，以及额外发出的请求数
+同一个模型连续执行几批任务，第一批用于积累耗时样本
+用法：python test/graph_build/bench_hedging.py [任务数] [单个请求耗时（秒）]
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from bench_async_llm import LocalAsyncCompletions, make_tasks
+from chatkg.adapter.task_model.zhipu import TaskZhipuAI
+
+slow_ratio = 0.02
+slow_factor = 10
+
+
+class TailAsyncCompletions(LocalAsyncCompletions):
+    # 每个提交的任务独立地以 slow_ratio 的概率变慢，与服务端偶发的排队、重试相同
+    def __init__(self, latency: float, seed: int = 0):
+        super().__init__(latency)
+        self.random = random.Random(seed)
+        self.latencies = {}
+
+    def create(self, model, messages):
+        response = super().create(model, messages)
+        with self.lock:
+            slow = self.random.random() < slow_ratio
+            self.latencies[response.id] = self.latency * (slow_factor if slow else 1)
+        return response
+
+    def retrieve_completion_result(self, task_id):
+        with self.lock:
+            submitted = self.submitted[task_id]
+        if time.monotonic() - submitted < self.latencies[task_id]:
+            time.sleep(0.01)
+            with self.lock:
+                self.retrieve_cnt += 1
+            return SimpleNamespace(task_status="PROCESSING", choices=None, usage=None)
+        return super().retrieve_completion_result(task_id)
+
+
+class TailTaskZhipuAI(TaskZhipuAI):
+    latency: float = 0.2
+    # 每个任务从开始到取回结果的耗时
+    durations: list = []
+
+    def _create_client(self):
+        return SimpleNamespace(chat=SimpleNamespace(asyncCompletions=TailAsyncCompletions(self.latency)))
+
+    async def _execute_async_single(self, task, *args, **kwargs):
+        start = time.perf_counter()
+        result = await super()._execute_async_single(task, *args, **kwargs)
+        self.durations.append(time.perf_counter() - start)
+        return result
+
+
+def bench(llm: TailTaskZhipuAI, n: int):
+    tasks = make_tasks(n)
+    llm.durations.clear()
+    start = time.perf_counter()
+    llm.execute_task(tasks, mode="async")
+    elapsed = time.perf_counter() - start
+    if any(task.task_output != {"知识实体": {}, "实体关系": {}} for task in tasks):
+        sys.exit("Unexpected task output")
+    durations = sorted(llm.durations)
+    return elapsed, durations[len(durations) // 2], durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    for hedge in (False, True):
+        # 每批的提示词相同，关闭合并，每批都真正发出请求
+        llm = TailTaskZhipuAI(llm_name="glm-4-flash", api_key="local", latency=latency, poll_interval=latency / 4,
+                              max_concurrency=n, hedge=hedge, coalesce=False)
+        for batch in (1, 2, 3):
+            elapsed, p50, p99 = bench(llm, n)
+            stats = llm.hedge_stats or {"fired": 0, "won": 0}
+            print(f"hedge={str(hedge):5s} batch {batch}: {n} tasks in {elapsed:5.2f}s, p50 {p50:5.2f}s, "
+                  f"p99 {p99:5.2f}s, {stats['fired']} hedged ({stats['won']} won)")
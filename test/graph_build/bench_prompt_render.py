@@ -0,0 +1,61 @@
+"""
+对比预编译的 prompt 渲染与原来每个 task 调用 PromptTemplate.from_template 的方式：结果一致性与单个 task 的渲染耗时
+用法：python test/graph_build/bench_prompt_render.py [markdown 文件] [重复次数]
+"""
+import os
+import sys
+import time
+
+from chatkg.adapter.engine.chunk_planner import ChunkUnit
+from chatkg.adapter.engine.tradition import (default_content_names, default_insertion_template, default_level_names,
+                                             default_output_format, default_prompt_compiler, default_prompt_template)
+from chatkg.utils.text_reader.MarkdownReader import _index_markdown_file
+
+default_file = os.path.join(os.path.dirname(__file__), "ch1.md")
+
+
+def langchain_render(unit: ChunkUnit) -> str:
+    # 原来的实现：逐个 += 拼接插入语，每个 task 重新解析模板
+    from langchain_core.prompts import PromptTemplate
+    temp_insertions = ""
+    for i, title in enumerate(unit.parent_path):
+        temp_insertions += default_insertion_template.format(level_name=default_level_names[i], level_content=title)
+    for node_title_list, node_content in unit.sections:
+        temp_insertions += default_insertion_template.format(level_name=default_level_names[len(node_title_list) - 1],
+                                                             level_content=node_title_list[-1])
+        temp_insertions += default_insertion_template.format(level_name=default_content_names,
+                                                             level_content=node_content)
+    return (PromptTemplate
+            .from_template(default_prompt_template)
+            .invoke({"insertion": temp_insertions, "output_format": default_output_format})
+            .to_string())
+
+
+def compiled_render(unit: ChunkUnit) -> str:
+    return default_prompt_compiler.render_unit(unit).text
+
+
+def bench(render, units, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for unit in units:
+            render(unit)
+    return (time.perf_counter() - start) / (repeat * len(units))
+
+
+if __name__ == "__main__":
+    file = sys.argv[1] if len(sys.argv) > 1 else default_file
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    info_tree = _index_markdown_file(file, skip_mark="<abd>")
+    units = [ChunkUnit([(title_path, content)]) for title_path, content in info_tree if content]
+    for unit in units:
+        if langchain_render(unit) != compiled_render(unit):
+            sys.exit(f"Prompt mismatch: {unit.source}")
+    prompts = default_prompt_compiler.render_many(units)
+    langchain_time = bench(langchain_render, units, repeat)
+    compiled_time = bench(compiled_render, units, repeat)
+    print(f"{os.path.basename(file)}: {len(units)} tasks, "
+          f"{sum(prompt.bytes for prompt in prompts)} bytes, ~{sum(prompt.tokens for prompt in prompts)} tokens")
+    print(f"langchain: {langchain_time * 1e6:8.1f} us/task")
+    print(f"compiled:  {compiled_time * 1e6:8.1f} us/task")
+    print(f"speedup:   {langchain_time / compiled_time:.1f}x")
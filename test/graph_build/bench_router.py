@@ -0,0 +1,61 @@
+"""
+TaskRouter 的吞吐与故障转移：每个本地 OpenAI 兼容服务代表一个 api key，单个后端的并发数固定，
+检查吞吐随后端数量增加、有后端返回 429 / 5xx 时 task 转给其他后端，以及慢后端不拖慢整体
+用法：python test/graph_build/bench_router.py [任务数]
+"""
+import sys
+import threading
+import time
+
+from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
+from chatkg.adapter.task_model.openai_compat import TaskOpenAI
+from chatkg.adapter.task_model.router import TaskRouter
+from openai_stub_server import OpenAIStubServer, prompt_digest
+
+
+def start_server(latency: float) -> OpenAIStubServer:
+    server = OpenAIStubServer(latency=latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_tasks(n: int):
+    return [InfoTreeTask(task_system_prompt="system", task_user_prompt=f"section {i}", task_result=InfoTreeTaskResult())
+            for i in range(n)]
+
+
+def run(servers, n: int, **kwargs):
+    router = TaskRouter(backends=[TaskOpenAI(llm_name="stub", api_key="local", base_url=server.base_url,
+                                             max_concurrency=4) for server in servers], **kwargs)
+    tasks = make_tasks(n)
+    start = time.perf_counter()
+    router.execute_task(tasks)
+    elapsed = time.perf_counter() - start
+    for task in tasks:
+        if task.task_output != {"知识实体": {prompt_digest(task.task_user_prompt): {"属性": "本地"}}, "实体关系": {}}:
+            sys.exit(f"Unexpected output for {task.task_user_prompt}: {task.task_output}")
+    return elapsed, router.backend_stats
+
+
+def describe(stats) -> str:
+    return ", ".join(f"{backend['tasks']} tasks/{backend['ejections']} ejected" for backend in stats)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    servers = [start_server(latency=0.2) for _ in range(4)]
+    for backend_cnt in (1, 2, 4):
+        elapsed, stats = run(servers[:backend_cnt], n)
+        print(f"{backend_cnt} backends: {n} tasks in {elapsed:5.2f}s ({n / elapsed:6.1f} tasks/s) [{describe(stats)}]")
+    # 一个后端持续限流，另一个先返回几次 5xx
+    servers[0].errors, servers[0].error_status = 10 ** 6, 429
+    servers[1].errors, servers[1].error_status = 4, 503
+    elapsed, stats = run(servers, n, eject_seconds=0.5)
+    print(f"429 + 503 backends: {n} tasks in {elapsed:5.2f}s [{describe(stats)}]")
+    servers[0].errors = servers[1].errors = 0
+    # 一个后端比其余慢 10 倍
+    slow = start_server(latency=2.)
+    elapsed, stats = run(servers[1:] + [slow], n)
+    print(f"3 fast + 1 slow backends: {n} tasks in {elapsed:5.2f}s [{describe(stats)}]")
+    for server in servers + [slow]:
+        server.shutdown()
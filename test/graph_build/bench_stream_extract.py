@@ -0,0 +1,62 @@
+"""
+流式返回时边生成边写图数据库：本地 OpenAI 兼容服务逐段慢速返回较长的抽取结果，
+比较 TaskOpenAI 流式与非流式时第一次写入图数据库的时间、构建总耗时，并检查两种方式写入的节点与关系相同
+用法：python test/graph_build/bench_stream_extract.py [markdown 文件] [每个回答的实体数]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from chatkg.adapter.database.CypherState import CypherNodeState
+from chatkg.adapter.engine.tradition import TraditionEngine
+from chatkg.adapter.task_model.openai_compat import TaskOpenAI
+from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+from openai_stub_server import OpenAIStubServer, default_file
+
+
+class RecordingGraph:
+    # 与 GraphNeo4j.execute_build 相同的接口，记录写入的时间与内容
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_write = None
+        self.nodes = []
+        self.relations = []
+
+    def execute_build(self, states):
+        if self.first_write is None:
+            self.first_write = time.perf_counter() - self.start
+        for state in states:
+            if isinstance(state, CypherNodeState):
+                self.nodes.append(state.node_attr["name"])
+            else:
+                self.relations.append((state.node1_name, state.relation_name, state.node2_name))
+
+
+def build(server: OpenAIStubServer, file: str, stream: bool):
+    graph = RecordingGraph()
+    with tempfile.TemporaryDirectory() as work_dir:
+        llm = TaskOpenAI(llm_name="stub", api_key="local", base_url=server.base_url, stream=stream, max_concurrency=4)
+        engine = TraditionEngine(llm=llm, reader=MarkdownReader(file=[file], skip_mark="<abd>"), work_dir=work_dir,
+                                 struct_type="tree", graph=graph, journal=False)
+        engine.execute()
+    return time.perf_counter() - graph.start, graph
+
+
+if __name__ == "__main__":
+    file = sys.argv[1] if len(sys.argv) > 1 else default_file
+    server = OpenAIStubServer()
+    server.entity_cnt = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    server.chunk_delay = 0.01
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    graphs = {}
+    for stream in (False, True):
+        elapsed, graphs[stream] = build(server, file, stream)
+        print(f"stream={stream}: {os.path.basename(file)} built in {elapsed:5.2f}s, first graph write at "
+              f"{graphs[stream].first_write:5.2f}s, {len(graphs[stream].nodes)} nodes, "
+              f"{len(graphs[stream].relations)} relations")
+    if sorted(graphs[False].nodes) != sorted(graphs[True].nodes) or \
+            sorted(graphs[False].relations) != sorted(graphs[True].relations):
+        sys.exit("Streamed writes differ from writes after completion")
+    server.shutdown()
@@ -0,0 +1,127 @@
+"""
+InfoTree 插入与遍历的微基准：合成 10 万个标题，对比层级栈插入 + 共享前缀遍历与原来的递归实现
+用法：python test/graph_build/bench_tree_insert.py [标题数] [深文档的最大深度] [重复次数]
+"""
+import gc
+import sys
+import time
+
+from chatkg.adapter.structure.InfoTree import InfoTree, InfoNode
+
+
+class LegacyInfoTree(InfoTree):
+    # 原来的递归插入（与改动前的实现逐行一致）：上下回溯寻找父节点，逐个比较子节点标题
+    def insert_node(self, root, node, node_level):
+        if not root:
+            root = self.main_root
+        root_level = root.level
+        if node_level < 0 or root_level < 0:
+            raise ValueError("Info Tree build failed: node level or root level is less than 0")
+        if node_level > root_level:
+            if not root.children:
+                root.add_child(node)
+                self.node_cnt += 1
+            else:
+                last_child = root.children[-1]
+                self.insert_node(last_child, node, node_level)
+        elif node_level == root_level:
+            is_dup, dup_node = self._is_dup_children(root, node)
+            if is_dup:
+                dup_node.content += node.content
+            else:
+                root.parent.add_child(node)
+                self.node_cnt += 1
+        else:
+            self.insert_node(root.parent, node, node_level)
+
+    @staticmethod
+    def _is_dup_children(root, node):
+        for child in root.children:
+            if child.title == node.title:
+                return True, child
+        return False, None
+
+
+def legacy_title_path(node):
+    if node.parent:
+        return legacy_title_path(node.parent) + [node.title]
+    return [node.title]
+
+
+def legacy_iter(node):
+    yield legacy_title_path(node), node.content
+    for child in node.children:
+        yield from legacy_iter(child)
+
+
+def wide_levels(count: int):
+    # 每章 1000 节，每节若干小节：兄弟节点多、层级浅
+    for i in range(count):
+        yield 1 if i % 1000 == 0 else (2 if i % 10 == 1 else 3)
+
+
+def deep_levels(count: int, depth: int):
+    # 层层下沉到 depth 后回到第一层：路径长
+    for i in range(count):
+        yield i % depth + 1
+
+
+def headings(levels):
+    return [(f"标题{i}", f"正文{i}", level) for i, level in enumerate(levels)]
+
+
+def build(tree_cls, items):
+    info_tree = tree_cls(InfoNode(title="root", content=None, level=0))
+    last_node = None
+    for title, content, level in items:
+        node = InfoNode(title=title, content=content, level=level)
+        # 原实现以上一个节点为起点插入
+        info_tree.insert_node(last_node, node, level)
+        last_node = node
+    return info_tree
+
+
+def measure(func):
+    # 计时期间关闭循环垃圾回收，避免父子互相引用的大量节点触发的回收混入计时
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def best_of(repeat: int, *funcs):
+    # 交替运行各实现，取各自的最短耗时，减小机器负载波动的影响
+    results = [None] * len(funcs)
+    best = [float("inf")] * len(funcs)
+    for _ in range(repeat):
+        for i, func in enumerate(funcs):
+            results[i], elapsed = measure(func)
+            best[i] = min(best[i], elapsed)
+    return results, best
+
+
+def bench(name: str, items, repeat: int):
+    (legacy_tree, info_tree), (legacy_build, new_build) = best_of(
+        repeat, lambda: build(LegacyInfoTree, items), lambda: build(InfoTree, items))
+    (legacy_sections, sections), (legacy_walk, new_walk) = best_of(
+        repeat, lambda: list(legacy_iter(legacy_tree.main_root)), lambda: list(info_tree))
+    if sections != legacy_sections or info_tree.node_cnt != legacy_tree.node_cnt:
+        sys.exit(f"{name}: trees differ")
+    print(f"{name}: {len(items)} headings")
+    print(f"  insert  legacy {legacy_build * 1000:8.1f} ms   new {new_build * 1000:8.1f} ms   "
+          f"{legacy_build / new_build:5.1f}x")
+    print(f"  iterate legacy {legacy_walk * 1000:8.1f} ms   new {new_walk * 1000:8.1f} ms   "
+          f"{legacy_walk / new_walk:5.1f}x")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), depth * 4))
+    bench("wide", headings(wide_levels(count)), repeat)
+    bench(f"deep (depth {depth})", headings(deep_levels(count, depth)), repeat)
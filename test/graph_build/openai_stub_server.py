@@ -0,0 +1,164 @@
+"""
+本地的 OpenAI 兼容接口：实现 /v1/chat/completions（含 SSE 流式返回），统计建立的连接数，
+输出中带有 user prompt 的哈希，用于检查每个 task 拿到的是自己的结果
+用法：python test/graph_build/openai_stub_server.py [markdown 文件]，启动服务后分别以普通与流式方式执行该文件的全部 task，
+检查结果与连接复用，并检查单个请求的超时
+"""
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+default_file = os.path.join(os.path.dirname(__file__), "ch1.md")
+# user prompt 中包含这个标记时延迟返回，用于检查超时
+slow_mark = "<slow>"
+slow_seconds = 2.
+
+
+def prompt_digest(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def stub_answer(prompt: str, entity_cnt: int = 1) -> dict:
+    digest = prompt_digest(prompt)
+    names = [digest] + [f"{digest}-{i}" for i in range(1, entity_cnt)]
+    return {"知识实体": {name: {"属性": "本地"} for name in names},
+            "实体关系": {name: {"相关": names[i - 1]} for i, name in enumerate(names) if i}}
+
+
+class OpenAIStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency: float = 0.02):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        # 接下来的 errors 个请求返回 error_status（429 时带 Retry-After），用于检查出错后的处理
+        self.errors = 0
+        self.error_status = 429
+        # 回答中的实体数（之后的实体依次与前一个相连），以及流式返回时每段之间的间隔，用于模拟较长的生成
+        self.entity_cnt = 1
+        self.chunk_delay = 0.
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # 保持连接
+    protocol_version = "HTTP/1.1"
+    server: OpenAIStubServer
+
+    def setup(self):
+        super().setup()
+        # 响应头与正文分开写出，关闭 Nagle 算法避免每个请求多等一个延迟确认
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.server.lock:
+            self.server.requests += 1
+            fail = self.server.errors > 0
+            if fail:
+                self.server.errors -= 1
+        if fail:
+            self._send_json({"error": {"message": "Injected error"}}, self.server.error_status,
+                            {"Retry-After": "1"} if self.server.error_status == 429 else None)
+            return
+        if not self.path.endswith("/chat/completions"):
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, 404)
+            return
+        prompt = body["messages"][-1]["content"]
+        time.sleep(slow_seconds if slow_mark in prompt else self.server.latency)
+        answer = json.dumps(stub_answer(prompt, self.server.entity_cnt), ensure_ascii=False)
+        usage = {"prompt_tokens": len(prompt), "completion_tokens": 10, "total_tokens": len(prompt) + 10}
+        step = max(1, len(answer) // (4 * self.server.entity_cnt))
+        if not body.get("stream"):
+            # 与流式返回相同的生成时间
+            time.sleep(self.server.chunk_delay * ((len(answer) - 1) // step))
+            self._send_json({"id": "chatcmpl-stub", "object": "chat.completion", "model": body["model"],
+                             "choices": [{"index": 0, "finish_reason": "stop",
+                                          "message": {"role": "assistant", "content": answer}}],
+                             "usage": usage})
+            return
+        # SSE，分块传输；回答切成几段发送
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(answer), step):
+            if i:
+                time.sleep(self.server.chunk_delay)
+            self._send_chunk({"id": "chatcmpl-stub", "object": "chat.completion.chunk",
+                              "choices": [{"index": 0, "delta": {"content": answer[i:i + step]}}]})
+        self._send_chunk({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _send_chunk(self, value: dict):
+        self._write_chunk(f"data: {json.dumps(value, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, value, status: int = 200, headers: dict | None = None):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, header in (headers or {}).items():
+            self.send_header(name, header)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == "__main__":
+    import httpx
+
+    from chatkg.adapter.engine.chunk_planner import ChunkUnit
+    from chatkg.adapter.engine.tradition import TraditionEngine
+    from chatkg.adapter.task_model.openai_compat import TaskOpenAI
+    from chatkg.utils.text_reader.MarkdownReader import _index_markdown_file
+
+    file = sys.argv[1] if len(sys.argv) > 1 else default_file
+    server = OpenAIStubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    info_tree = _index_markdown_file(file, skip_mark="<abd>")
+    units = [ChunkUnit([(title_path, content)]) for title_path, content in info_tree if content]
+    for stream in (False, True):
+        tasks = [TraditionEngine._make_task(unit) for unit in units]
+        deltas = []
+        llm = TaskOpenAI(llm_name="stub", api_key="local", base_url=server.base_url, stream=stream, max_concurrency=4)
+        connections = server.connections
+        start = time.perf_counter()
+        # 分两次调用，连接池在两次之间保持
+        llm.execute_task(tasks[:len(tasks) // 2], on_delta=lambda task, delta: deltas.append(delta))
+        llm.execute_task(tasks[len(tasks) // 2:], on_delta=lambda task, delta: deltas.append(delta))
+        elapsed = time.perf_counter() - start
+        for task in tasks:
+            if task.task_output != stub_answer(task.task_user_prompt):
+                sys.exit(f"Unexpected output for {task.task_result.source}: {task.task_output}")
+        print(f"stream={stream}: {len(tasks)} tasks in {elapsed:.2f}s, "
+              f"{server.connections - connections} connections opened, {len(deltas)} streamed pieces")
+    slow_task = TraditionEngine._make_task(units[0])
+    slow_task.task_user_prompt += slow_mark
+    start = time.perf_counter()
+    try:
+        TaskOpenAI(llm_name="stub", api_key="local", base_url=server.base_url).execute_task(slow_task, timeout=0.5)
+        sys.exit("Per-request timeout was not applied")
+    except httpx.ReadTimeout:
+        print(f"timeout=0.5: request aborted after {time.perf_counter() - start:.2f}s")
+    server.shutdown()
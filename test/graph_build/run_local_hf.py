@@ -0,0 +1,45 @@
+"""
+在 cpu 上用很小的模型检查 TaskLocalHF：补齐批次的生成结果与逐个生成一致，以及批大小对吞吐的影响
+需要 torch 与 transformers；模型可以是 hub 名称或本地 checkpoint（含 PEFT adapter 的目录亦可）
+用法：python test/graph_build/run_local_hf.py [模型] [markdown 文件]
+"""
+import os
+import sys
+import time
+
+from chatkg.adapter.engine.chunk_planner import ChunkUnit
+from chatkg.adapter.engine.tradition import TraditionEngine
+from chatkg.adapter.task_model.local_hf import TaskLocalHF
+from chatkg.utils.text_reader.MarkdownReader import _index_markdown_file
+
+default_model = "hf-internal-testing/tiny-random-LlamaForCausalLM"
+default_file = os.path.join(os.path.dirname(__file__), "ch1.md")
+
+
+def make_tasks(file: str):
+    info_tree = _index_markdown_file(file, skip_mark="<abd>")
+    return [TraditionEngine._make_task(ChunkUnit([(title_path, content)]))
+            for title_path, content in info_tree if content]
+
+
+def run(model: str, tasks, batch_size: int) -> float:
+    llm = TaskLocalHF(model_path=model, device="cpu", torch_dtype="float32", batch_size=batch_size,
+                      max_new_tokens=16, json_output=False)
+    # 先加载模型，计时只包含生成
+    llm.execute_task(tasks[:1])
+    start = time.perf_counter()
+    llm.execute_task(tasks)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    model = sys.argv[1] if len(sys.argv) > 1 else default_model
+    file = sys.argv[2] if len(sys.argv) > 2 else default_file
+    single_tasks, batched_tasks = make_tasks(file), make_tasks(file)
+    single_time = run(model, single_tasks, batch_size=1)
+    batched_time = run(model, batched_tasks, batch_size=8)
+    # 贪心解码，补齐与注意力掩码正确时批量生成与逐个生成的结果相同（浮点误差可能使个别结果不同）
+    matched = sum(single.task_output == batched.task_output for single, batched in zip(single_tasks, batched_tasks))
+    print(f"{os.path.basename(file)}: {len(single_tasks)} tasks, {matched} batched outputs match unbatched")
+    print(f"batch_size=1: {single_time:6.2f}s")
+    print(f"batch_size=8: {batched_time:6.2f}s")
@@ -0,0 +1,87 @@
+"""
+启动耗时预算：用 python -X importtime 统计 GraphBuilder 与引擎模块的累计耗时，并检查核心模块没有提前导入重量级依赖
+用法：pytest test/startup，或 python test/startup/test_import_time.py
+"""
+import os
+import subprocess
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# 导入耗时上限（毫秒），取多次运行中的最小值以减小抖动
+import_budget_ms = 200
+import_repeat = 5
+
+# 受耗时预算约束的模块：构建图谱时实际导入的入口
+budget_modules = [
+    "chatkg",
+    "chatkg.core.GraphBuilder",
+    "chatkg.adapter.engine.tradition",
+]
+
+# 只应在第一次使用对应组件时才导入的依赖
+heavy_modules = [
+    "zhipuai",
+    "neo4j",
+    "numpy",
+    "langchain_core",
+    "langchain_community",
+    "langchain_openai",
+    "langchain_text_splitters",
+]
+
+lazy_modules = [
+    "chatkg",
+    "chatkg.core.GraphBuilder",
+    "chatkg.adapter.engine.tradition",
+    "chatkg.adapter.structure.InfoTree",
+    "chatkg.adapter.database",
+    "chatkg.utils.text_reader",
+]
+
+
+def _run_python(*args) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=project_root)
+    return subprocess.run([sys.executable, *args], cwd=project_root, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def import_time_ms(module: str) -> float:
+    best = None
+    for _ in range(import_repeat):
+        stderr = _run_python("-X", "importtime", "-c", f"import {module}").stderr
+        # 每行格式：import time: self [us] | cumulative | imported package，顶层模块没有缩进
+        for line in stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].rstrip() == f" {module}":
+                cumulative = int(fields[1]) / 1000
+                best = cumulative if best is None else min(best, cumulative)
+    if best is None:
+        raise RuntimeError(f"No importtime record for {module}")
+    return best
+
+
+def loaded_heavy_modules(module: str) -> list:
+    stdout = _run_python("-c", f"import sys, {module}; print('\\n'.join(sys.modules))").stdout
+    loaded = set(stdout.split())
+    return [heavy for heavy in heavy_modules if heavy in loaded]
+
+
+def test_import_within_budget():
+    for module in budget_modules:
+        cost = import_time_ms(module)
+        assert cost < import_budget_ms, f"import {module} took {cost:.1f} ms, budget is {import_budget_ms} ms"
+
+
+def test_core_modules_import_lazily():
+    for module in lazy_modules:
+        loaded = loaded_heavy_modules(module)
+        assert not loaded, f"import {module} eagerly loads {loaded}"
+
+
+if __name__ == "__main__":
+    for budget_module in budget_modules:
+        print(f"import {budget_module}: {import_time_ms(budget_module):.1f} ms (budget {import_budget_ms} ms)")
+    for lazy_module in lazy_modules:
+        print(f"import {lazy_module}: {import_time_ms(lazy_module):.1f} ms, "
+              f"heavy modules loaded: {loaded_heavy_modules(lazy_module) or 'none'}")
@@ -0,0 +1,60 @@
+"""
+ColumnarForest 与 InfoForest 的结果一致：遍历、节点视图、计数与还原
+用法：pytest test/structure
+"""
+import pytest
+
+from chatkg.adapter.structure.ColumnarForest import ColumnarForest
+from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+
+DOCS = [
+    "# 集合\n\n集合的正文\n\n## 定义\n\n定义正文\n\n### 枚举法\n\n枚举\n\n## 运算\n\n运算正文\n\n## 定义\n\n补充定义\n",
+    "# 计数\n\n## 排列\n\n排列正文\n\n## 组合\n\n### 二项式\n\n二项式正文\n\n# 附录\n\n附录正文\n",
+]
+
+
+@pytest.fixture(params=[False, True], ids=["eager", "lazy"])
+def forest(tmp_path, request):
+    files = []
+    for i, doc in enumerate(DOCS):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text(doc, encoding="utf-8")
+        files.append(str(path))
+    return MarkdownReader(file=files, skip_mark="<abd>", lazy_content=request.param).indexing()
+
+
+def test_iteration_matches_info_forest(forest):
+    columnar = ColumnarForest.from_forest(forest)
+    assert len(columnar) == len(forest)
+    assert columnar.count_node() == forest.count_node()
+    assert str(columnar) == str(forest)
+    for tree, columnar_tree in zip(forest, columnar):
+        assert list(columnar_tree) == list(tree)
+        assert columnar_tree.source == tree.source
+        assert columnar_tree.node_cnt == tree.node_cnt
+
+
+def test_node_views_match_nodes(forest):
+    columnar = ColumnarForest.from_forest(forest)
+    for tree, columnar_tree in zip(forest, columnar):
+        for node, view in zip(tree.iter_nodes(), columnar_tree.iter_nodes()):
+            assert (view.title, view.level, view.content) == (node.title, node.level, node.content)
+            assert view.get_title_path() == node.get_title_path()
+            assert [child.title for child in view.children] == [child.title for child in node.children]
+            assert (view.parent.title if view.parent else None) == (node.parent.title if node.parent else None)
+            # 从节点开始的子树遍历
+            assert list(view) == list(node)
+
+
+def test_to_forest_round_trip(forest):
+    restored = ColumnarForest.from_forest(forest).to_forest()
+    assert [list(tree) for tree in restored] == [list(tree) for tree in forest]
+    assert restored.count_node() == forest.count_node()
+    assert [tree.source for tree in restored] == [tree.source for tree in forest]
+
+
+def test_reader_builds_columnar_directly(forest, tmp_path):
+    files = [tree.source for tree in forest]
+    columnar = MarkdownReader(file=files, skip_mark="<abd>", columnar=True).indexing()
+    assert isinstance(columnar, ColumnarForest)
+    assert [list(tree) for tree in columnar] == [list(tree) for tree in forest]
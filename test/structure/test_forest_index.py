@@ -0,0 +1,68 @@
+"""
+ForestIndex：按标题路径、标题前缀、层级查找节点，InfoForest 与 ColumnarForest 的结果一致
+用法：pytest test/structure
+"""
+import pytest
+
+from chatkg.adapter.structure.ColumnarForest import ColumnarForest
+from chatkg.adapter.structure.ForestIndex import ForestIndex
+from chatkg.adapter.structure.InfoTree import InfoForest, InfoNode, InfoTree
+
+
+def make_tree(root_title, headings):
+    info_tree = InfoTree(InfoNode(title=root_title, content=None, level=0))
+    for title, level in headings:
+        info_tree.insert_node(None, InfoNode(title=title, content=f"{title}正文", level=level), level)
+    return info_tree
+
+
+@pytest.fixture(params=["info", "columnar"])
+def index(request):
+    forest = InfoForest(trees=[
+        make_tree("离散数学", [("集合", 1), ("定义", 2), ("集合运算", 2), ("关系", 1), ("定义", 2)]),
+        make_tree("图论", [("集合", 1), ("定义", 2), ("图", 1)]),
+    ])
+    if request.param == "columnar":
+        forest = ColumnarForest.from_forest(forest)
+    return ForestIndex(forest)
+
+
+def paths(nodes):
+    return [node.get_title_path() for node in nodes]
+
+
+def test_get(index):
+    assert paths(index.get("离散数学/集合/定义")) == [["离散数学", "集合", "定义"]]
+    # 省略根节点时匹配每棵树中的该路径
+    assert paths(index.get("集合/定义")) == [["离散数学", "集合", "定义"], ["图论", "集合", "定义"]]
+    assert paths(index.get(["关系", "定义"])) == [["离散数学", "关系", "定义"]]
+    assert index.get("集合/不存在") == []
+    assert index.get("") == [] and index.get([]) == []
+    assert "图论/图" in index and "图论/关系" not in index
+    assert [node.content for node in index.get("图论/图")] == ["图正文"]
+
+
+def test_under(index):
+    assert paths(index.under("离散数学/集合")) == [
+        ["离散数学", "集合"], ["离散数学", "集合", "定义"], ["离散数学", "集合", "集合运算"]]
+    assert paths(index.under("离散数学/集合", include_self=False)) == [
+        ["离散数学", "集合", "定义"], ["离散数学", "集合", "集合运算"]]
+    assert [title_path for title_path, _ in index.sections("图论")] == [
+        ["图论"], ["图论", "集合"], ["图论", "集合", "定义"], ["图论", "图"]]
+    assert index.children("集合") == ["定义", "集合运算"]
+
+
+def test_search_prefix_and_lookups(index):
+    assert paths(index.search_prefix("集合")) == [
+        ["离散数学", "集合"], ["图论", "集合"], ["离散数学", "集合", "集合运算"]]
+    assert list(index.search_prefix("无")) == []
+    assert len(index.by_title("定义")) == 3
+    assert sorted(node.title for node in index.by_level(1)) == ["关系", "图", "集合", "集合"]
+    assert len(index) == 10
+
+
+def test_prefix_search_sees_added_trees(index):
+    assert list(index.search_prefix("树")) == []
+    index.add_tree(make_tree("树", [("树的定义", 1)]))
+    assert [node.title for node in index.search_prefix("树")] == ["树", "树的定义"]
+    assert "".join(index.render("树")) == "树\n  树的定义\n"
@@ -0,0 +1,71 @@
+"""
+InfoTree 按层级栈插入节点：父节点的确定、同名兄弟节点的合并与层级非法时的报错
+用法：pytest test/structure
+"""
+import pickle
+
+import pytest
+
+from chatkg.adapter.structure.InfoTree import InfoNode, InfoTree
+
+
+def build(headings, tree=None):
+    info_tree = tree or InfoTree(InfoNode(title="root", content=None, level=0))
+    for title, level in headings:
+        info_tree.insert_node(None, InfoNode(title=title, content=f"{title}正文", level=level), level)
+    return info_tree
+
+
+def title_paths(info_tree):
+    return [title_path for title_path, _ in info_tree]
+
+
+def test_parent_is_nearest_shallower_heading():
+    info_tree = build([("a", 1), ("a1", 2), ("a1x", 3), ("a2", 2), ("b", 1), ("b1", 3), ("b2", 2), ("b2x", 4)])
+    assert title_paths(info_tree) == [
+        ["root"], ["root", "a"], ["root", "a", "a1"], ["root", "a", "a1", "a1x"], ["root", "a", "a2"],
+        ["root", "b"], ["root", "b", "b1"], ["root", "b", "b2"], ["root", "b", "b2", "b2x"],
+    ]
+    assert info_tree.node_cnt == 8
+
+
+@pytest.mark.parametrize("sibling_cnt", [3, 50])
+def test_same_titled_siblings_merge(sibling_cnt):
+    # 同一父节点下的同名标题合并为一个节点，不论中间隔了多少兄弟节点；之后的子标题插入到合并后的节点下
+    headings = [("a", 1), ("x", 2)]
+    headings += [(f"s{i}", 2) for i in range(sibling_cnt)]
+    headings += [("x", 2), ("x1", 3), ("b", 1), ("x", 2)]
+    info_tree = build(headings)
+    a, b = info_tree.main_root.children
+    assert [child.title for child in a.children] == ["x"] + [f"s{i}" for i in range(sibling_cnt)]
+    x = a.children[0]
+    assert x.content == "x正文x正文"
+    assert [child.title for child in x.children] == ["x1"]
+    # 不同父节点下的同名标题不合并
+    assert [child.title for child in b.children] == ["x"]
+    assert info_tree.node_cnt == len(headings) - 1
+
+
+def test_insert_returns_merged_node():
+    info_tree = build([("a", 1)])
+    node = InfoNode(title="a", content="更多", level=1)
+    assert info_tree.insert_node(None, node, 1) is info_tree.main_root.children[0]
+
+
+def test_insert_continues_after_pickle():
+    # 层级栈不随树序列化，反序列化后由树的最右路径重建
+    info_tree = pickle.loads(pickle.dumps(build([("a", 1), ("a1", 2), ("b", 1), ("b1", 2)])))
+    build([("b2", 2), ("b1", 2), ("c", 1)], info_tree)
+    assert title_paths(info_tree)[1:] == [
+        ["root", "a"], ["root", "a", "a1"], ["root", "b"], ["root", "b", "b1"], ["root", "b", "b2"], ["root", "c"],
+    ]
+    assert info_tree.main_root.children[1].children[0].content == "b1正文b1正文"
+
+
+def test_level_not_below_root_raises():
+    info_tree = build([("a", 1), ("a1", 2)])
+    with pytest.raises(ValueError):
+        info_tree.insert_node(None, InfoNode(title="bad", content=None, level=0), 0)
+    # 报错后仍可继续插入
+    build([("a2", 2)], info_tree)
+    assert [child.title for child in info_tree.main_root.children[0].children] == ["a1", "a2"]
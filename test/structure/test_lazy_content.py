@@ -0,0 +1,67 @@
+"""
+lazy_content 读出的正文应与直接解码的一致，包括重名节点合并后的正文
+用法：pytest test/structure
+"""
+import pytest
+
+from chatkg.adapter.structure.ColumnarForest import ColumnarForest
+from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+
+DUPLICATE_TITLES = """# 手册
+
+## 安装
+
+第一段安装说明。
+
+## 使用
+
+使用说明。
+
+## 安装
+
+第二段安装说明，没有结尾换行。
+## 安装
+### 依赖
+依赖列表。
+"""
+
+
+def node_contents(forest):
+    return [(node.title, node.content) for tree in forest for node in tree.iter_nodes()]
+
+
+@pytest.fixture
+def markdown_file(tmp_path):
+    path = tmp_path / "dup.md"
+    path.write_text(DUPLICATE_TITLES, encoding="utf-8")
+    return str(path)
+
+
+def index(markdown_file, **kwargs):
+    return MarkdownReader(file=[markdown_file], skip_mark="<skip>", **kwargs).indexing()
+
+
+def test_lazy_content_matches_eager(markdown_file):
+    eager = node_contents(index(markdown_file))
+    lazy = node_contents(index(markdown_file, lazy_content=True))
+    assert lazy == eager
+    # 三个重名的“安装”合并为一个节点
+    merged = [content for title, content in eager if title == "安装"]
+    assert len(merged) == 1
+    assert "第一段安装说明" in merged[0] and "第二段安装说明" in merged[0]
+
+
+@pytest.mark.parametrize("lazy_content", [False, True])
+def test_columnar_content_matches_eager(markdown_file, lazy_content):
+    eager = node_contents(index(markdown_file))
+    assert node_contents(index(markdown_file, lazy_content=lazy_content, columnar=True)) == eager
+
+
+def test_mixed_parts_join_like_strings(markdown_file):
+    # 字符串与 SourceSpan 混合的片段列表按字符串拼接的方式读出
+    forest = index(markdown_file, lazy_content=True)
+    node = next(node for tree in forest for node in tree.iter_nodes() if node.title == "使用")
+    expected = node.content + "补充。"
+    node.append_content("补充。")
+    assert node.content == expected
+    assert ("使用", expected) in node_contents(ColumnarForest.from_forest(forest))
@@ -0,0 +1,82 @@
+"""
+二进制快照：保存后加载的森林与原来一致；指纹不同、源文件变化或文件损坏时视为失效
+用法：pytest test/structure
+"""
+import os
+
+import pytest
+
+from chatkg.adapter.engine.tradition import TraditionEngine, snapshot_file_name
+from chatkg.adapter.structure.ColumnarForest import ColumnarForest
+from chatkg.adapter.structure.InfoTree import InfoForest
+from chatkg.utils.text_reader.MarkdownReader import MarkdownReader
+
+DOC = "# 集合\n\n正文\n\n## 定义\n\n定义正文\n\n## 运算\n\n运算正文\n\n## 定义\n\n补充定义\n"
+
+
+@pytest.fixture
+def markdown_file(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text(DOC, encoding="utf-8")
+    return str(path)
+
+
+def sections(forest):
+    return [(tree.source, list(tree)) for tree in forest]
+
+
+@pytest.mark.parametrize("lazy_content", [False, True])
+def test_round_trip(tmp_path, markdown_file, lazy_content):
+    forest = MarkdownReader(file=[markdown_file], skip_mark="<abd>", lazy_content=lazy_content).indexing()
+    path = str(tmp_path / snapshot_file_name)
+    ColumnarForest.from_forest(forest).save(path, fingerprint="fp")
+    loaded = ColumnarForest.load(path, fingerprint="fp")
+    assert sections(loaded) == sections(forest)
+    assert loaded.count_node() == forest.count_node()
+    # InfoForest 的 save/load 经由 ColumnarForest
+    forest.save(path, fingerprint="fp")
+    restored = InfoForest.load(path, fingerprint="fp")
+    assert isinstance(restored, InfoForest)
+    assert sections(restored) == sections(forest)
+
+
+def test_invalidation(tmp_path, markdown_file):
+    forest = MarkdownReader(file=[markdown_file], skip_mark="<abd>", lazy_content=True).indexing()
+    path = str(tmp_path / snapshot_file_name)
+    assert ColumnarForest.load(path) is None
+    forest.save(path, fingerprint="fp")
+    assert ColumnarForest.load(path, fingerprint="other") is None
+    assert ColumnarForest.load(path, fingerprint="fp") is not None
+
+    # 源文件变化后 SourceSpan 失效，快照随之失效
+    stat = os.stat(markdown_file)
+    os.utime(markdown_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert ColumnarForest.load(path, fingerprint="fp") is None
+
+    forest.save(path, fingerprint="fp")
+    with open(path, "r+b") as f:
+        f.write(b"XXXX")
+    assert ColumnarForest.load(path, fingerprint="fp") is None
+    with open(path, "wb") as f:
+        f.write(b"\x00")
+    assert ColumnarForest.load(path, fingerprint="fp") is None
+
+
+def test_engine_reuses_snapshot(tmp_path, markdown_file, monkeypatch):
+    work_dir = str(tmp_path / "work_dir")
+    os.makedirs(work_dir)
+    reader = MarkdownReader(file=[markdown_file], skip_mark="<abd>")
+    engine = TraditionEngine(llm=None, reader=reader, work_dir=work_dir, struct_type="tree", snapshot=True)
+    first = engine._execute_reader()
+    assert os.path.isfile(os.path.join(work_dir, snapshot_file_name))
+
+    indexed = []
+    monkeypatch.setattr(MarkdownReader, "indexing", lambda self: indexed.append(self) or InfoForest(trees=[]))
+    second = engine._execute_reader()
+    assert indexed == []
+    assert sections(second) == sections(first)
+
+    # reader 配置变化时重新解析
+    engine.reader = MarkdownReader(file=[markdown_file], skip_mark="<skip>")
+    engine._execute_reader()
+    assert len(indexed) == 1
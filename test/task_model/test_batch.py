@@ -0,0 +1,65 @@
+"""
+批量任务文件：请求文件每行一个请求、custom_id 取序号；结果文件按块到达时逐行解析，成功与失败的行分别解析出输出与错误信息
+用法：pytest test/task_model
+"""
+import io
+import json
+
+import pytest
+
+from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
+from chatkg.adapter.task_model.batch import batch_endpoint, iter_jsonl, parse_batch_line, write_batch_file
+
+
+def make_task(key: str, prompt: str):
+    return InfoTreeTask(task_system_prompt="system", task_user_prompt=prompt, task_key=key,
+                        task_result=InfoTreeTaskResult(source=[key], entity=[], relation=[]))
+
+
+def test_write_batch_file():
+    file = io.BytesIO()
+    # prompt 相同的 task 也各有一个 custom_id
+    custom_ids = write_batch_file([make_task("k", "段落"), make_task("k", "段落")], file, "glm-4")
+    assert custom_ids == ["task-0", "task-1"]
+    requests = [json.loads(line) for line in file.getvalue().decode("utf-8").splitlines()]
+    assert [request["custom_id"] for request in requests] == custom_ids
+    assert requests[0]["url"] == batch_endpoint
+    assert requests[0]["body"] == {"model": "glm-4", "messages": [{"role": "system", "content": "system"},
+                                                                   {"role": "user", "content": "段落"}]}
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_iter_jsonl_across_chunks(size):
+    records = [{"custom_id": f"task-{i}", "text": "中文" * i} for i in range(5)]
+    # 空行跳过，最后一行没有换行
+    data = "\n".join(json.dumps(record, ensure_ascii=False) for record in records[:3]).encode("utf-8") + b"\n\n" \
+        + "\n".join(json.dumps(record, ensure_ascii=False) for record in records[3:]).encode("utf-8")
+    chunks = [data[i:i + size] for i in range(0, len(data), size)]
+    assert list(iter_jsonl(chunks)) == records
+
+
+def test_iter_jsonl_yields_before_download_ends():
+    def chunks():
+        yield b'{"custom_id": "task-0"}\n{"custom'
+        raise AssertionError("第一行应当在下一块到达前交出")
+
+    assert next(iter_jsonl(chunks())) == {"custom_id": "task-0"}
+
+
+def test_parse_success():
+    record = {"custom_id": "task-0", "response": {"status_code": 200, "body": {
+        "choices": [{"message": {"role": "assistant", "content": "输出"}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2}}}}
+    assert parse_batch_line(record) == ("task-0", "输出", {"prompt_tokens": 10, "completion_tokens": 2}, None)
+
+
+@pytest.mark.parametrize("record, error", [
+    ({"custom_id": "task-1", "error": {"code": "1301", "message": "敏感内容"}},
+     str({"code": "1301", "message": "敏感内容"})),
+    ({"custom_id": "task-1", "response": {"status_code": 400, "body": {"error": {"message": "参数错误"}}}},
+     str({"message": "参数错误"})),
+    ({"custom_id": "task-1", "response": {"status_code": 500, "body": None}}, "status code 500"),
+    ({"custom_id": "task-1", "response": {"status_code": 200, "body": {"choices": []}}}, "status code 200"),
+])
+def test_parse_failure(record, error):
+    assert parse_batch_line(record) == ("task-1", None, None, error)
@@ -0,0 +1,97 @@
+"""
+ResponseCache：命中与未命中、跨进程重新打开后仍可读取、超过容量时按最近访问时间淘汰；缓存键随模型、提示词与生成参数变化
+用法：pytest test/task_model
+"""
+import itertools
+import json
+
+from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
+from chatkg.adapter.task_model import cache as cache_module
+from chatkg.adapter.task_model.base import BaseTaskModel
+from chatkg.adapter.task_model.cache import ResponseCache, response_key
+
+
+class CountingLLM(BaseTaskModel):
+    requested: int = 0
+
+    def _execute_task(self, task, mode=None, **kwargs):
+        for single_task in task if isinstance(task, list) else [task]:
+            self.requested += 1
+            single_task.task_output = {"知识实体": {single_task.task_user_prompt: {}}, "实体关系": {}}
+        return task
+
+
+def make_task(prompt: str):
+    return InfoTreeTask(task_system_prompt="system", task_user_prompt=prompt, task_key=prompt,
+                        task_result=InfoTreeTaskResult(source=[prompt], entity=[], relation=[]))
+
+
+def test_hit_and_miss(tmp_path):
+    path = str(tmp_path / "cache" / "responses.sqlite")
+    cache = ResponseCache(path)
+    assert cache.get("a") is None
+    cache.put("a", {"知识实体": {"甲": {}}})
+    cache.put_many([("b", [1, 2]), ("b", [3])])
+    assert cache.get("a") == {"知识实体": {"甲": {}}}
+    # 同一批中相同的键只保留最后一个
+    assert cache.get("b") == [3]
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 2,
+                             "bytes": len(json.dumps({"知识实体": {"甲": {}}}, ensure_ascii=False).encode("utf-8")) + 3}
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get("b") == [3]
+    assert reopened.size == cache.size
+    reopened.close()
+
+
+def test_evicts_least_recently_accessed(tmp_path, monkeypatch):
+    # 访问时间逐次递增，避免同一时刻写入的条目顺序不定
+    ticks = itertools.count()
+    monkeypatch.setattr(cache_module.time, "time", lambda: float(next(ticks)))
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), max_bytes=30)
+    for key in "abc":
+        cache.put(key, "x" * 8)  # 每条 10 字节
+    assert cache.get("a") == "x" * 8
+    cache.put("d", "x" * 8)
+    # 超过 30 字节时淘汰到 27 字节以下：最久未访问的 b、c
+    assert cache.get("b") is None and cache.get("c") is None
+    assert cache.get("a") is not None and cache.get("d") is not None
+    assert len(cache) == 2 and cache.size == 20
+    # 覆盖写入时容量按新的大小计算
+    cache.put("a", "x")
+    assert cache.size == 13
+    cache.close()
+
+
+def test_key_sensitivity():
+    base = response_key("glm-4", "system", "user", {"temperature": 0.1})
+    assert base == response_key("glm-4", "system", "user", {"temperature": 0.1})
+    assert len({base,
+                response_key("glm-4-flash", "system", "user", {"temperature": 0.1}),
+                response_key("glm-4", "system2", "user", {"temperature": 0.1}),
+                response_key("glm-4", "system", "user2", {"temperature": 0.1}),
+                response_key("glm-4", "system", "user", {"temperature": 0.2}),
+                response_key("glm-4", None, "systemuser", {"temperature": 0.1})}) == 6
+    # 参数的书写顺序不影响键
+    assert response_key("m", "s", "u", {"a": 1, "b": 2}) == response_key("m", "s", "u", {"b": 2, "a": 1})
+
+
+def test_model_reuses_cached_outputs(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    llm = CountingLLM(llm_name="fake", cache=path)
+    llm.execute_task([make_task("甲"), make_task("乙")])
+    assert llm.requested == 2
+
+    # 重新构建：相同的提示词直接取缓存
+    llm = CountingLLM(llm_name="fake", cache=path)
+    tasks = [make_task("甲"), make_task("丙")]
+    llm.execute_task(tasks)
+    assert llm.requested == 1
+    assert tasks[0].task_output == {"知识实体": {"甲": {}}, "实体关系": {}}
+    assert llm.cache_stats["hits"] == 1
+
+    # 生成参数不同时不复用
+    llm = CountingLLM(llm_name="fake", cache=path, llm_kwargs={"temperature": 0.9})
+    llm.execute_task([make_task("甲")])
+    assert llm.requested == 1
@@ -0,0 +1,92 @@
+"""
+Hedger：样本不足时不对冲；慢请求的对冲次数不超过请求数的 max_ratio，对冲请求先返回时取其结果；对冲请求失败时等待原请求
+用法：pytest test/task_model
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from chatkg.adapter.task_model.hedging import Hedger
+
+slow = 0.05
+
+
+def make_hedger() -> Hedger:
+    # 中位数取自先完成的 16 个快请求，未对冲的慢请求不会把对冲等待时间拉长到超过慢请求的耗时
+    return Hedger(quantile=0.5, max_ratio=0.125, min_samples=16)
+
+
+def sync_attempt(index):
+    # 原请求慢，对冲请求立即返回
+    if index == 0:
+        time.sleep(slow)
+    return index
+
+
+async def async_attempt(index):
+    if index == 0:
+        await asyncio.sleep(slow)
+    return index
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(4)
+    yield executor
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_no_hedge_before_min_samples(executor):
+    hedger = Hedger(max_ratio=1., min_samples=4)
+    for _ in range(4):
+        assert hedger.delay() is None
+        assert hedger.run_sync(sync_attempt, executor) == 0
+    assert hedger.delay() >= slow
+    assert hedger.stats() == {"requests": 4, "fired": 0, "won": 0}
+
+
+def test_sync_ratio_cap(executor):
+    hedger = make_hedger()
+    for _ in range(16):
+        hedger.run_sync(lambda index: index, executor)
+    results = [hedger.run_sync(sync_attempt, executor) for _ in range(8)]
+    # 第 17、18、24 个请求时额度才够：对冲 3 次，恰为 24 个请求的 12.5%
+    assert results == [1, 1, 0, 0, 0, 0, 0, 1]
+    assert hedger.stats() == {"requests": 24, "fired": 3, "won": 3}
+
+
+def test_async_ratio_cap():
+    hedger = make_hedger()
+
+    async def run():
+        for _ in range(16):
+            await hedger.run_async(lambda index: asyncio.sleep(0, index))
+        return [await hedger.run_async(async_attempt) for _ in range(8)]
+
+    assert asyncio.run(run()) == [1, 1, 0, 0, 0, 0, 0, 1]
+    assert hedger.stats() == {"requests": 24, "fired": 3, "won": 3}
+
+
+def test_failed_hedge_waits_for_original(executor):
+    hedger = Hedger(max_ratio=1., min_samples=1)
+    hedger.run_sync(lambda index: index, executor)
+
+    def attempt(index):
+        if index == 1:
+            raise RuntimeError("对冲请求失败")
+        time.sleep(slow)
+        return "原请求"
+
+    assert hedger.run_sync(attempt, executor) == "原请求"
+    assert hedger.stats() == {"requests": 2, "fired": 1, "won": 0}
+
+    def both_fail(index):
+        if index == 0:
+            time.sleep(slow)
+        raise RuntimeError(f"第{index}次失败")
+
+    # 都失败时抛出后返回的异常
+    with pytest.raises(RuntimeError, match="第0次失败"):
+        hedger.run_sync(both_fail, executor)
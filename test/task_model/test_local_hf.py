@@ -0,0 +1,62 @@
+"""
+TaskLocalHF：plan_batches 的分批规则；安装了 torch 与 transformers 时，用本地构造的极小模型检查凑批生成与逐个生成一致
+用法：pytest test/task_model
+"""
+import pytest
+
+from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
+from chatkg.adapter.task_model.local_hf import TaskLocalHF, plan_batches
+
+
+def test_plan_batches_sorts_by_length():
+    lengths = [5, 1, 9, 3, 7, 2]
+    assert plan_batches(lengths, batch_size=2) == [[1, 5], [3, 0], [4, 2]]
+    assert plan_batches(lengths, batch_size=8) == [[1, 5, 3, 0, 4, 2]]
+    assert plan_batches([], batch_size=4) == []
+
+
+def test_plan_batches_token_budget():
+    # 每行按批中最长的 prompt 加 max_new_tokens 计
+    lengths = [4, 4, 6, 10, 30]
+    assert plan_batches(lengths, batch_size=8, max_batch_tokens=24, max_new_tokens=2) == [[0, 1, 2], [3], [4]]
+    # 超出上限的单个 prompt 仍单独成批
+    assert plan_batches([100], batch_size=8, max_batch_tokens=10) == [[0]]
+
+
+def make_task(key: str, prompt: str):
+    return InfoTreeTask(task_system_prompt="", task_user_prompt=prompt, task_key=key,
+                        task_result=InfoTreeTaskResult(source=[key], entity=[], relation=[]))
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    tokenizers = pytest.importorskip("tokenizers")
+    path = str(tmp_path_factory.mktemp("tiny-gpt2"))
+    words = ["<pad>", "<eos>", "<unk>"] + [f"w{i}" for i in range(29)]
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel({w: i for i, w in enumerate(words)}, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    transformers.PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token="<pad>", eos_token="<eos>",
+                                         unk_token="<unk>").save_pretrained(path)
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(vocab_size=len(words), n_positions=64, n_embd=16, n_layer=2, n_head=2,
+                                     bos_token_id=1, eos_token_id=1, pad_token_id=0)
+    transformers.GPT2LMHeadModel(config).save_pretrained(path)
+    return path
+
+
+def test_batched_generation_matches_single(tiny_model):
+    prompts = ["w3", "w5 w6 w7 w8 w9", "w10 w11", "w12 w13 w14 w15 w16 w17 w18", "w20 w21 w22"]
+
+    def generate(batch_size):
+        llm = TaskLocalHF(model_path=tiny_model, device="cpu", json_output=False, trust_remote_code=False,
+                          max_new_tokens=4, batch_size=batch_size)
+        tasks = [make_task(f"k{i}", prompt) for i, prompt in enumerate(prompts)]
+        llm.execute_task(tasks)
+        return [task.task_output for task in tasks]
+
+    single = generate(1)
+    assert all(isinstance(output, str) for output in single)
+    # 左侧补齐后一起生成，结果与逐个生成相同
+    assert generate(4) == single
@@ -0,0 +1,110 @@
+"""
+CompletionPoller：用假时钟检查查询时间（预计完成时第一次查询，之后指数退避）、完成耗时的统计与异常的传递
+用法：pytest test/task_model
+"""
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+from chatkg.adapter.task_model.poller import CompletionPoller, CompletionStats
+
+poller_module = importlib.import_module("chatkg.adapter.task_model.poller")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeAsyncio:
+    # 除 wait_for 外都是真正的 asyncio；wait_for 不等待，时钟直接前进到超时
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+
+    def __getattr__(self, name):
+        return getattr(asyncio, name)
+
+    async def wait_for(self, awaitable, timeout):
+        awaitable.close()
+        self.clock.now += timeout
+        raise asyncio.TimeoutError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(poller_module, "time", clock)
+    monkeypatch.setattr(poller_module, "asyncio", FakeAsyncio(clock))
+    # 去掉随机抖动
+    monkeypatch.setattr(poller_module, "random", SimpleNamespace(uniform=lambda a, b: 1.))
+    return clock
+
+
+def make_retrieve(clock, outcomes):
+    # outcomes：job_id -> (完成时间, 完成状态或异常)
+    calls = []
+
+    def retrieve(job_id):
+        calls.append((job_id, clock.now))
+        done_at, outcome = outcomes[job_id]
+        if clock.now < done_at:
+            return SimpleNamespace(task_status="PROCESSING")
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(task_status=outcome, job_id=job_id)
+
+    return retrieve, calls
+
+
+def run_all(poller, job_ids):
+    async def run():
+        return await asyncio.gather(*(poller.wait(job_id) for job_id in job_ids), return_exceptions=True)
+
+    return asyncio.run(run())
+
+
+def test_first_poll_at_expected_then_backoff(clock):
+    retrieve, calls = make_retrieve(clock, {
+        "a": (10., "SUCCESS"),
+        "b": (14., "SUCCESS"),
+        "c": (0., "FAILED"),
+        "d": (0., RuntimeError("网络错误")),
+    })
+    stats = CompletionStats(default=10.)
+    poller = CompletionPoller(retrieve, stats)
+    a, b, c, d = run_all(poller, ["a", "b", "c", "d"])
+    assert (a.job_id, b.job_id, c.task_status) == ("a", "b", "FAILED")
+    assert isinstance(d, RuntimeError)
+    # 都在预计耗时 10 秒时第一次查询；b 未完成，之后间隔 10 / 4 = 2.5 秒、5 秒
+    assert sorted(calls) == [("a", 10.), ("b", 10.), ("b", 12.5), ("b", 17.5), ("c", 10.), ("d", 10.)]
+    assert poller.retrieve_cnt == 6
+    # 只统计成功完成的耗时，取中位数
+    assert stats.expected() == 17.5
+
+
+def test_intervals_are_clamped(clock):
+    retrieve, calls = make_retrieve(clock, {"a": (45., "SUCCESS")})
+    poller = CompletionPoller(retrieve, CompletionStats(default=100.), max_interval=30.)
+    run_all(poller, ["a"])
+    # 第一次 100 秒截断为 30 秒，之后 25 秒、50 -> 30 秒
+    assert [at for _, at in calls] == [30., 55.]
+
+    retrieve, calls = make_retrieve(clock, {"a": (clock.now + 1., "SUCCESS")})
+    poller = CompletionPoller(retrieve, CompletionStats(default=0.), min_interval=0.5)
+    start = clock.now
+    run_all(poller, ["a"])
+    assert [at - start for _, at in calls] == [0.5, 1.]
+
+
+def test_stats_window():
+    stats = CompletionStats(default=3., window=3)
+    assert stats.expected() == 3.
+    for duration in [100., 1., 2., 5.]:
+        stats.observe(duration)
+    # 只保留最近 3 个：1、2、5
+    assert stats.expected() == 2.
@@ -0,0 +1,96 @@
+"""
+RateLimiter：用假时钟检查 RPM、TPM 限额下的等待时间，不真正 sleep
+用法：pytest test/task_model
+"""
+import asyncio
+import importlib
+
+import pytest
+
+from chatkg.adapter.task_model.rate_limit import RateLimiter, TokenBucket
+
+rate_limit_module = importlib.import_module("chatkg.adapter.task_model.rate_limit")
+
+
+class FakeClock:
+    # 代替 rate_limit 中的 time 与 asyncio 模块：sleep 只让时钟前进
+    def __init__(self):
+        self.now = 1000.
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit_module, "time", clock)
+    fake_asyncio = type("FakeAsyncio", (), {"sleep": staticmethod(clock.async_sleep)})
+    monkeypatch.setattr(rate_limit_module, "asyncio", fake_asyncio)
+    return clock
+
+
+def test_rpm(clock):
+    limiter = RateLimiter(rpm=60)
+    start = clock.now
+    # 桶满时一分钟的限额可以立即用完，之后每秒补充一个
+    for _ in range(60):
+        limiter.acquire()
+    assert clock.now == start and clock.slept == []
+    assert limiter.delay() == pytest.approx(1.)
+    for _ in range(30):
+        limiter.acquire()
+    assert clock.now - start == pytest.approx(30.)
+
+
+def test_tpm_and_overdraft(clock):
+    limiter = RateLimiter(tpm=600)
+    limiter.acquire(tokens=500)
+    # 剩 100 个，再取 300 个需要补 200 个，每秒补 10 个
+    assert limiter.delay(300) == pytest.approx(20.)
+    # 请求完成后补记输出 token，透支的 300 个补回之前所有请求都要等待
+    limiter.consume(400)
+    assert limiter.delay(0) == pytest.approx(30.)
+    assert limiter.delay(300) == pytest.approx(60.)
+    # 超过容量的请求只要求桶是满的
+    clock.now += 60
+    assert limiter.delay(10_000) == pytest.approx(30.)
+
+
+def test_both_limits_wait_for_the_slower(clock):
+    limiter = RateLimiter(rpm=6, tpm=60)
+    for _ in range(6):
+        limiter.acquire(tokens=1)
+    # 请求桶每 10 秒补 1 个，token 桶还剩 54 个，等请求桶
+    assert limiter.delay(1) == pytest.approx(10.)
+    assert limiter.delay(60) == pytest.approx(10.)
+    limiter.acquire(tokens=60)
+    assert clock.now == pytest.approx(1010.)
+
+
+def test_acquire_async(clock):
+    limiter = RateLimiter(rpm=2)
+
+    async def run():
+        for _ in range(4):
+            await limiter.acquire_async()
+
+    asyncio.run(run())
+    # 两个立即取出，之后每 30 秒一个
+    assert sum(clock.slept) == pytest.approx(60.)
+
+
+def test_unlimited_and_invalid():
+    limiter = RateLimiter()
+    limiter.acquire(tokens=10 ** 9)
+    assert limiter.delay(10 ** 9) == 0.
+    with pytest.raises(ValueError):
+        TokenBucket(0)
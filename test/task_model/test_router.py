@@ -0,0 +1,137 @@
+"""
+TaskRouter：返回 429、5xx 或连接失败的后端被摘除，其批次中没有输出的 task 交给其他后端；摘除时间连续出错时翻倍、不短于 Retry-After；
+其余错误与超过尝试次数时整批失败
+用法：pytest test/task_model
+"""
+import time
+from typing import Any, List
+
+import pytest
+
+from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
+from chatkg.adapter.task_model.base import BaseTaskModel
+from chatkg.adapter.task_model.router import TaskRouter, is_retryable, retry_after, status_code
+
+httpx = pytest.importorskip("httpx")
+
+
+class APIStatusError(Exception):
+    # 与 zhipuai 的异常一样，状态码在异常本身上
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class FlakyLLM(BaseTaskModel):
+    """
+    前 fail_times 次调用抛出 error（None 为一直抛出），第一个 task 的输出在出错前已经写回时 partial 为 True
+    """
+    error: Any = None
+    fail_times: int | None = None
+    partial: bool = False
+    delay: float = 0.
+    requested: List[str] = []
+    calls: int = 0
+
+    def _execute_task(self, task, mode=None, **kwargs):
+        time.sleep(self.delay)
+        self.calls += 1
+        tasks = task if isinstance(task, list) else [task]
+        if self.error is not None and (self.fail_times is None or self.calls <= self.fail_times):
+            if self.partial:
+                self._complete(tasks[0])
+            raise self.error
+        for single_task in tasks:
+            self._complete(single_task)
+        return task
+
+    def _complete(self, task):
+        self.requested.append(task.task_key)
+        task.task_output = {"知识实体": {task.task_key: {}}, "实体关系": {}}
+
+
+def http_error(code: int, headers: dict | None = None):
+    request = httpx.Request("POST", "http://backend.test/chat/completions")
+    response = httpx.Response(code, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"status {code}", request=request, response=response)
+
+
+def make_tasks(count: int):
+    return [InfoTreeTask(task_system_prompt="system", task_user_prompt=f"段落{i}", task_key=f"k{i}",
+                         task_result=InfoTreeTaskResult(source=[f"k{i}"], entity=[], relation=[]))
+            for i in range(count)]
+
+
+def test_error_classification():
+    assert status_code(http_error(429)) == 429 and status_code(APIStatusError(503)) == 503
+    assert is_retryable(http_error(429)) and is_retryable(http_error(503)) and is_retryable(APIStatusError(500))
+    assert not is_retryable(http_error(400)) and not is_retryable(APIStatusError(401))
+    # 没有状态码时按异常类名判断
+    assert is_retryable(APIConnectionError()) and is_retryable(httpx.ConnectError("refused"))
+    assert not is_retryable(ValueError("bad request"))
+    assert retry_after(http_error(429, {"Retry-After": "30"})) == 30.
+    assert retry_after(http_error(429, {"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"})) is None
+    assert retry_after(APIStatusError(429)) is None
+
+
+@pytest.mark.parametrize("error", [http_error(429, {"Retry-After": "30"}), http_error(503), APIConnectionError()])
+def test_failed_backend_is_ejected(error):
+    failing = FlakyLLM(llm_name="failing", error=error, requested=[])
+    healthy = FlakyLLM(llm_name="healthy", delay=0.02, requested=[])
+    router = TaskRouter(backends=[failing, healthy])
+    tasks = make_tasks(10)
+    start = time.monotonic()
+    router.execute_task(tasks)
+    # 摘除后不再取 task，队列排空即结束，不等待摘除到期
+    assert time.monotonic() - start < router.eject_seconds
+    assert all(task.task_output is not None for task in tasks)
+    assert sorted(healthy.requested) == sorted(task.task_key for task in tasks)
+    failing_stats, healthy_stats = router.backend_stats
+    assert failing_stats["errors"] == failing_stats["ejections"] == failing.calls >= 1
+    assert failing_stats["tasks"] == 0 and healthy_stats["tasks"] == 10
+    # 429 的摘除时间取 Retry-After
+    ejected = router._backends[0].ejected_until - time.monotonic()
+    assert ejected > (25 if "retry-after" in getattr(getattr(error, "response", None), "headers", {}) else 5)
+
+
+def test_partial_output_is_not_repeated():
+    failing = FlakyLLM(llm_name="failing", error=http_error(503), partial=True, requested=[])
+    healthy = FlakyLLM(llm_name="healthy", delay=0.02, requested=[])
+    router = TaskRouter(backends=[failing, healthy])
+    tasks = make_tasks(6)
+    router.execute_task(tasks)
+    # 出错前已经写回输出的 task 不再交给其他后端
+    assert sorted(failing.requested + healthy.requested) == sorted(task.task_key for task in tasks)
+
+
+def test_backend_rejoins_after_cooldown():
+    flaky = FlakyLLM(llm_name="flaky", error=http_error(503), fail_times=2, requested=[])
+    router = TaskRouter(backends=[flaky], eject_seconds=0.05, backend_concurrency=1)
+    tasks = make_tasks(3)
+    start = time.monotonic()
+    router.execute_task(tasks)
+    # 连续出错时摘除时间翻倍：0.05 秒、0.1 秒
+    assert time.monotonic() - start >= 0.15
+    assert all(task.task_output is not None for task in tasks)
+    assert router.backend_stats[0]["ejections"] == 2 and router.backend_stats[0]["tasks"] == 3
+
+
+def test_non_retryable_error_fails():
+    failing = FlakyLLM(llm_name="failing", error=http_error(400), requested=[])
+    healthy = FlakyLLM(llm_name="healthy", delay=0.02, requested=[])
+    router = TaskRouter(backends=[failing, healthy])
+    with pytest.raises(httpx.HTTPStatusError):
+        router.execute_task(make_tasks(10))
+    assert router.backend_stats[0]["ejections"] == 0
+
+
+def test_max_attempts():
+    failing = FlakyLLM(llm_name="failing", error=APIStatusError(503), requested=[])
+    router = TaskRouter(backends=[failing], eject_seconds=0.01, max_attempts=3)
+    with pytest.raises(APIStatusError):
+        router.execute_task(make_tasks(1))
+    assert failing.calls == 3
@@ -0,0 +1,89 @@
+"""
+TaskOpenAI 流式返回：iter_sse_data 只交出 data: 行的 json，[DONE] 之后不再交出但仍读完响应；
+经由 httpx 的模拟传输检查片段按顺序回调 on_delta、拼接为输出，usage 取最后给出的
+用法：pytest test/task_model
+"""
+import json
+
+import pytest
+
+from chatkg.adapter.structure.InfoTree import InfoTreeTask, InfoTreeTaskResult
+from chatkg.adapter.task_model import openai_compat
+from chatkg.adapter.task_model.openai_compat import TaskOpenAI, iter_sse_data
+
+httpx = pytest.importorskip("httpx")
+
+base_url = "http://sse.test/v1"
+
+
+def chunk(content=None, usage=None):
+    data = {"choices": [{"index": 0, "delta": {"content": content}}] if content is not None else []}
+    if usage is not None:
+        data["usage"] = usage
+    return "data: " + json.dumps(data, ensure_ascii=False)
+
+
+def test_iter_sse_data():
+    consumed = []
+
+    def lines():
+        for line in [": keep-alive", "event: message", 'data: {"a": 1}', "", "data:{\"b\": 2}", "data: ",
+                     "data: [DONE]", 'data: {"c": 3}', ": trailing"]:
+            consumed.append(line)
+            yield line
+
+    assert list(iter_sse_data(lines())) == [{"a": 1}, {"b": 2}]
+    # [DONE] 之后的行也读完
+    assert len(consumed) == 9
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    requests = []
+
+    def install(lines, status_code=200):
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return httpx.Response(status_code, content="\n".join(lines).encode("utf-8"),
+                                  headers={"content-type": "text/event-stream"})
+
+        client = httpx.Client(base_url=base_url, transport=httpx.MockTransport(handler))
+        monkeypatch.setitem(openai_compat._shared_clients, (base_url, False), client)
+        return requests
+
+    return install
+
+
+def make_llm(**kwargs):
+    return TaskOpenAI(llm_name="test-model", base_url=base_url, http2=False, stream=True, **kwargs)
+
+
+def make_task():
+    return InfoTreeTask(task_system_prompt="system", task_user_prompt="段落", task_key="k",
+                        task_result=InfoTreeTaskResult(source=["文档"], entity=[], relation=[]))
+
+
+def test_stream_deltas_and_usage(serve):
+    output = {"知识实体": {"甲": {}}, "实体关系": {}}
+    raw = json.dumps(output, ensure_ascii=False)
+    pieces = [raw[i:i + 4] for i in range(0, len(raw), 4)]
+    requests = serve([chunk(piece) for piece in pieces]
+                     + [chunk(""), chunk(usage={"prompt_tokens": 5, "completion_tokens": 7}), "data: [DONE]", ""])
+    deltas = []
+    task = make_llm().execute_task(make_task(), on_delta=lambda task, delta: deltas.append(delta))
+    assert deltas == pieces
+    assert task.task_output == output
+    assert requests[0]["stream"] is True and requests[0]["model"] == "test-model"
+
+
+def test_stream_error_status(serve):
+    serve(['{"error": "overloaded"}'], status_code=503)
+    with pytest.raises(httpx.HTTPStatusError):
+        make_llm().execute_task(make_task())
+
+
+def test_empty_stream_warns(serve):
+    serve(["data: [DONE]"])
+    with pytest.warns(UserWarning, match="Empty streamed response"):
+        task = make_llm(json_output=False).execute_task(make_task())
+    assert task.task_output == ""
@@ -0,0 +1,82 @@
+"""
+StreamExtractor 增量解析：任意切分输入得到的条目与整体解析一致，说明文字中的 { 不会锁定到错误的对象
+用法：pytest test/task_model
+"""
+import json
+import random
+
+import pytest
+
+from chatkg.adapter.task_model.stream_json import StreamExtractor
+
+output = {
+    "知识实体": {
+        "勾股定理": {"定义": "直角三角形两直角边的平方和等于斜边的平方", "别名": ["商高定理"]},
+        "直角三角形": {"性质": "有一个角为 90°，含 \"引号\" 与 \\ 转义"},
+        "斜边": "直角所对的边",
+    },
+    "实体关系": {
+        "勾股定理": {"适用于": "直角三角形", "涉及": ["斜边", "直角边"]},
+        "斜边": {"属于": "直角三角形"},
+    },
+    "备注": {"知识实体": {"不应交出": 1}},
+}
+
+expected = [
+    ("entity", "勾股定理", output["知识实体"]["勾股定理"]),
+    ("entity", "直角三角形", output["知识实体"]["直角三角形"]),
+    ("entity", "斜边", "直角所对的边"),
+    ("relation", "勾股定理", "适用于", "直角三角形"),
+    ("relation", "勾股定理", "涉及", "斜边"),
+    ("relation", "勾股定理", "涉及", "直角边"),
+    ("relation", "斜边", "属于", "直角三角形"),
+]
+
+text = json.dumps(output, ensure_ascii=False, indent=2)
+
+
+def feed_chunks(extractor, raw: str, rng: random.Random) -> list:
+    events, i = [], 0
+    while i < len(raw):
+        size = rng.randint(1, 12)
+        events.extend(extractor.feed(raw[i:i + size]))
+        i += size
+    return events
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_chunking_matches_whole(seed):
+    rng = random.Random(seed)
+    raw = f"好的，结果如下：\n```json\n{text}\n```\n以上。{{\"知识实体\": {{\"之后的\": 1}}}}"
+    extractor = StreamExtractor()
+    events = feed_chunks(extractor, raw, rng)
+    assert events == expected
+    assert extractor.events == expected
+
+
+@pytest.mark.parametrize("preamble", [
+    "以下按 {标题: 内容} 的格式输出：\n",
+    "输出 {\"知识实体\"} 与 {\"实体关系\": 两部分}：\n",
+    "示例：{\"知识实体\": {\"示例实体\": {\"属性\": 1}}, 其余略}\n```json\n",
+])
+@pytest.mark.parametrize("seed", range(5))
+def test_preamble_brace_resyncs(preamble, seed):
+    extractor = StreamExtractor()
+    feed_chunks(extractor, preamble + text, random.Random(seed))
+    # 说明文字中的对象出错后作废，events 只含真正输出中的条目
+    assert extractor.events == expected
+
+
+def test_resync_within_single_feed():
+    extractor = StreamExtractor()
+    assert extractor.feed("{说明} " + text) == expected
+
+
+def test_long_output_is_compacted():
+    # 超过 _COMPACT_SIZE 后丢弃已处理的文本，位置前移后解析结果不变
+    entities = {f"实体{i}": {"描述": "很长的描述" * 20, "序号": i} for i in range(200)}
+    raw = "前言 {不是 json}\n" + json.dumps({"知识实体": entities, "实体关系": {}}, ensure_ascii=False)
+    extractor = StreamExtractor()
+    feed_chunks(extractor, raw, random.Random(0))
+    assert extractor.events == [("entity", name, attr) for name, attr in entities.items()]
+    assert len(extractor._text) < len(raw) // 2
@@ -0,0 +1,83 @@
+"""
+FileCatalog 遍历目录：过滤规则、按 mtime 复用目录清单缓存、符号链接成环
+用法：pytest test/text_reader
+"""
+import json
+import os
+
+import pytest
+
+from chatkg.utils.text_reader import FileCatalog
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for rel_path in ["a.md", "b.txt", "docs/c.md", "docs/deep/d.md", "drafts/e.md"]:
+        path = tmp_path / "root" / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("# 标题\n", encoding="utf-8")
+    return tmp_path / "root"
+
+
+@pytest.fixture
+def scandir_calls(monkeypatch):
+    calls = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        calls.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    return calls
+
+
+def rel_paths(catalog, root):
+    return [os.path.relpath(path, root).replace(os.sep, "/") for path in catalog]
+
+
+def test_discovery_filters(tree):
+    assert rel_paths(FileCatalog(root=str(tree)), tree) == ["a.md", "b.txt", "docs/c.md", "docs/deep/d.md", "drafts/e.md"]
+    assert rel_paths(FileCatalog(root=str(tree), file_type="md", exclude=["drafts"]), tree) == [
+        "a.md", "docs/c.md", "docs/deep/d.md"]
+    assert rel_paths(FileCatalog(root=str(tree), include=["docs/*"], max_depth=1), tree) == ["docs/c.md"]
+
+
+def test_cache_reused_until_mtime_changes(tree, tmp_path, scandir_calls):
+    cache_file = str(tmp_path / "catalog.json")
+    catalog = FileCatalog(root=str(tree), cache_file=cache_file)
+    first = catalog.list_files()
+    assert len(scandir_calls) == 4
+    with open(cache_file, "r", encoding="utf-8") as f:
+        assert set(json.load(f)) == {str(tree), str(tree / "docs"), str(tree / "docs" / "deep"), str(tree / "drafts")}
+
+    # mtime 未变的目录不再 scandir
+    scandir_calls.clear()
+    assert catalog.list_files() == first
+    assert scandir_calls == []
+
+    # 目录中新增文件后 mtime 改变，只重新列出该目录
+    (tree / "docs" / "new.md").write_text("# 新\n", encoding="utf-8")
+    stat = os.stat(tree / "docs")
+    os.utime(tree / "docs", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert rel_paths(catalog, tree) == ["a.md", "b.txt", "docs/c.md", "docs/new.md", "docs/deep/d.md", "drafts/e.md"]
+    assert scandir_calls == [str(tree / "docs")]
+
+
+def test_cache_saved_when_iteration_stops_early(tree, tmp_path):
+    cache_file = tmp_path / "catalog.json"
+    for _ in FileCatalog(root=str(tree), cache_file=str(cache_file)):
+        break
+    with open(cache_file, "r", encoding="utf-8") as f:
+        assert str(tree) in json.load(f)
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="symlinks not supported")
+def test_symlink_loop_is_visited_once(tree):
+    try:
+        os.symlink(tree, tree / "docs" / "loop", target_is_directory=True)
+    except OSError:
+        pytest.skip("symlinks not permitted")
+    # 指向目录的符号链接照常进入，但成环时每个目录只遍历一次
+    assert rel_paths(FileCatalog(root=str(tree), file_type="md"), tree) == [
+        "a.md", "docs/c.md", "docs/deep/d.md", "drafts/e.md"]
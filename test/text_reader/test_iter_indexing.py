@@ -0,0 +1,53 @@
+"""
+MarkdownReader 流式索引：iter_indexing 每次只解析一个文件，按文件顺序交出 InfoTree 或逐个交出节点
+用法：pytest test/text_reader
+"""
+import importlib
+
+import pytest
+
+from chatkg.utils.text_reader import FileCatalog, MarkdownReader
+
+# 包中的 MarkdownReader 是同名的类，模块本身从 sys.modules 中取
+reader_module = importlib.import_module("chatkg.utils.text_reader.MarkdownReader")
+
+
+def write_docs(directory, count):
+    paths = []
+    for i in range(count):
+        path = directory / f"doc{i}.md"
+        path.write_text(f"# 文档{i}\n\n## 第一节\n\n正文{i}\n\n## 第二节\n\n正文{i}\n", encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def test_trees_are_parsed_one_at_a_time(tmp_path, monkeypatch):
+    files = write_docs(tmp_path, 3)
+    parsed = []
+    index_file = reader_module._index_markdown_file
+
+    def counting_index_file(md, *args, **kwargs):
+        parsed.append(md)
+        return index_file(md, *args, **kwargs)
+
+    monkeypatch.setattr(reader_module, "_index_markdown_file", counting_index_file)
+    trees = MarkdownReader(file=files, skip_mark="<abd>").iter_indexing()
+    first = next(trees)
+    # 交出第一棵树时后面的文件还没有读取
+    assert parsed == files[:1]
+    assert first.source == files[0]
+    assert [tree.source for tree in trees] == files[1:]
+    assert parsed == files
+
+
+def test_node_unit_and_catalog(tmp_path):
+    files = write_docs(tmp_path, 2)
+    reader = MarkdownReader(file=FileCatalog(root=str(tmp_path), file_type="md"), skip_mark="<abd>")
+    nodes = list(reader.iter_indexing(unit="node"))
+    assert [node.title for node in nodes if node.level > 0] == ["文档0", "第一节", "第二节", "文档1", "第一节", "第二节"]
+    # indexing 与逐棵交出的结果一致
+    assert [str(tree) for tree in reader.indexing()] == [str(tree) for tree in reader.iter_indexing()]
+    with pytest.raises(ValueError):
+        next(reader.iter_indexing(unit="section"))
+    # files 只索引部分文件
+    assert [tree.source for tree in reader.iter_indexing(files=files[1:])] == files[1:]
@@ -0,0 +1,42 @@
+"""
+内置单遍标题解析器与 MarkdownHeaderTextSplitter 的结果一致：有正文的节的标题路径与正文（去掉空白后）相同
+没有正文的标题 langchain 不会交出，其下的节挂到更上一级；第一个标题之前的正文 langchain 无法处理，两者都不在比较范围内
+用法：pytest test/text_reader
+"""
+import os
+
+import pytest
+
+from chatkg.utils.text_reader.MarkdownReader import _index_markdown_file
+
+pytest.importorskip("langchain_text_splitters")
+
+corpus = os.path.join(os.path.dirname(__file__), "..", "graph_build", "ch1.md")
+
+cases = {
+    "nested": "# 一\n\n正文一\n\n## 一.1\n\n正文一.1\n\n### 一.1.a\n\n正文\n\n## 一.2\n\n正文一.2\n\n# 二\n\n正文二\n",
+    "skipped_levels": "# 一\n\n正文\n\n### 跳级\n\n正文\n\n## 二级\n\n正文\n",
+    "code_fence": "# 代码\n\n```python\n# 不是标题\nx = 1\n```\n\n~~~\n## 也不是\n~~~\n\n正文\n",
+    "skip_mark": "# 保留\n\n正文\n\n# 跳过<abd>\n\n跳过的正文\n\n## 跳过的子节\n\n正文\n\n# 其后\n\n正文\n",
+    "no_trailing_newline": "# 标题\n正文没有换行",
+    "bom_and_crlf": "﻿# 标题\r\n\r\n正文\r\n## 子节\r\n正文\r\n",
+}
+
+
+def sections(parser: str, file: str):
+    # 只比较有正文的节；正文去掉全部空白后比较，native 保留原始排版而 langchain 逐行 strip
+    info_tree = _index_markdown_file(file, skip_mark="<abd>", parser=parser)
+    return [(title_path, "".join(content.split())) for title_path, content in info_tree if content]
+
+
+@pytest.mark.parametrize("name", sorted(cases))
+def test_native_matches_langchain(tmp_path, name):
+    path = tmp_path / f"{name}.md"
+    path.write_bytes(cases[name].encode("utf-8"))
+    assert sections("native", str(path)) == sections("langchain", str(path))
+
+
+def test_native_matches_langchain_on_corpus():
+    native = sections("native", corpus)
+    assert len(native) > 20
+    assert native == sections("langchain", corpus)
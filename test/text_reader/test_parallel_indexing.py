@@ -0,0 +1,46 @@
+"""
+多进程索引：parallel_map_ordered 按输入顺序交出结果、在途任务数不超过 window；MarkdownReader 并行与串行的结果一致
+用法：pytest test/text_reader
+"""
+import time
+
+from chatkg.utils.text_reader import MarkdownReader
+from chatkg.utils.text_reader.base import parallel_map_ordered
+
+
+def slow_square(x: int) -> int:
+    # 前面的任务更慢，完成顺序与输入顺序相反
+    time.sleep(0.02 * (4 - x % 4))
+    return x * x
+
+
+def test_results_keep_input_order():
+    assert list(parallel_map_ordered(slow_square, range(12), workers=3)) == [x * x for x in range(12)]
+
+
+def test_window_bounds_items_in_flight():
+    pulled = []
+
+    def items():
+        for x in range(10):
+            pulled.append(x)
+            yield x
+
+    results = parallel_map_ordered(slow_square, items(), workers=2, window=3)
+    assert next(results) == 0
+    # 交出第一个结果时只取了 window 个输入
+    assert len(pulled) == 3
+    assert list(results) == [x * x for x in range(1, 10)]
+
+
+def test_parallel_reader_matches_serial(tmp_path):
+    files = []
+    for i in range(6):
+        path = tmp_path / f"doc{i}.md"
+        path.write_text(f"# 文档{i}\n\n" + "".join(f"## 第{j}节\n\n正文{i}-{j}\n\n" for j in range(i + 1)),
+                        encoding="utf-8")
+        files.append(str(path))
+    serial = MarkdownReader(file=files, skip_mark="<abd>", workers=1).indexing()
+    parallel = MarkdownReader(file=files, skip_mark="<abd>", workers=2, parallel_min_files=1).indexing()
+    assert [tree.source for tree in parallel] == files
+    assert [str(tree) for tree in parallel] == [str(tree) for tree in serial]